@@ -0,0 +1,510 @@
+# Benchmark di analisi e riparazioni su mesh sintetiche con difetti noti.
+#
+# Generatori (triangoli, da ~1e3 a ~1e7 facce):
+#   grid    griglia piana triangolata, con bordo
+#   sphere  sfera UV chiusa
+#   scan    heightfield con rumore e ordine casuale di vertici e facce,
+#           simile all'output di uno scanner
+# Su ogni mesh vengono iniettati conteggi noti di vertici duplicati, facce
+# degeneri, facce capovolte ed edge non-manifold, scelti su vertici disgiunti
+# perche' i difetti non si sovrappongano. Ogni funzione viene cronometrata
+# (con le fasi di mesh_profile) e i conteggi riportati confrontati con quelli
+# attesi; i percorsi alternativi di analisi (incrementale, triage,
+# auto-intersezioni, split dei vertici) anche con il risultato di analyze.
+# Gli intervalli di triage sono controllati su --triage-seeds semi: devono
+# contenere il conteggio di analyze con la frequenza della loro confidenza.
+# I risultati vanno in un file JSON; con --baseline i tempi sono
+# confrontati con un'esecuzione precedente.
+#
+#     python bench_meshes.py --sizes 1e3 1e4 1e5 1e6 1e7 --out bench.json
+#     python bench_meshes.py --baseline bench.json --out bench-new.json
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from math import comb
+
+import numpy as np
+
+from obj_io import load_obj, write_obj
+from mesh_profile import Profiler, NULL_PROFILER
+from mesh_stream import analyze_streaming
+from mesh_cache import ComponentCache
+from mesh_intersect import self_intersections
+from mesh_triage import TRIAGE_BUDGET
+from check import analyze, analyze_incremental, triage, SELF_INTERSECTION_LIMIT
+from mesh_scripts import load_script
+
+GENERATORS = ("grid", "sphere", "scan")
+FUNCTIONS = ("write_obj", "load_obj", "analyze", "analyze_streaming", "analyze_incremental", "triage",
+             "self_intersections", "remove_nonmanifold", "repair_mesh", "split_non_manifold_vertices", "visualize")
+DEFAULT_SIZES = (1e3, 1e4, 1e5, 1e6)
+# semi di triage su ogni file stimato, per la copertura degli intervalli
+TRIAGE_SEEDS = 10
+
+# --- generatori: (verts, tris (m,3), boundary_vertices mask, n_boundary_edges)
+
+def grid(nfaces, rng=None):
+    cols = max(2, int(np.sqrt(nfaces / 2)))
+    rows = max(2, int(np.ceil(nfaces / 2 / cols)))
+    ii, jj = np.meshgrid(np.arange(rows + 1), np.arange(cols + 1), indexing="ij")
+    verts = np.stack([jj.ravel(), ii.ravel(), np.zeros(ii.size)], axis=1).astype(np.float64)
+    a = (ii[:-1, :-1] * (cols + 1) + jj[:-1, :-1]).ravel()
+    b, c = a + 1, a + cols + 1
+    d = c + 1
+    tris = np.concatenate([np.stack([a, b, d], axis=1), np.stack([a, d, c], axis=1)])
+    boundary = ((ii == 0) | (ii == rows) | (jj == 0) | (jj == cols)).ravel()
+    return verts, tris, boundary, 2 * (rows + cols)
+
+
+def sphere(nfaces, rng=None):
+    stacks = max(3, int(round(np.sqrt(nfaces / 4))))
+    slices = max(3, int(round(nfaces / (2 * (stacks - 1)))))
+    # raggio proporzionale alla risoluzione: lato dei triangoli ~ costante
+    radius = np.sqrt(nfaces)
+    theta = np.pi * np.arange(1, stacks) / stacks
+    phi = 2 * np.pi * np.arange(slices) / slices
+    t, p = np.meshgrid(theta, phi, indexing="ij")
+    ring = np.stack([np.sin(t) * np.cos(p), np.sin(t) * np.sin(p), np.cos(t)], axis=-1).reshape(-1, 3)
+    verts = radius * np.concatenate([[[0.0, 0.0, 1.0]], ring, [[0.0, 0.0, -1.0]]])
+    bottom = len(verts) - 1
+
+    j = np.arange(slices)
+    jn = (j + 1) % slices
+    top = np.stack([np.zeros(slices, dtype=np.int64), 1 + j, 1 + jn], axis=1)
+    cap = np.stack([np.full(slices, bottom), 1 + (stacks - 2) * slices + jn, 1 + (stacks - 2) * slices + j], axis=1)
+    k = np.arange(stacks - 2)[:, None]
+    a = (1 + k * slices + j).ravel()
+    b = (1 + k * slices + jn).ravel()
+    c, d = a + slices, b + slices
+    tris = np.concatenate([top, np.stack([a, c, d], axis=1), np.stack([a, d, b], axis=1), cap]).astype(np.int64)
+    return verts, tris, np.zeros(len(verts), dtype=bool), 0
+
+
+def scan(nfaces, rng):
+    verts, tris, boundary, n_boundary = grid(nfaces)
+    x, y = verts[:, 0], verts[:, 1]
+    verts[:, 2] = 2.0 * np.sin(x / 17.0) * np.cos(y / 23.0) + rng.normal(scale=0.05, size=len(verts))
+    verts[:, :2] += rng.uniform(-0.1, 0.1, size=(len(verts), 2))
+    # ordine di vertici e facce casuale, come dopo una fusione di scansioni
+    perm = rng.permutation(len(verts))
+    inv = np.empty_like(perm)
+    inv[perm] = np.arange(len(perm))
+    tris = inv[tris][rng.permutation(len(tris))]
+    return verts[perm], tris, boundary[perm], n_boundary
+
+
+# --- difetti
+
+def _pick_disjoint(rows, count, used):
+    """Posizioni di al piu' count righe di rows senza vertici in used (che vengono marcati)."""
+    picked = []
+    for i, row in enumerate(rows.tolist()):
+        if len(picked) == count:
+            break
+        if not used[row].any():
+            used[row] = True
+            picked.append(i)
+    return picked
+
+
+def inject_defects(verts, tris, boundary, n_boundary, counts, rng):
+    """Aggiunge i difetti richiesti; restituisce (verts, face_offsets, face_indices, attesi).
+
+    counts: dict con duplicates, degenerate, flipped, non_manifold.
+    - duplicates: copie esatte, non referenziate, di vertici distinti
+    - degenerate: triangoli di 3 vertici nuovi allineati fuori dal bbox
+      (ognuno e' una componente con 3 edge di bordo)
+    - flipped: facce interne con l'ordine dei vertici invertito
+      (3 edge con half-edge nello stesso verso ciascuna)
+    - non_manifold: un terzo triangolo su un edge interno
+      (1 edge non-manifold e 2 edge di bordo ciascuno)
+    """
+    tris = tris.copy()
+    used = boundary.copy()
+    interior = np.flatnonzero(~boundary[tris].any(axis=1))
+    order = interior[rng.permutation(len(interior))]
+
+    # facce candidate a blocchi, per non convertire in liste milioni di righe
+    block = 4 * (counts["flipped"] + counts["non_manifold"]) + 64
+    flipped, nm_faces = [], []
+    for s in range(0, len(order), block):
+        ids = order[s:s + block]
+        if len(flipped) < counts["flipped"]:
+            flipped += ids[_pick_disjoint(tris[ids], counts["flipped"] - len(flipped), used)].tolist()
+        elif len(nm_faces) < counts["non_manifold"]:
+            # l'edge (v0, v1) della faccia: basta che i due estremi siano liberi
+            nm_faces += ids[_pick_disjoint(tris[ids, :2], counts["non_manifold"] - len(nm_faces), used)].tolist()
+        else:
+            break
+    if len(flipped) < counts["flipped"] or len(nm_faces) < counts["non_manifold"]:
+        raise ValueError("mesh too small for the requested defect counts")
+
+    new_verts = [verts]
+    new_tris = [tris]
+    nverts = len(verts)
+    if nm_faces:
+        corners = tris[nm_faces]
+        p0, p1, p2 = verts[corners[:, 0]], verts[corners[:, 1]], verts[corners[:, 2]]
+        normal = np.cross(p1 - p0, p2 - p0)
+        normal /= np.linalg.norm(normal, axis=1, keepdims=True)
+        # apice sollevato dalla superficie di |v0 v1|
+        apex = 0.5 * (p0 + p1) + normal * np.linalg.norm(p1 - p0, axis=1, keepdims=True)
+        new_verts.append(apex)
+        new_tris.append(np.column_stack([corners[:, :2], nverts + np.arange(len(apex))]))
+        nverts += len(apex)
+    # dopo gli edge non-manifold, che leggono l'orientamento originale
+    tris[flipped] = tris[flipped, ::-1]
+
+    if counts["degenerate"]:
+        lo, hi = verts.min(axis=0), verts.max(axis=0)
+        start = hi + (hi - lo).max() + 10.0
+        x = start[0] + np.arange(3 * counts["degenerate"], dtype=np.float64)
+        new_verts.append(np.column_stack([x, np.full_like(x, start[1]), np.full_like(x, start[2])]))
+        new_tris.append(nverts + np.arange(3 * counts["degenerate"]).reshape(-1, 3))
+        nverts += len(x)
+
+    if counts["duplicates"]:
+        new_verts.append(verts[rng.choice(len(verts), size=counts["duplicates"], replace=False)])
+
+    verts = np.concatenate(new_verts)
+    tris = np.concatenate(new_tris).astype(np.int64)
+    expected = {
+        "nverts": len(verts),
+        "nfaces": len(tris),
+        "duplicate_positions_exact_count": counts["duplicates"],
+        "near_duplicate_groups_count": counts["duplicates"],
+        "n_components": 1 + counts["degenerate"],
+        "n_boundary_edges": n_boundary + 3 * counts["degenerate"] + 2 * counts["non_manifold"],
+        # il bordo della griglia e' un loop, ogni triangolo degenere un altro;
+        # i 2 edge di bordo di ogni triangolo non-manifold formano una catena aperta
+        "n_boundary_loops": (1 if n_boundary else 0) + counts["degenerate"],
+        "n_open_boundary_chains": counts["non_manifold"],
+        "n_nonmanifold_edges": counts["non_manifold"],
+        # i difetti iniettati non creano vertici con piu' ventagli di facce
+        "n_nonmanifold_vertices": 0,
+        "n_degenerate_faces": counts["degenerate"],
+        "n_flipped_adjacent_pairs": 3 * counts["flipped"],
+        # i triangoli invertiti sono la minoranza della loro componente
+        "n_faces_to_flip": counts["flipped"],
+        "n_non_orientable_components": 0,
+        # i triangoli aggiunti stanno fuori dalla superficie o la toccano solo nei vertici
+        "n_self_intersecting_pairs": 0,
+    }
+    face_offsets = np.arange(0, 3 * len(tris) + 1, 3, dtype=np.int64)
+    return verts, face_offsets, tris.ravel(), expected
+
+
+def defect_counts(nfaces, rate):
+    n = max(2, int(rate * nfaces))
+    return {"duplicates": n, "degenerate": n, "flipped": n, "non_manifold": n}
+
+
+# --- esecuzione
+
+def _timed(label, fn, *args, **kwargs):
+    """Esegue fn(*args, profiler=..., **kwargs) a stdout muto; (risultato, record)."""
+    prof = Profiler(label)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args, profiler=prof, **kwargs)
+    record = {"seconds": time.perf_counter() - start, "stages": prof.stages}
+    return result, record
+
+
+def _plain(fn):
+    # adatta una funzione senza parametro profiler a _timed, con una sola fase
+    def run(*args, profiler, **kwargs):
+        with profiler.stage(fn.__name__):
+            return fn(*args, **kwargs)
+    return run
+
+
+def _mismatches(expected, got):
+    return {k: [expected[k], got.get(k)] for k in expected if got.get(k) != expected[k]}
+
+
+def _triage_mismatches(reference, summary):
+    """Chiavi di triage diverse da analyze: uguali se il file e' stato letto per
+    intero, dentro l'intervallo di confidenza se stimate ([vero, stima, intervallo])."""
+    if not summary["estimated"]:
+        return _mismatches(reference, summary)
+    bad = _mismatches({k: reference[k] for k in ("nverts", "nfaces")}, summary)
+    for key, interval in summary["triage"]["intervals"].items():
+        # None: metrica non campionata (vedi triage["warnings"])
+        if interval is not None and not interval[0] <= reference[key] <= interval[1]:
+            bad[key] = [reference[key], summary[key], interval]
+    return bad
+
+
+def _coverage_floor(runs, confidence, alpha=0.01):
+    """Minimo di intervalli che contengono il vero su runs semi: meno ha probabilita' <= alpha."""
+    cdf = 0.0
+    for k in range(runs + 1):
+        cdf += comb(runs, k) * confidence ** k * (1 - confidence) ** (runs - k)
+        if cdf > alpha:
+            return k
+    return runs
+
+
+def _triage_coverage(reference, summaries):
+    """Copertura degli intervalli di triage su piu' semi: ({chiave: [coperti, semi]}, mismatch).
+
+    Un mismatch e' una chiave coperta meno di quanto un intervallo al suo
+    livello di confidenza farebbe quasi sempre ([coperti, semi, minimo]).
+    """
+    coverage, bad = {}, {}
+    for key in summaries[0]["triage"]["intervals"]:
+        # None: metrica non campionata con quel seme (vedi triage["warnings"])
+        intervals = [s["triage"]["intervals"][key] for s in summaries if s["triage"]["intervals"][key] is not None]
+        covered = sum(lo <= reference[key] <= hi for lo, hi in intervals)
+        coverage[key] = [covered, len(intervals)]
+        floor = _coverage_floor(len(intervals), summaries[0]["triage"]["confidence"])
+        if covered < floor:
+            bad[key] = [covered, len(intervals), floor]
+    for s in summaries:
+        bad.update(_mismatches({k: reference[k] for k in ("nverts", "nfaces")}, s))
+    return coverage, bad
+
+
+def run_case(generator, target_faces, counts, functions, tmp_dir, rng, tol=1e-6, max_visualize_faces=10 ** 6,
+             triage_budget=TRIAGE_BUDGET, triage_seeds=TRIAGE_SEEDS):
+    """Genera una mesh, la scrive su disco e cronometra le funzioni richieste."""
+    t0 = time.perf_counter()
+    verts, tris, boundary, n_boundary = globals()[generator](int(target_faces), rng)
+    verts, face_offsets, face_indices, expected = inject_defects(verts, tris, boundary, n_boundary, counts, rng)
+    case = {
+        "generator": generator,
+        "target_faces": int(target_faces),
+        "nverts": len(verts),
+        "nfaces": len(face_offsets) - 1,
+        "injected": counts,
+        "expected": expected,
+        "generate_seconds": time.perf_counter() - t0,
+        "results": {},
+    }
+    results = case["results"]
+    path = os.path.join(tmp_dir, f"{generator}-{int(target_faces)}.obj")
+
+    # la scrittura serve comunque: le altre funzioni leggono il file
+    _, results["write_obj"] = _timed("write_obj", _plain(write_obj), path, verts, face_offsets, face_indices)
+    if "write_obj" not in functions:
+        del results["write_obj"]
+    del verts, tris, face_offsets, face_indices
+
+    if "load_obj" in functions:
+        (v, fo, fi), rec = _timed("load_obj", _plain(load_obj), path)
+        rec["mismatches"] = _mismatches({"nverts": expected["nverts"], "nfaces": expected["nfaces"]},
+                                        {"nverts": len(v), "nfaces": len(fo) - 1})
+        results["load_obj"] = rec
+        del v, fo, fi
+
+    # riferimento per i percorsi alternativi: analyze sullo stesso file
+    reference = {}
+
+    def analyzed(obj_path):
+        if obj_path not in reference:
+            with contextlib.redirect_stdout(io.StringIO()):
+                reference[obj_path] = analyze(obj_path, tol, profiler=NULL_PROFILER)[0]
+        return reference[obj_path]
+
+    if "analyze" in functions:
+        out, rec = _timed("analyze", analyze, path, tol)
+        rec["mismatches"] = _mismatches(expected, out[0])
+        results["analyze"] = rec
+        reference[path] = out[0]
+        del out
+
+    if "analyze_streaming" in functions:
+        summary, rec = _timed("analyze_streaming", _plain(analyze_streaming), path, tol, tmp_dir=tmp_dir)
+        rec["mismatches"] = _mismatches(expected, summary)
+        results["analyze_streaming"] = rec
+
+    if "analyze_incremental" in functions:
+        components = ComponentCache(os.path.join(tmp_dir, "components"))
+        # a freddo, con la cache piena, e dopo una modifica: la prima faccia
+        # diventa degenere, il suo pezzo va rianalizzato
+        summary, rec = _timed("analyze_incremental", analyze_incremental, path, components, tol)
+        mismatches = _mismatches(analyzed(path), summary)
+        summary, warm = _timed("analyze_incremental", analyze_incremental, path, components, tol)
+        mismatches.update(_mismatches(analyzed(path), summary))
+        v, fo, fi = load_obj(path)
+        v[fi[fo[0] + 2]] = v[fi[fo[0]]]
+        edited_path = os.path.join(tmp_dir, "edited.obj")
+        write_obj(edited_path, v, fo, fi)
+        del v, fo, fi
+        summary, edited = _timed("analyze_incremental", analyze_incremental, edited_path, components, tol)
+        mismatches.update({"edited " + k: d for k, d in _mismatches(analyzed(edited_path), summary).items()})
+        rec.update(warm_seconds=warm["seconds"], edited_seconds=edited["seconds"], mismatches=mismatches)
+        results["analyze_incremental"] = rec
+        components.invalidate()
+        os.remove(edited_path)
+        reference.pop(edited_path, None)
+
+    if "triage" in functions:
+        summary, rec = _timed("triage", triage, path, tol, triage_budget)
+        rec["estimated"] = summary["estimated"]
+        if summary["estimated"] and triage_seeds > 1:
+            # lo stesso file con altri semi: gli intervalli devono contenere
+            # il vero quasi sempre, non solo con il primo seme
+            summaries = [summary] + [triage(path, tol, triage_budget, seed=seed, profiler=NULL_PROFILER)
+                                     for seed in range(1, triage_seeds)]
+            rec["coverage"], rec["mismatches"] = _triage_coverage(analyzed(path), summaries)
+        else:
+            rec["mismatches"] = _triage_mismatches(analyzed(path), summary)
+        results["triage"] = rec
+
+    if "self_intersections" in functions:
+        v, fo, fi = load_obj(path)
+        (pairs, complete), rec = _timed("self_intersections", _plain(self_intersections), v, fo, fi,
+                                        limit=SELF_INTERSECTION_LIMIT)
+        keys = ("n_self_intersecting_pairs", "self_intersections_complete")
+        rec["mismatches"] = _mismatches({k: analyzed(path)[k] for k in keys},
+                                        dict(zip(keys, (len(pairs), complete))))
+        results["self_intersections"] = rec
+        del v, fo, fi
+
+    if "remove_nonmanifold" in functions:
+        fix = load_script("fix-non-mainfold.py")
+        out_path = os.path.join(tmp_dir, "removed.obj")
+        _, rec = _timed("remove_nonmanifold", fix.remove_nonmanifold, path, out_path)
+        # ogni edge non-manifold iniettato ha 3 facce, tutte rimosse
+        _, fo, _ = load_obj(out_path)
+        rec["mismatches"] = _mismatches({"nfaces": expected["nfaces"] - 3 * counts["non_manifold"]},
+                                        {"nfaces": len(fo) - 1})
+        results["remove_nonmanifold"] = rec
+        os.remove(out_path)
+
+    if "repair_mesh" in functions:
+        repair = load_script("fix-non-mainfold2.py").MeshRepair()
+        with open(path, "rb") as f:
+            data = f.read()
+        _, load_rec = _timed("load", _plain(repair.load_obj), data)
+        got, rec = _timed("repair_mesh", repair.repair_mesh)
+        got["remaining_non_manifold_edges"] = int(repair.get_edges().nonmanifold_mask.sum())
+        rec["mismatches"] = _mismatches({
+            "non_manifold_edges": counts["non_manifold"],
+            # la terza faccia di ogni edge riceve una copia di entrambi i vertici
+            "duplicated_vertices": 2 * counts["non_manifold"],
+            "faces_changed": counts["non_manifold"],
+            "remaining_non_manifold_edges": 0,
+        }, got)
+        rec["load_seconds"] = load_rec["seconds"]
+        results["repair_mesh"] = rec
+        del repair, data
+
+    if "split_non_manifold_vertices" in functions:
+        repair = load_script("fix-non-mainfold2.py").MeshRepair()
+        with open(path, "rb") as f:
+            repair.load_obj(f.read())
+        got, rec = _timed("split_non_manifold_vertices", repair.split_non_manifold_vertices)
+        got["remaining_non_manifold_vertices"] = len(repair.find_non_manifold_vertices())
+        rec["mismatches"] = _mismatches({"non_manifold_vertices": analyzed(path)["n_nonmanifold_vertices"],
+                                         "remaining_non_manifold_vertices": 0}, got)
+        results["split_non_manifold_vertices"] = rec
+        del repair
+
+    if "visualize" in functions and case["nfaces"] <= max_visualize_faces:
+        viz = load_script("visualize-non-mainfold.py").BoundaryVisualizer()
+        with open(path, "rb") as f:
+            viz.load_obj(f.read())
+        html_path = os.path.join(tmp_dir, "analysis.html")
+        _, rec = _timed("visualize", viz.create_html_visualization, html_path)
+        rec["mismatches"] = _mismatches({"n_boundary_edges": expected["n_boundary_edges"]},
+                                        {"n_boundary_edges": len(viz.find_boundary_edges())})
+        results["visualize"] = rec
+        os.remove(html_path)
+        del viz
+
+    os.remove(path)
+    return case
+
+
+def compare(baseline, cases, threshold, min_seconds=0.05):
+    """Rallentamenti oltre threshold rispetto a baseline (stesso generatore, taglia e funzione)."""
+    old = {(c["generator"], c["target_faces"], name): r["seconds"]
+           for c in baseline["cases"] for name, r in c["results"].items()}
+    slower = []
+    for c in cases:
+        for name, r in c["results"].items():
+            before = old.get((c["generator"], c["target_faces"], name))
+            # sotto min_seconds il rumore domina
+            if before is None or max(before, r["seconds"]) < min_seconds:
+                continue
+            if r["seconds"] > threshold * before:
+                slower.append({"generator": c["generator"], "target_faces": c["target_faces"], "function": name,
+                               "baseline_seconds": before, "seconds": r["seconds"],
+                               "ratio": r["seconds"] / before})
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark analysis and repair functions on synthetic meshes.")
+    parser.add_argument("--sizes", type=float, nargs="+", default=DEFAULT_SIZES, help="target face counts")
+    parser.add_argument("--generators", nargs="+", choices=GENERATORS, default=GENERATORS)
+    parser.add_argument("--functions", nargs="+", choices=FUNCTIONS, default=FUNCTIONS)
+    parser.add_argument("--defect-rate", type=float, default=1e-3, help="injected defects of each kind per face")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tol", type=float, default=1e-6, help="near-duplicate vertex tolerance")
+    parser.add_argument("--max-visualize-faces", type=float, default=1e6,
+                        help="skip the HTML visualizer above this many faces")
+    parser.add_argument("--triage-budget", type=int, default=TRIAGE_BUDGET, metavar="BYTES",
+                        help="bytes of each file parsed by triage (default %(default)s)")
+    parser.add_argument("--triage-seeds", type=int, default=TRIAGE_SEEDS, metavar="N",
+                        help="triage seeds per estimated file; each interval must contain the analyze count "
+                             "about as often as its confidence level says (default %(default)s)")
+    parser.add_argument("--tmp-dir", default=None, help="where the generated OBJ files are written")
+    parser.add_argument("--out", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--baseline", default=None, help="previous results file to compare timings against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    cases = []
+    n_bad = 0
+    with tempfile.TemporaryDirectory(prefix="obj-bench-", dir=args.tmp_dir) as tmp_dir:
+        for size in sorted(args.sizes):
+            for generator in args.generators:
+                case = run_case(generator, size, defect_counts(size, args.defect_rate), args.functions,
+                                tmp_dir, rng, args.tol, args.max_visualize_faces, args.triage_budget,
+                                args.triage_seeds)
+                cases.append(case)
+                for name, r in case["results"].items():
+                    bad = r.get("mismatches")
+                    n_bad += bool(bad)
+                    print(f"{generator:>6} {case['nfaces']:>10} {name:<27} {r['seconds']:9.3f}s"
+                          + (f"  MISMATCH {bad}" if bad else ""), file=sys.stderr, flush=True)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+            "defect_rate": args.defect_rate,
+        },
+        "cases": cases,
+    }
+    status = 1 if n_bad else 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(json.load(f), cases, args.threshold)
+        for r in report["regressions"]:
+            print(f"REGRESSION {r['generator']} {r['target_faces']} {r['function']}: "
+                  f"{r['baseline_seconds']:.3f}s -> {r['seconds']:.3f}s", file=sys.stderr)
+        status |= bool(report["regressions"])
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=1)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
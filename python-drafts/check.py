@@ -2,163 +2,397 @@
 
 # Analisi dettagliata dei due file OBJ che hai inviato.
 # Output: statistiche, verifica di vertici duplicati (posizioni identiche), componenti connesse di facce,
-# edge non-manifold, edge di confine (boundary edges), facce degeneri (area ~0), e orientamento incoerente tra facce adiacenti.
-
-from collections import defaultdict, deque
-import math
-
-def parse_obj(path):
-    verts = []
-    faces = []
-    with open(path, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith('#') or line.startswith('g ') or line.startswith('o '):
-                continue
-            if line.startswith('v '):
-                parts = line.split()
-                x,y,z = map(float, parts[1:4])
-                verts.append((x,y,z))
-            elif line.startswith('f '):
-                parts = line.split()[1:]
-                # supports faces like "f v v v" or "f v/vt/vn ..."
-                idxs = []
-                for p in parts:
-                    if '/' in p:
-                        idx = p.split('/')[0]
-                    else:
-                        idx = p
-                    # OBJ indices 1-based, handle negative indices
-                    idx = int(idx)
-                    if idx < 0:
-                        idx = len(verts) + 1 + idx
-                    idxs.append(idx-1)
-                faces.append(tuple(idxs))
-    return verts, faces
-
-def vec_sub(a,b): return (a[0]-b[0], a[1]-b[1], a[2]-b[2])
-def cross(a,b):
-    return (a[1]*b[2]-a[2]*b[1], a[2]*b[0]-a[0]*b[2], a[0]*b[1]-a[1]*b[0])
-def dot(a,b): return a[0]*b[0]+a[1]*b[1]+a[2]*b[2]
-def norm(a): return math.sqrt(dot(a,a))
-
-def face_area(verts, face):
-    if len(face) < 3: return 0.0
-    # triangulate fan from v0
-    a = 0.0
-    v0 = verts[face[0]]
-    for i in range(1, len(face)-1):
-        v1 = verts[face[i]]
-        v2 = verts[face[i+1]]
-        cr = cross(vec_sub(v1, v0), vec_sub(v2, v0))
-        a += 0.5 * norm(cr)
-    return a
-
-def face_normal(verts, face):
-    # compute normal of first triangle in face fan
-    if len(face) < 3: return (0,0,0)
-    v0 = verts[face[0]]
-    v1 = verts[face[1]]
-    v2 = verts[face[2]]
-    n = cross(vec_sub(v1,v0), vec_sub(v2,v0))
-    ln = norm(n)
-    if ln == 0: return (0,0,0)
-    return (n[0]/ln, n[1]/ln, n[2]/ln)
-
-def analyze(path):
-    verts, faces = parse_obj(path)
-    nverts = len(verts); nfaces = len(faces)
-    # duplicate positions
-    pos_map = defaultdict(list)
-    for i,p in enumerate(verts):
-        pos_map[p].append(i)
-    dup_positions = {p:idxs for p,idxs in pos_map.items() if len(idxs)>1}
-    # duplicates near-equal within tolerance
-    tol = 1e-6
-    merged = {}
-    for i,p in enumerate(verts):
-        if i in merged: continue
-        merged[i] = [i]
-        for j in range(i+1, len(verts)):
-            if j in merged: continue
-            d = math.dist(p, verts[j])
-            if d <= tol:
-                merged[i].append(j)
-                merged[j] = merged[i]
-    groups = defaultdict(list)
-    for k,v in merged.items():
-        groups[id(v)].append(k)
-    near_dups = {i:idxs for i,idxs in groups.items() if len(idxs)>1}
-    # build edge map
-    edge_map = defaultdict(list)
-    for fi,face in enumerate(faces):
-        m = len(face)
-        for i in range(m):
-            a = face[i]; b = face[(i+1)%m]
-            edge = tuple(sorted((a,b)))
-            edge_map[edge].append(fi)
-    boundary_edges = [e for e,fs in edge_map.items() if len(fs)==1]
-    nonmanifold_edges = [e for e,fs in edge_map.items() if len(fs)>2]
-    # face adjacency graph via shared edges
-    adj = defaultdict(set)
-    for e,fs in edge_map.items():
-        for i in fs:
-            for j in fs:
-                if i!=j:
-                    adj[i].add(j)
-    # connected components of faces
-    visited = set()
-    comps = []
-    for i in range(len(faces)):
-        if i in visited: continue
-        q = deque([i]); comp = []
-        visited.add(i)
-        while q:
-            u = q.popleft(); comp.append(u)
-            for v in adj[u]:
-                if v not in visited:
-                    visited.add(v); q.append(v)
-        comps.append(comp)
-    # degenerate faces and normals
-    deg_faces = []
-    normals = []
-    for i,face in enumerate(faces):
-        a = face_area(verts, face)
-        normals.append(face_normal(verts, face))
-        if a <= 1e-9:
-            deg_faces.append(i)
-    # inconsistent orientation between adjacent faces: dot(normal_i, normal_j) < 0.0 flagged
-    flipped_pairs = []
-    for e,fs in edge_map.items():
-        if len(fs)==2:
-            i,j = fs
-            ni = normals[i]; nj = normals[j]
-            if ni==(0,0,0) or nj==(0,0,0): continue
-            if dot(ni,nj) < -0.2: # fairly opposite
-                flipped_pairs.append((i,j,e))
+# edge non-manifold, edge di confine (boundary edges), facce degeneri (area ~0), e orientamento incoerente tra facce adiacenti
+# (esatto, dal verso degli half-edge).
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from obj_io import load_obj, write_obj
+from mesh_cache import MeshCache, ComponentCache
+from mesh_stream import analyze_streaming, DEFAULT_MEMORY_LIMIT
+from mesh_spatial import near_duplicate_groups
+from mesh_topology import EdgeTable, face_components, boundary_loops, orientation, reverse_faces, vertex_fans
+from mesh_geometry import face_areas_normals, chain_summary
+from mesh_profile import profiler_from_env, PROFILE_ENV, NULL_PROFILER
+from mesh_incremental import Pieces, submesh, MIN_CACHED_FACES
+from mesh_triage import triage_summary, TRIAGE_BUDGET
+from mesh_intersect import self_intersections
+
+def parse_obj(path, cache=None):
+    # bulk parse into (N,3) verts + CSR faces; supports "f v/vt/vn" and negative indices
+    # with a MeshCache, unchanged files are mmapped from the binary cache instead
+    if cache is not None:
+        return cache.load_obj(path)
+    verts, face_offsets, face_indices = load_obj(path)
+    return verts, face_offsets, face_indices
+
+# intersecting triangle pairs after which the self-intersection search stops
+SELF_INTERSECTION_LIMIT = 1 << 16
+
+def intersection_summary(verts_arr, face_offsets, face_indices, prof):
+    # faces crossing other faces they share no vertex with (mesh_intersect);
+    # computed on the whole mesh, since pieces touching only in space still intersect
+    with prof.stage("self_intersections", items=len(face_offsets) - 1):
+        pairs, complete = self_intersections(verts_arr, face_offsets, face_indices, limit=SELF_INTERSECTION_LIMIT)
+    return {
+        "n_self_intersecting_pairs": len(pairs),
+        "self_intersections_complete": complete,
+        "examples_self_intersecting_pairs": list(map(tuple, pairs[:6].tolist())),
+    }
+
+def analyze(path, tol=1e-6, cache=None, profiler=None, reoriented_path=None):
+    # profiler: mesh_profile.Profiler to record stages into; by default one is
+    # taken from OBJ_DOCTOR_PROFILE and emitted as JSON when analyze returns
+    # reoriented_path: if given and some faces need flipping, the consistently
+    # wound mesh is written there (positions and faces only)
+    prof = profiler if profiler is not None else profiler_from_env(label=f"analyze:{path}")
+    with prof.stage("parse") as st:
+        verts_arr, face_offsets, face_indices = parse_obj(path, cache)
+        nverts = len(verts_arr); nfaces = len(face_offsets) - 1
+        st.items = nfaces
+    with prof.stage("duplicates", items=nverts):
+        # duplicate positions
+        _, dup_counts = np.unique(verts_arr + 0.0, axis=0, return_counts=True)
+        # duplicates near-equal within tolerance (grid hash at `tol`, ~linear time)
+        near_dups = near_duplicate_groups(verts_arr, tol)
+    with prof.stage("edge_build", items=len(face_indices)):
+        # edge table: sorted (min,max) int64 keys + edge->face CSR
+        if cache is not None:
+            edges = cache.edge_table(path, face_offsets, face_indices, nverts)
+        else:
+            edges = EdgeTable(face_offsets, face_indices, nverts)
+    part, comp_labels, normals, flip = face_summary(verts_arr, face_offsets, face_indices, edges, prof)
+    if reoriented_path is not None and part["n_faces_to_flip"]:
+        with prof.stage("write", items=part["n_faces_to_flip"]):
+            write_obj(reoriented_path, verts_arr, face_offsets, reverse_faces(face_offsets, face_indices, flip))
     summary = {
         "path": path,
         "nverts": nverts,
         "nfaces": nfaces,
-        "duplicate_positions_exact_count": sum(len(v)-1 for v in dup_positions.values()),
+        "duplicate_positions_exact_count": int((dup_counts - 1).sum()),
         "near_duplicate_groups_count": len(near_dups),
-        "n_components": len(comps),
-        "component_sizes": sorted([len(c) for c in comps], reverse=True),
-        "n_boundary_edges": len(boundary_edges),
-        "n_nonmanifold_edges": len(nonmanifold_edges),
+        **part,
+        **intersection_summary(verts_arr, face_offsets, face_indices, prof),
+    }
+    if profiler is None:
+        prof.emit()
+    return summary, verts_arr, (face_offsets, face_indices), comp_labels, edges, normals
+
+def face_summary(verts_arr, face_offsets, face_indices, edges, prof):
+    # the part of the summary that depends only on faces and their edges (from
+    # n_components on); also used per component by analyze_incremental
+    # returns (summary part, component label per face, normals, faces to flip)
+    nfaces = len(face_offsets) - 1
+    boundary_mask = edges.boundary_mask
+    nonmanifold_mask = edges.nonmanifold_mask
+    n_boundary_edges = int(boundary_mask.sum())
+    with prof.stage("boundary_loops", items=n_boundary_edges):
+        # boundary half-edges chained into closed loops (holes) and open chains, one linear walk
+        loops = chain_summary(verts_arr, *boundary_loops(face_offsets, face_indices, edges))
+    with prof.stage("vertex_fans", items=len(face_indices)):
+        # non-manifold (bowtie) vertices: more than one edge-connected fan of faces
+        _, n_fans = vertex_fans(face_offsets, face_indices, edges)
+        bowties = np.flatnonzero(n_fans > 1)
+    with prof.stage("components", items=nfaces):
+        # connected components of faces: union-find straight from the edge->face table
+        comp_labels, comp_sizes = face_components(edges, nfaces)
+    with prof.stage("area_normals", items=nfaces):
+        # degenerate faces and normals (batched fan areas + Newell normals)
+        areas, normals = face_areas_normals(verts_arr, face_offsets, face_indices)
+        deg_faces = np.flatnonzero(areas <= 1e-9).tolist()
+    with prof.stage("orientation", items=len(face_indices)):
+        # exact winding check on directed half-edges: the two half-edges of a
+        # manifold edge must run in opposite directions; orientation is then
+        # propagated per component and the smaller side is marked for flipping
+        bad_edges, flip, non_orientable = orientation(face_offsets, face_indices, edges)
+        first = edges.edge_face_offsets[bad_edges]
+        flipped_pairs = list(zip(edges.edge_faces[first].tolist(), edges.edge_faces[first + 1].tolist(),
+                                 map(tuple, edges.edges[bad_edges].tolist())))
+    part = {
+        "n_components": len(comp_sizes),
+        "component_sizes": sorted(comp_sizes.tolist(), reverse=True),
+        "n_boundary_edges": n_boundary_edges,
+        "n_nonmanifold_edges": int(nonmanifold_mask.sum()),
+        "n_nonmanifold_vertices": len(bowties),
+        **loops,
         "n_degenerate_faces": len(deg_faces),
         "n_flipped_adjacent_pairs": len(flipped_pairs),
-        "examples_boundary_edges": boundary_edges[:6],
-        "examples_nonmanifold_edges": nonmanifold_edges[:6],
+        "n_faces_to_flip": int(flip.sum()),
+        "n_non_orientable_components": len(np.unique(comp_labels[non_orientable])),
+        "examples_boundary_edges": list(map(tuple, edges.edges[boundary_mask][:6].tolist())),
+        "examples_nonmanifold_edges": list(map(tuple, edges.edges[nonmanifold_mask][:6].tolist())),
+        "examples_nonmanifold_vertices": bowties[:6].tolist(),
         "examples_flipped_pairs": flipped_pairs[:6],
         "degenerate_faces": deg_faces[:6],
     }
-    return summary, verts, faces, comps, edge_map, normals
-
-paths = ["/mnt/data/unione.obj", "/mnt/data/unione2.obj"]
-results = {}
-for p in paths:
-    res = analyze(p)
-    results[p] = res[0]
-    
-results
+    return part, comp_labels, normals, flip
+
+def _piece_part(verts_arr, face_offsets, face_indices):
+    # face_summary of a sub-mesh (one piece, or a batch of whole pieces)
+    edges = EdgeTable(face_offsets, face_indices, len(verts_arr))
+    return face_summary(verts_arr, face_offsets, face_indices, edges, NULL_PROFILER)[0]
+
+def _to_global(part, vertex_ids, face_ids):
+    # maps the vertex and face ids of a sub-mesh summary part back to the mesh
+    v = vertex_ids.tolist(); f = face_ids.tolist()
+    return {
+        **part,
+        "boundary_loops": [{**loop, "start_vertex": v[loop["start_vertex"]]} for loop in part["boundary_loops"]],
+        "examples_boundary_edges": [(v[a], v[b]) for a, b in part["examples_boundary_edges"]],
+        "examples_nonmanifold_edges": [(v[a], v[b]) for a, b in part["examples_nonmanifold_edges"]],
+        "examples_nonmanifold_vertices": [v[a] for a in part["examples_nonmanifold_vertices"]],
+        "examples_flipped_pairs": [(f[i], f[j], (v[a], v[b])) for i, j, (a, b) in part["examples_flipped_pairs"]],
+        "degenerate_faces": [f[i] for i in part["degenerate_faces"]],
+    }
+
+def _merge_parts(parts, limit=6):
+    # face_summary of the whole mesh from the parts of disjoint pieces: counts
+    # add up, examples are the first ones in mesh order (local ids keep it)
+    def total(key):
+        return sum(p[key] for p in parts)
+    def first(key, sort_key=None):
+        return sorted((x for p in parts for x in p[key]), key=sort_key)[:limit]
+    sizes = sorted((x for p in parts for x in p["component_sizes"]), reverse=True)
+    loops = sorted((x for p in parts for x in p["boundary_loops"]),
+                   key=lambda loop: (-loop["perimeter"], loop["closed"], loop["start_vertex"]))
+    return {
+        "n_components": len(sizes),
+        "component_sizes": sizes,
+        "n_boundary_edges": total("n_boundary_edges"),
+        "n_nonmanifold_edges": total("n_nonmanifold_edges"),
+        "n_nonmanifold_vertices": total("n_nonmanifold_vertices"),
+        "n_boundary_loops": total("n_boundary_loops"),
+        "n_open_boundary_chains": total("n_open_boundary_chains"),
+        "boundary_loops": loops[:limit],
+        "n_degenerate_faces": total("n_degenerate_faces"),
+        "n_flipped_adjacent_pairs": total("n_flipped_adjacent_pairs"),
+        "n_faces_to_flip": total("n_faces_to_flip"),
+        "n_non_orientable_components": total("n_non_orientable_components"),
+        "examples_boundary_edges": first("examples_boundary_edges"),
+        "examples_nonmanifold_edges": first("examples_nonmanifold_edges"),
+        "examples_nonmanifold_vertices": first("examples_nonmanifold_vertices"),
+        "examples_flipped_pairs": first("examples_flipped_pairs", lambda pair: pair[2]),
+        "degenerate_faces": first("degenerate_faces"),
+    }
+
+def analyze_incremental(path, components, tol=1e-6, cache=None, profiler=None):
+    # same summary as analyze(path, tol, cache)[0], with the face/edge part
+    # reused per piece (faces connected through vertices) from a
+    # mesh_cache.ComponentCache: only pieces whose fingerprint of positions and
+    # local topology changed are re-analyzed; pieces under MIN_CACHED_FACES
+    # faces are re-analyzed together every time
+    prof = profiler if profiler is not None else profiler_from_env(label=f"analyze_incremental:{path}")
+    with prof.stage("parse") as st:
+        verts_arr, face_offsets, face_indices = parse_obj(path, cache)
+        nverts = len(verts_arr); nfaces = len(face_offsets) - 1
+        st.items = nfaces
+    with prof.stage("duplicates", items=nverts):
+        _, dup_counts = np.unique(verts_arr + 0.0, axis=0, return_counts=True)
+        near_dups = near_duplicate_groups(verts_arr, tol)
+    with prof.stage("pieces", items=nfaces):
+        pieces = Pieces(face_offsets, face_indices, nverts)
+        fingerprints = pieces.fingerprints(verts_arr)
+        large = pieces.nfaces() >= MIN_CACHED_FACES
+        parts = []
+        stale = []
+        for i in np.flatnonzero(large).tolist():
+            hit = components.get(fingerprints[i])
+            if hit is None:
+                stale.append(i)
+                continue
+            parts.append(_to_global(hit, pieces.vertex_ids[pieces.vertex_bounds[i]:pieces.vertex_bounds[i + 1]],
+                                    pieces.face_order[pieces.face_bounds[i]:pieces.face_bounds[i + 1]]))
+    with prof.stage("stale_pieces", items=len(stale)):
+        for i in stale:
+            piece_verts, offsets, indices, vertex_ids, face_ids = pieces.mesh(verts_arr, i)
+            part = _piece_part(piece_verts, offsets, indices)
+            components.put(fingerprints[i], part)
+            parts.append(_to_global(part, vertex_ids, face_ids))
+    keep = ~large[pieces.labels]
+    n_small = int(keep.sum())
+    with prof.stage("small_pieces", items=n_small):
+        if n_small:
+            small_verts, offsets, indices, vertex_ids, face_ids = submesh(verts_arr, face_offsets, face_indices, keep)
+            parts.append(_to_global(_piece_part(small_verts, offsets, indices), vertex_ids, face_ids))
+    if stale:
+        components.evict()
+    summary = {
+        "path": path,
+        "nverts": nverts,
+        "nfaces": nfaces,
+        "duplicate_positions_exact_count": int((dup_counts - 1).sum()),
+        "near_duplicate_groups_count": len(near_dups),
+        **_merge_parts(parts),
+        **intersection_summary(verts_arr, face_offsets, face_indices, prof),
+    }
+    if profiler is None:
+        prof.emit()
+    return summary
+
+def triage(path, tol=1e-6, budget=TRIAGE_BUDGET, seed=0, confidence=0.95, profiler=None):
+    # quick health estimate from a sample of at most `budget` bytes of the file
+    # (mesh_triage): same keys as analyze plus "estimated" and "triage" (rates
+    # with confidence intervals); keys that need the whole mesh are None.
+    # Files that fit in the budget are analyzed in full, with estimated False
+    prof = profiler if profiler is not None else profiler_from_env(label=f"triage:{path}")
+    if os.path.getsize(path) <= budget:
+        summary = {**analyze(path, tol, profiler=prof)[0], "estimated": False, "triage": None}
+    else:
+        summary = triage_summary(path, tol, budget, seed=seed, confidence=confidence, prof=prof)
+    if profiler is None:
+        prof.emit()
+    return summary
+
+def expand_inputs(inputs):
+    # files, directories (searched recursively for *.obj) and glob patterns, in order, without repeats
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            found = sorted(os.path.join(root, name)
+                           for root, _, names in os.walk(item)
+                           for name in names if name.lower().endswith('.obj'))
+        elif os.path.exists(item):
+            found = [item]
+        else:
+            # a pattern matching nothing is passed through and reported as an error
+            found = sorted(glob.glob(item, recursive=True)) or [item]
+        for path in found:
+            if path not in seen:
+                seen.add(path)
+                yield path
+
+def _reoriented_path(path, reorient_dir):
+    stem, ext = os.path.splitext(os.path.basename(path))
+    return os.path.join(reorient_dir, f"{stem}.reoriented{ext}")
+
+def _analyze_one(path, tol, stream, memory_limit, cache_dir, reorient_dir=None, component_dir=None,
+                 triage_budget=None):
+    # worker entry point: never raises, so one bad file does not stop the batch
+    try:
+        if triage_budget:
+            summary = triage(path, tol, triage_budget)
+        elif stream:
+            summary = analyze_streaming(path, tol, memory_limit, intersection_limit=SELF_INTERSECTION_LIMIT)
+        elif component_dir:
+            cache = MeshCache(cache_dir) if cache_dir else None
+            summary = analyze_incremental(path, ComponentCache(component_dir), tol, cache)
+        else:
+            cache = MeshCache(cache_dir) if cache_dir else None
+            out = _reoriented_path(path, reorient_dir) if reorient_dir else None
+            summary = analyze(path, tol, cache, reoriented_path=out)[0]
+        return summary, None
+    except Exception as exc:
+        return None, f"{type(exc).__name__}: {exc}"
+
+def _run_isolated(path, options):
+    # one file in a process of its own: a crash is reported instead of raised
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        try:
+            return pool.submit(_analyze_one, path, *options).result()
+        except BrokenProcessPool:
+            return None, "BrokenProcessPool: the worker process died (killed or crashed)"
+
+def _run_all(paths, jobs, options):
+    # (path, result) as files finish; a single file is analyzed in this process,
+    # so that obj_io can parse a large file with its own process pool
+    if len(paths) == 1 or jobs <= 1:
+        for path in paths:
+            yield path, _analyze_one(path, *options)
+        return
+    # at most `jobs` files in flight: when a worker dies (OOM kill, segfault)
+    # the pool breaks, only those files are suspects and are re-run one by
+    # one in their own process, and the rest of the batch goes on in a new pool
+    queue = deque(paths)
+    while queue:
+        suspects = []
+        with ProcessPoolExecutor(max_workers=min(jobs, len(queue))) as pool:
+            running = {}
+            while (queue or running) and not suspects:
+                while queue and len(running) < jobs:
+                    path = queue.popleft()
+                    running[pool.submit(_analyze_one, path, *options)] = path
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = running.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        suspects.append(path)
+                        continue
+                    yield path, result
+            suspects.extend(running.values())
+        for path in suspects:
+            yield path, _run_isolated(path, options)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze OBJ meshes, one JSON summary per line.")
+    parser.add_argument("inputs", nargs="+", help="OBJ files, directories or glob patterns")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--tol", type=float, default=1e-6, help="near-duplicate vertex tolerance")
+    parser.add_argument("--stream", action="store_true", help="out-of-core analysis (mesh_stream)")
+    parser.add_argument("--memory-limit", type=int, default=DEFAULT_MEMORY_LIMIT, help="bytes, with --stream")
+    parser.add_argument("--cache-dir", default=None, help="reuse parsed meshes from a MeshCache directory")
+    parser.add_argument("--reorient-dir", default=None,
+                        help="write <name>.reoriented.obj here for meshes with inconsistent winding "
+                             "(positions and faces only; not with --stream)")
+    parser.add_argument("--component-cache", default=None, metavar="DIR",
+                        help="reuse per-component results from DIR; only components that changed since "
+                             "an earlier run are re-analyzed")
+    parser.add_argument("--triage", action="store_true",
+                        help="quick estimate from a sample of each file: rates with confidence intervals "
+                             "and \"estimated\": true; keys that need the whole mesh are null")
+    parser.add_argument("--triage-budget", type=int, default=TRIAGE_BUDGET, metavar="BYTES",
+                        help="bytes of each file parsed by --triage (default %(default)s)")
+    parser.add_argument("--profile", choices=("time", "memory"), default=None,
+                        help="emit per-stage JSON timings to stderr (sets OBJ_DOCTOR_PROFILE for the workers)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        os.environ[PROFILE_ENV] = args.profile
+    if args.triage and (args.stream or args.component_cache or args.reorient_dir):
+        parser.error("--triage samples the file, drop --stream/--component-cache/--reorient-dir")
+    if args.component_cache and args.stream:
+        parser.error("--component-cache needs the in-memory analysis, drop --stream")
+    if args.reorient_dir:
+        if args.stream or args.component_cache:
+            parser.error("--reorient-dir needs the full in-memory analysis, drop --stream/--component-cache")
+        os.makedirs(args.reorient_dir, exist_ok=True)
+
+    paths = list(expand_inputs(args.inputs))
+    start = time.perf_counter()
+    n_ok = n_failed = n_faces = 0
+    options = (args.tol, args.stream, args.memory_limit, args.cache_dir, args.reorient_dir, args.component_cache,
+               args.triage_budget if args.triage else None)
+    for path, (summary, error) in _run_all(paths, args.jobs, options):
+        if error is None:
+            n_ok += 1
+            n_faces += summary["nfaces"]
+            line = summary
+        else:
+            n_failed += 1
+            line = {"path": path, "error": error}
+        print(json.dumps(line), flush=True)
+    elapsed = time.perf_counter() - start
+    report = {
+        "files": n_ok,
+        "failed": n_failed,
+        "faces": n_faces,
+        "seconds": round(elapsed, 3),
+        "files_per_s": round(n_ok / elapsed, 3) if elapsed else None,
+        "faces_per_s": round(n_faces / elapsed, 1) if elapsed else None,
+    }
+    # throughput goes to stderr so stdout stays pure JSONL
+    print(json.dumps(report), file=sys.stderr)
+    return 1 if n_failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,49 +1,56 @@
-from collections import defaultdict
+import numpy as np
+
+import obj_io
+from obj_io import load_obj, face_lists, faces_to_csr, select_groups
+from mesh_topology import EdgeTable, select_faces
+from mesh_profile import profiler_from_env
 
 def parse_obj(path):
-    vertices = []
-    faces = []
-    with open(path, "r") as f:
-        for line in f:
-            if line.startswith("v "):
-                parts = line.strip().split()
-                vertices.append(tuple(float(x) for x in parts[1:4]))
-            elif line.startswith("f "):
-                parts = line.strip().split()[1:]
-                face = [int(p.split("/")[0]) - 1 for p in parts]
-                faces.append(face)
-    return vertices, faces
-
-def write_obj(path, vertices, faces):
-    with open(path, "w") as f:
-        for v in vertices:
-            f.write("v {:.6f} {:.6f} {:.6f}\n".format(*v))
-        for face in faces:
-            # OBJ is 1-indexed
-            f.write("f {}\n".format(" ".join(str(i+1) for i in face)))
-
-def remove_nonmanifold(input_path, output_path):
-    vertices, faces = parse_obj(input_path)
-
-    # build edge map
-    edge_faces = defaultdict(list)
-    for fi, f in enumerate(faces):
-        for i in range(len(f)):
-            a, b = f[i], f[(i + 1) % len(f)]
-            edge = tuple(sorted((a, b)))
-            edge_faces[edge].append(fi)
+    vertices, face_offsets, face_indices = load_obj(path)
+    return vertices, face_lists(face_offsets, face_indices)
+
+def write_obj(path, vertices, faces, groups=None, precision=6):
+    # faces as lists of 0-based indices; bulk writer from obj_io
+    face_offsets, face_indices = faces_to_csr(faces)
+    obj_io.write_obj(path, vertices, face_offsets, face_indices, groups, precision)
+
+def remove_nonmanifold(input_path, output_path, cache=None, profiler=None):
+    # cache: optional mesh_cache.MeshCache, reuses the parsed arrays of unchanged inputs
+    # profiler: optional mesh_profile.Profiler (default: from OBJ_DOCTOR_PROFILE, emitted at the end)
+    prof = profiler if profiler is not None else profiler_from_env(label=f"remove_nonmanifold:{input_path}")
+    with prof.stage("parse") as st:
+        if cache is not None:
+            vertices, face_offsets, face_indices = cache.load_obj(input_path)
+            groups = cache.groups(input_path)
+        else:
+            vertices, face_offsets, face_indices, groups = load_obj(input_path, with_groups=True)
+        nfaces = len(face_offsets) - 1
+        st.items = nfaces
+
+    # edge table + edge -> face CSR
+    with prof.stage("edge_build", items=len(face_indices)):
+        if cache is not None:
+            edges = cache.edge_table(input_path, face_offsets, face_indices, len(vertices))
+        else:
+            edges = EdgeTable(face_offsets, face_indices, len(vertices))
 
     # find bad faces (that touch non-manifold edges)
-    bad_faces = set()
-    for edge, used in edge_faces.items():
-        if len(used) > 2:  # non manifold
-            bad_faces.update(used)
-
-    cleaned_faces = [f for i, f in enumerate(faces) if i not in bad_faces]
-
-    print(f"Removed {len(bad_faces)} non-manifold faces out of {len(faces)}")
-
-    write_obj(output_path, vertices, cleaned_faces)
+    with prof.stage("select") as st:
+        bad = np.zeros(nfaces, dtype=bool)
+        bad[edges.faces_of(np.flatnonzero(edges.nonmanifold_mask))] = True
+        bad_faces = np.flatnonzero(bad)
+
+        cleaned_offsets, cleaned_indices = select_faces(face_offsets, face_indices, ~bad)
+        if groups is not None:
+            groups = select_groups(groups, ~bad)
+        st.items = len(bad_faces)
+
+    print(f"Removed {len(bad_faces)} non-manifold faces out of {nfaces}")
+
+    with prof.stage("write", items=nfaces - len(bad_faces)):
+        obj_io.write_obj(output_path, vertices, cleaned_offsets, cleaned_indices, groups, precision=6)
+    if profiler is None:
+        prof.emit()
 
 # Esempio di uso:
 # remove_nonmanifold("unione_cleaned.obj", "unione_no_nonmanifold.obj")
@@ -1,121 +1,164 @@
 import numpy as np
-from collections import defaultdict, Counter
-import copy
+from mesh_data import Mesh
+from mesh_topology import MeshTopology, vertex_fans, split_vertex_fans
+from mesh_profile import profiler_from_env
 
 class MeshRepair:
-    def __init__(self):
-        self.vertices = []
-        self.faces = []
-        self.vertex_counter = 0
+    def __init__(self, dtype=np.float64):
+        # Vertici e facce in array (mesh_data.Mesh); dtype=np.float32 dimezza le coordinate
+        self.dtype = dtype
+        self.mesh = Mesh.empty(dtype)
+        # (vecchio, nuovo, faccia) per ogni vertice duplicato da repair_mesh
+        self.vertex_remap = np.zeros((0, 3), dtype=np.int64)
+        # Indice topologico (mesh_topology.MeshTopology) condiviso da tutte le query;
+        # va rimesso a None se self.mesh viene modificata dall'esterno
+        self.topology = None
         
     def load_obj(self, obj_content):
         """Carica una mesh da contenuto OBJ"""
-        lines = obj_content.strip().split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('v '):
-                # Vertice
-                coords = list(map(float, line.split()[1:4]))
-                self.vertices.append(coords)
-                self.vertex_counter += 1
-            elif line.startswith('f '):
-                # Faccia (converti da 1-indexed a 0-indexed)
-                face_data = line.split()[1:]
-                face = []
-                for vertex_data in face_data:
-                    # Gestisce il formato v/vt/vn prendendo solo l'indice del vertice
-                    vertex_idx = int(vertex_data.split('/')[0]) - 1
-                    face.append(vertex_idx)
-                self.faces.append(face)
+        # Parse in blocco (gestisce v/vt/vn e indici negativi), con la struttura o/g
+        self.mesh = Mesh.from_obj(obj_content, self.dtype)
+        self.topology = MeshTopology(self.mesh.face_offsets, self.mesh.face_indices, self.mesh.nverts)
+    
+    def get_topology(self):
+        """Indice topologico della mesh, costruito alla prima richiesta e poi riusato"""
+        if self.topology is None:
+            self.topology = MeshTopology(self.mesh.face_offsets, self.mesh.face_indices, self.mesh.nverts)
+        return self.topology
     
     def get_edges(self):
-        """Estrae tutti gli edge dalle facce"""
-        edges = defaultdict(list)
-        
-        for face_idx, face in enumerate(self.faces):
-            n = len(face)
-            for i in range(n):
-                v1 = face[i]
-                v2 = face[(i + 1) % n]
-                # Normalizza l'edge (vertice minore primo)
-                edge = tuple(sorted([v1, v2]))
-                edges[edge].append(face_idx)
-        
-        return edges
+        """Estrae tutti gli edge dalle facce (tabella su array, vedi mesh_topology.EdgeTable)"""
+        return self.get_topology().edges
     
     def find_non_manifold_edges(self):
         """Trova gli edge non-manifold (usati da più di 2 facce)"""
         edges = self.get_edges()
-        non_manifold_edges = {}
+        return edges.edge_face_dict(edges.nonmanifold_mask)
+    
+    def find_non_manifold_vertices(self):
+        """Trova i vertici non-manifold (bowtie): {vertice: numero di ventagli di facce}"""
+        topology = self.get_topology()
+        _, n_fans = vertex_fans(topology.face_offsets, topology.face_indices, topology.edges)
+        ids = np.flatnonzero(n_fans > 1)
+        return dict(zip(ids.tolist(), n_fans[ids].tolist()))
+    
+    def split_non_manifold_vertices(self, profiler=None):
+        """Separa i vertici non-manifold dando un vertice proprio a ogni ventaglio
+
+        Il ventaglio con la prima faccia mantiene il vertice originale, ogni
+        altro riceve una copia (stessa posizione). Le righe (vecchio, nuovo,
+        faccia) di ogni corner spostato si aggiungono a self.vertex_remap.
+        """
+        prof = profiler if profiler is not None else profiler_from_env(label="split_non_manifold_vertices")
+        topology = self.get_topology()
+        with prof.stage("vertex_fans", items=len(topology.face_indices)):
+            fans, n_fans = vertex_fans(topology.face_offsets, topology.face_indices, topology.edges)
+            n_bowties = int(np.count_nonzero(n_fans > 1))
         
-        for edge, face_list in edges.items():
-            if len(face_list) > 2:
-                non_manifold_edges[edge] = face_list
-                
-        return non_manifold_edges
+        if n_bowties == 0:
+            print("Nessun vertice non-manifold")
+            if profiler is None:
+                prof.emit()
+            return {"non_manifold_vertices": 0, "duplicated_vertices": 0, "faces_changed": 0}
+        
+        print(f"Trovati {n_bowties} vertici non-manifold")
+        
+        with prof.stage("split", items=n_bowties):
+            nverts = self.mesh.nverts
+            repaired, old = split_vertex_fans(topology.face_indices, fans, nverts)
+            corners = np.flatnonzero(repaired != topology.face_indices)
+            self.mesh.add_vertices(self.mesh.verts[old])
+            # le facce cambiate vengono riscritte per intero nell'indice
+            changed = np.unique(topology.half_edge_face[corners])
+            changed_corners = topology.face_corners(changed)
+            self.mesh.face_indices[corners] = repaired[corners]
+            topology.replace_face_corners(changed, repaired[changed_corners], self.mesh.nverts)
+        
+        new = repaired[corners]
+        remap = np.stack([old[new - nverts], new, topology.half_edge_face[corners]], axis=1)
+        self.vertex_remap = np.concatenate([self.vertex_remap, remap])
+        print(f"Duplicati {len(old)} vertici in {len(changed)} facce")
+        if profiler is None:
+            prof.emit()
+        return {"non_manifold_vertices": n_bowties, "duplicated_vertices": len(old), "faces_changed": len(changed)}
     
-    def repair_mesh(self):
-        """Ripara la mesh duplicando i vertici degli edge non-manifold"""
-        non_manifold_edges = self.find_non_manifold_edges()
+    def repair_mesh(self, profiler=None, split_vertices=False):
+        """Ripara la mesh duplicando i vertici degli edge non-manifold
+
+        Per ogni edge non-manifold le prime 2 facce mantengono i vertici
+        originali; ogni altra faccia riceve una copia propria di entrambi i
+        vertici dell'edge (una per coppia vertice/faccia). Tocca solo le facce
+        coinvolte e alloca tutti i nuovi vertici in un colpo. In
+        self.vertex_remap resta, per ogni vertice creato, (vecchio, nuovo, faccia).
+        Con split_vertices=True separa poi anche i vertici non-manifold
+        (vedi split_non_manifold_vertices).
+        """
+        prof = profiler if profiler is not None else profiler_from_env(label="repair_mesh")
+        with prof.stage("edge_build", items=self.mesh.nfaces):
+            edges = self.get_edges()
+            nm_ids = np.flatnonzero(edges.nonmanifold_mask)
         
-        if not non_manifold_edges:
+        if len(nm_ids) == 0:
             print("La mesh è già manifold!")
-            return
+            self.vertex_remap = np.zeros((0, 3), dtype=np.int64)
+            result = {"non_manifold_edges": 0, "duplicated_vertices": 0, "faces_changed": 0}
+            if split_vertices:
+                result.update(self._split_result(prof))
+            if profiler is None:
+                prof.emit()
+            return result
+        
+        print(f"Trovati {len(nm_ids)} edge non-manifold")
         
-        print(f"Trovati {len(non_manifold_edges)} edge non-manifold")
+        with prof.stage("repair", items=len(nm_ids)):
+            # Coppie (faccia, vertice) che ricevono un vertice duplicato
+            faces, owner = edges.faces_of(nm_ids, skip=2, return_edges=True)
+            nverts = self.mesh.nverts
+            ends = edges.edges[owner]
+            pair_keys = np.unique(np.concatenate([faces * nverts + ends[:, 0], faces * nverts + ends[:, 1]]))
+            old = pair_keys % nverts
+            pair_faces = pair_keys // nverts
+            new = nverts + np.arange(len(pair_keys), dtype=np.int64)
         
-        # Mappa per tenere traccia dei nuovi vertici creati
-        vertex_mapping = {}  # (original_vertex, face_group) -> new_vertex_idx
-        new_faces = copy.deepcopy(self.faces)
+            # Nuovi vertici allocati in blocco
+            self.mesh.add_vertices(self.mesh.verts[old])
         
-        for edge, face_list in non_manifold_edges.items():
-            v1, v2 = edge
-            print(f"Riparando edge ({v1}, {v2}) usato da {len(face_list)} facce: {face_list}")
-            
-            # Raggruppa le facce: le prime 2 mantengono i vertici originali,
-            # le altre ottengono vertici duplicati
-            faces_to_keep_original = face_list[:2]
-            faces_to_duplicate = face_list[2:]
-            
-            for face_idx in faces_to_duplicate:
-                face = new_faces[face_idx]
-                new_face = []
-                
-                for vertex_idx in face:
-                    if vertex_idx in [v1, v2]:
-                        # Questo vertice fa parte dell'edge non-manifold
-                        key = (vertex_idx, face_idx)
-                        
-                        if key not in vertex_mapping:
-                            # Crea un nuovo vertice duplicando quello originale
-                            new_vertex_idx = len(self.vertices)
-                            self.vertices.append(self.vertices[vertex_idx].copy())
-                            vertex_mapping[key] = new_vertex_idx
-                            print(f"  Duplicato vertice {vertex_idx} -> {new_vertex_idx} per faccia {face_idx}")
-                        
-                        new_face.append(vertex_mapping[key])
-                    else:
-                        new_face.append(vertex_idx)
-                
-                new_faces[face_idx] = new_face
+            # Sostituzione dei corner delle sole facce coinvolte
+            topology = self.get_topology()
+            changed = np.unique(pair_faces)
+            corners = topology.face_corners(changed)
+            corner_keys = topology.half_edge_face[corners] * nverts + topology.face_indices[corners]
+            pos = np.searchsorted(pair_keys, corner_keys).clip(max=len(pair_keys) - 1)
+            hit = pair_keys[pos] == corner_keys
+            repaired = topology.face_indices[corners]
+            repaired[hit] = new[pos[hit]]
+            self.mesh.face_indices[corners] = repaired
+            # Aggiornamento incrementale dell'indice invece di ricostruirlo
+            topology.replace_face_corners(changed, repaired, self.mesh.nverts)
         
-        self.faces = new_faces
-        print(f"Riparazione completata. Vertici: {len(self.vertices)}, Facce: {len(self.faces)}")
+        self.vertex_remap = np.stack([old, new, pair_faces], axis=1)
+        print(f"Duplicati {len(new)} vertici in {len(changed)} facce")
+        result = {"non_manifold_edges": len(nm_ids), "duplicated_vertices": len(new), "faces_changed": len(changed)}
+        if split_vertices:
+            result.update(self._split_result(prof))
+        print(f"Riparazione completata. Vertici: {self.mesh.nverts}, Facce: {self.mesh.nfaces}")
+        if profiler is None:
+            prof.emit()
+        return result
+    
+    def _split_result(self, prof):
+        """Chiavi aggiunte da repair_mesh(split_vertices=True)"""
+        split = self.split_non_manifold_vertices(profiler=prof)
+        return {"non_manifold_vertices": split["non_manifold_vertices"], "split_vertices": split["duplicated_vertices"]}
     
-    def save_obj(self, filename):
+    def save_obj(self, filename, precision=None):
         """Salva la mesh riparata in formato OBJ"""
-        with open(filename, 'w') as f:
-            # Scrivi i vertici
-            for vertex in self.vertices:
-                f.write(f"v {vertex[0]} {vertex[1]} {vertex[2]}\n")
-            
-            # Scrivi le facce (converti da 0-indexed a 1-indexed)
-            f.write("o default\n")
-            f.write("g default\n")
-            for face in self.faces:
-                face_str = " ".join(str(v + 1) for v in face)
-                f.write(f"f {face_str}\n")
+        # Scrittura a blocchi; mantiene la struttura o/g letta da load_obj
+        mesh = self.mesh
+        if mesh.groups is None:
+            mesh = Mesh(mesh.verts, mesh.face_offsets, mesh.face_indices,
+                        (np.zeros(2, dtype=np.int64), ["o default", "g default"]), dtype=mesh.verts.dtype)
+        mesh.save(filename, precision)
     
     def print_mesh_info(self):
         """Stampa informazioni sulla mesh"""
@@ -123,10 +166,11 @@ class MeshRepair:
         non_manifold = self.find_non_manifold_edges()
         
         print(f"Informazioni Mesh:")
-        print(f"  Vertici: {len(self.vertices)}")
-        print(f"  Facce: {len(self.faces)}")
+        print(f"  Vertici: {self.mesh.nverts}")
+        print(f"  Facce: {self.mesh.nfaces}")
         print(f"  Edge totali: {len(edges)}")
         print(f"  Edge non-manifold: {len(non_manifold)}")
+        print(f"  Vertici non-manifold: {len(self.find_non_manifold_vertices())}")
         
         if non_manifold:
             print("  Dettagli edge non-manifold:")
@@ -0,0 +1,347 @@
+# Cache su disco delle mesh gia' parsate.
+#
+# Ogni voce e' una cartella con un file .npy per array (verts, face_offsets,
+# face_indices, la struttura o/g e, opzionalmente, la tabella degli edge) piu'
+# un meta.json.
+# Gli array vengono riaperti con np.load(mmap_mode="r"), quindi un hit non
+# rilegge ne' riparsa il file OBJ. La chiave e' path + dimensione + mtime
+# oppure, a richiesta, un hash del contenuto.
+#
+# ComponentCache conserva invece i risultati di analyze per singolo pezzo di
+# mesh (vedi mesh_incremental), uno per file JSON chiamato con l'impronta del
+# pezzo: vale per qualunque file in cui il pezzo ricompare identico.
+#
+# MemoryMeshCache tiene in RAM, per un processo che vive a lungo (vedi
+# mesh_server), le mesh parsate con la loro topologia e i risultati gia'
+# calcolati, in LRU con un budget in byte.
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from obj_io import load_obj
+from mesh_data import Mesh
+from mesh_topology import EdgeTable, MeshTopology
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "OBJ_DOCTOR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "obj-doctor")
+)
+DEFAULT_MAX_BYTES = 8 << 30
+DEFAULT_MEMORY_BYTES = 2 << 30
+
+_MESH_ARRAYS = ("verts", "face_offsets", "face_indices")
+_GROUP_ARRAYS = ("group_faces", "group_lines")
+_EDGE_PREFIX = "edges."
+
+
+def _group_arrays(groups):
+    group_faces, group_lines = groups
+    return {"group_faces": group_faces, "group_lines": np.array(group_lines, dtype=str)}
+
+
+def _dir_size(path):
+    return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+
+
+def _content_hash(path, block=1 << 24):
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(block)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class MeshCache:
+    """Cache LRU di array mesh memory-mappable, limitata a max_bytes su disco."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, content_hash=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.content_hash = content_hash
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, path):
+        path = os.path.abspath(path)
+        if self.content_hash:
+            return _content_hash(path)
+        st = os.stat(path)
+        ident = f"{path}\0{st.st_size}\0{st.st_mtime_ns}"
+        return hashlib.blake2b(ident.encode(), digest_size=20).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, path, names=_MESH_ARRAYS, key=None):
+        """Array in cache per il file (mmap in sola lettura) oppure None.
+
+        key, se gia' calcolata da self.key(path), evita di ricalcolarla (con
+        content_hash e' una lettura di tutto il file). Una voce sparita o
+        incompleta, ad esempio rimossa da evict() di un altro processo mentre
+        la si apre, e' un miss.
+        """
+        entry = self._entry(key or self.key(path))
+        try:
+            # l'mtime di meta.json registra l'ultimo accesso per l'LRU
+            os.utime(os.path.join(entry, "meta.json"))
+            return {name: np.load(os.path.join(entry, name + ".npy"), mmap_mode="r") for name in names}
+        except (OSError, ValueError, EOFError):
+            return None
+
+    def put(self, path, arrays, key=None):
+        """Salva (o integra) gli array di una voce e applica il limite di dimensione."""
+        key = key or self.key(path)
+        entry = self._entry(key)
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.cache_dir)
+        try:
+            for name, arr in arrays.items():
+                np.save(os.path.join(tmp, name + ".npy"), np.ascontiguousarray(arr))
+            meta = {"source": os.path.abspath(path), "created": time.time()}
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                json.dump(meta, f)
+            os.makedirs(entry, exist_ok=True)
+            # os.replace per file: un lettore concorrente vede il vecchio o il nuovo array
+            for name in os.listdir(tmp):
+                os.replace(os.path.join(tmp, name), os.path.join(entry, name))
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict(keep=key)
+
+    def load_obj(self, path):
+        """Come obj_io.load_obj, ma riusa la cache quando il file non e' cambiato."""
+        key = self.key(path)
+        hit = self.get(path, key=key)
+        if hit is not None:
+            return tuple(hit[name] for name in _MESH_ARRAYS)
+        verts, face_offsets, face_indices, groups = load_obj(path, with_groups=True)
+        self.put(path, {"verts": verts, "face_offsets": face_offsets, "face_indices": face_indices,
+                        **_group_arrays(groups)}, key=key)
+        return verts, face_offsets, face_indices
+
+    def groups(self, path):
+        """Struttura o/g del file, come load_obj(..., with_groups=True)[3]."""
+        key = self.key(path)
+        hit = self.get(path, _GROUP_ARRAYS, key=key)
+        if hit is not None:
+            return np.asarray(hit["group_faces"]), hit["group_lines"].tolist()
+        # voce salvata senza gruppi
+        groups = load_obj(path, with_groups=True)[3]
+        self.put(path, _group_arrays(groups), key=key)
+        return groups
+
+    def edge_table(self, path, face_offsets, face_indices, nverts):
+        """EdgeTable della mesh in path, dalla cache o costruita e salvata."""
+        names = tuple(_EDGE_PREFIX + name for name in EdgeTable.ARRAYS)
+        key = self.key(path)
+        hit = self.get(path, names, key=key)
+        if hit is not None:
+            return EdgeTable.from_arrays({n[len(_EDGE_PREFIX):]: a for n, a in hit.items()}, nverts)
+        edges = EdgeTable(face_offsets, face_indices, nverts)
+        self.put(path, {_EDGE_PREFIX + n: a for n, a in edges.to_arrays().items()}, key=key)
+        return edges
+
+    def invalidate(self, path=None):
+        """Rimuove la voce di path (anche se il file e' cambiato), o tutta la cache."""
+        if path is None:
+            for name in os.listdir(self.cache_dir):
+                shutil.rmtree(self._entry(name), ignore_errors=True)
+            return
+        source = os.path.abspath(path)
+        for name in os.listdir(self.cache_dir):
+            meta = os.path.join(self._entry(name), "meta.json")
+            try:
+                with open(meta) as f:
+                    if json.load(f)["source"] != source:
+                        continue
+            except (OSError, ValueError, KeyError):
+                continue
+            shutil.rmtree(self._entry(name), ignore_errors=True)
+
+    def evict(self, keep=None):
+        """Elimina le voci usate meno di recente finche' la cache sta in max_bytes."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry = self._entry(name)
+            if name.startswith("."):
+                continue
+            try:
+                entries.append((os.stat(os.path.join(entry, "meta.json")).st_mtime, _dir_size(entry), name))
+            except OSError:
+                # voce senza meta.json, o rimossa nel frattempo da un altro processo
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(self._entry(name), ignore_errors=True)
+            total -= size
+
+
+class ComponentCache:
+    """Risultati per pezzo (dict JSON) indicizzati per impronta, LRU su disco."""
+
+    def __init__(self, cache_dir=os.path.join(DEFAULT_CACHE_DIR, "components"), max_bytes=DEFAULT_MAX_BYTES >> 4):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _file(self, fingerprint):
+        return os.path.join(self.cache_dir, fingerprint[:2], fingerprint + ".json")
+
+    def get(self, fingerprint):
+        try:
+            with open(self._file(fingerprint)) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # l'mtime registra l'ultimo accesso per l'LRU
+        os.utime(self._file(fingerprint))
+        return result
+
+    def put(self, fingerprint, result):
+        path = self._file(fingerprint)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+        with os.fdopen(fd, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp, path)
+
+    def invalidate(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def evict(self):
+        """Elimina i risultati usati meno di recente finche' la cache sta in max_bytes."""
+        entries = []
+        for shard in os.scandir(self.cache_dir):
+            if shard.is_dir():
+                entries.extend((e.stat().st_mtime, e.stat().st_size, e.path)
+                               for e in os.scandir(shard.path) if not e.name.startswith("."))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+
+def _nbytes(obj, seen=None):
+    """Byte degli array NumPy raggiungibili da obj (dict, liste, attributi)."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sum(_nbytes(v, seen) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(_nbytes(v, seen) for v in obj)
+    if hasattr(obj, "__dict__"):
+        return _nbytes(vars(obj), seen)
+    return 0
+
+
+class MemoryMeshCache:
+    """Mesh parsate, topologia e risultati in RAM, LRU entro max_bytes.
+
+    load_obj, groups ed edge_table hanno la stessa firma di MeshCache, quindi
+    la cache vale come cache= di check.analyze e di remove_nonmanifold. La
+    voce di un file e' chiave path + dimensione + mtime: un file modificato
+    viene riparsato. Gli array restituiti sono condivisi e vanno trattati in sola
+    lettura. Il budget e' applicato da evict(), da chiamare tra una richiesta
+    e l'altra: una mesh piu' grande di max_bytes serve la sua richiesta e poi
+    esce dalla cache.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MEMORY_BYTES, workers=None):
+        self.max_bytes = max_bytes
+        # processi del parse (obj_io.load_obj)
+        self.workers = workers
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        return path, st.st_size, st.st_mtime_ns
+
+    def _entry(self, path):
+        key = self.key(path)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        # versioni precedenti dello stesso file
+        for old in [k for k in self._entries if k[0] == key[0]]:
+            del self._entries[old]
+        entry = {"mesh": Mesh.load(key[0], workers=self.workers), "topology": None, "results": {}}
+        self._entries[key] = entry
+        return entry
+
+    def mesh(self, path):
+        """mesh_data.Mesh del file, con la struttura o/g."""
+        return self._entry(path)["mesh"]
+
+    def topology(self, path):
+        """mesh_topology.MeshTopology del file, costruita alla prima richiesta."""
+        entry = self._entry(path)
+        if entry["topology"] is None:
+            mesh = entry["mesh"]
+            entry["topology"] = MeshTopology(mesh.face_offsets, mesh.face_indices, mesh.nverts)
+        return entry["topology"]
+
+    def load_obj(self, path):
+        mesh = self.mesh(path)
+        return mesh.verts, mesh.face_offsets, mesh.face_indices
+
+    def groups(self, path):
+        return self.mesh(path).groups
+
+    def edge_table(self, path, face_offsets, face_indices, nverts):
+        return self.topology(path).edges
+
+    def result(self, path, name, compute):
+        """Risultato name del file: calcolato con compute() una volta per versione del file."""
+        results = self._entry(path)["results"]
+        if name not in results:
+            results[name] = compute()
+        return results[name]
+
+    def invalidate(self, path=None):
+        if path is None:
+            self._entries.clear()
+            return
+        source = os.path.abspath(path)
+        for key in [k for k in self._entries if k[0] == source]:
+            del self._entries[key]
+
+    def nbytes(self):
+        return sum(_nbytes(entry) for entry in self._entries.values())
+
+    def evict(self):
+        """Elimina le voci usate meno di recente finche' la cache sta in max_bytes."""
+        sizes = [_nbytes(entry) for entry in self._entries.values()]
+        total = sum(sizes)
+        for key, size in zip(list(self._entries), sizes):
+            if total <= self.max_bytes:
+                break
+            del self._entries[key]
+            total -= size
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self.nbytes(), "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,106 @@
+# Client di mesh_server.
+#
+# Usa solo la libreria standard: chi lo lancia come processo non paga
+# l'import di NumPy, che resta nel server. Il protocollo e' una riga JSON per
+# richiesta e una per risposta:
+#   {"id": 1, "op": "analyze", "path": "/abs/mesh.obj", "tol": 1e-6}
+#   {"id": 1, "ok": true, "result": {...}, "log": ""}
+# I percorsi sono resi assoluti qui, perche' il server ha un'altra cartella
+# di lavoro. Su TCP ogni richiesta porta anche "token": il server lo scrive
+# all'avvio in un file leggibile solo dall'utente che lo ha lanciato.
+
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+DEFAULT_SOCKET = os.environ.get(
+    "OBJ_DOCTOR_SOCKET", os.path.join(tempfile.gettempdir(), f"obj-doctor-{os.getuid()}.sock")
+)
+HOST = "127.0.0.1"
+DEFAULT_TOKEN_FILE = os.environ.get(
+    "OBJ_DOCTOR_TOKEN_FILE", os.path.join(os.path.expanduser("~"), ".cache", "obj-doctor", "server.token")
+)
+# parametri che sono percorsi di file
+PATH_PARAMS = ("path", "output", "reoriented_path")
+
+
+def connect(address=DEFAULT_SOCKET, timeout=None):
+    """Socket connesso al server: address e' il percorso del socket Unix o una porta su localhost."""
+    if isinstance(address, int):
+        return socket.create_connection((HOST, address), timeout=timeout)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(address)
+    return sock
+
+
+def read_token(token_file=DEFAULT_TOKEN_FILE):
+    """Token del server in ascolto su TCP."""
+    with open(token_file) as f:
+        return f.read().strip()
+
+
+def request(op, address=DEFAULT_SOCKET, timeout=None, token=None, **params):
+    """Invia una richiesta e restituisce la risposta (dict con ok, result o error, log).
+
+    Su TCP (address intero) senza token lo legge da DEFAULT_TOKEN_FILE.
+    """
+    params = {k: os.path.abspath(v) if k in PATH_PARAMS and v is not None else v for k, v in params.items()}
+    if token is None and isinstance(address, int):
+        token = read_token()
+    if token is not None:
+        params["token"] = token
+    with connect(address, timeout) as sock, sock.makefile("rwb") as f:
+        f.write(json.dumps({"op": op, **params}).encode() + b"\n")
+        f.flush()
+        line = f.readline()
+    if not line:
+        raise ConnectionError("the server closed the connection")
+    return json.loads(line)
+
+
+def call(op, address=DEFAULT_SOCKET, timeout=None, token=None, **params):
+    """Come request, ma restituisce solo result e solleva RuntimeError se la richiesta fallisce."""
+    response = request(op, address, timeout, token, **params)
+    if not response["ok"]:
+        raise RuntimeError(response["error"])
+    return response["result"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send one request to a running mesh_server.py.")
+    parser.add_argument("op", choices=("analyze", "remove_nonmanifold", "repair", "visualize", "stats"))
+    parser.add_argument("path", nargs="?", help="OBJ file (all ops but stats)")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket of the server (default %(default)s)")
+    parser.add_argument("--port", type=int, default=None, help="connect to 127.0.0.1:PORT instead of the socket")
+    parser.add_argument("--token-file", default=DEFAULT_TOKEN_FILE,
+                        help="token written by a server started with --port (default %(default)s)")
+    parser.add_argument("-o", "--output", default=None,
+                        help="output file (remove_nonmanifold, repair; visualize defaults to <name>.html)")
+    parser.add_argument("--tol", type=float, default=None, help="near-duplicate tolerance (analyze)")
+    parser.add_argument("--split-vertices", action="store_true", help="also split bowtie vertices (repair)")
+    parser.add_argument("--max-triangles", type=int, default=None, help="reduced surface budget (visualize)")
+    args = parser.parse_args(argv)
+    if args.op != "stats" and args.path is None:
+        parser.error(f"{args.op} needs a path")
+    params = {"path": args.path, "output": args.output, "tol": args.tol, "max_triangles": args.max_triangles,
+              "split_vertices": args.split_vertices or None}
+    params = {k: v for k, v in params.items() if v is not None}
+    if args.port is not None:
+        response = request(args.op, args.port, token=read_token(args.token_file), **params)
+    else:
+        response = request(args.op, args.socket, **params)
+    if response.get("log"):
+        sys.stderr.write(response["log"])
+    if not response["ok"]:
+        print(response["error"], file=sys.stderr)
+        return 1
+    print(json.dumps(response["result"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+# Contenitore compatto di una mesh: coordinate contigue e facce in CSR.
+#
+# Al posto di una list Python per vertice e per faccia (oltre 100 byte per
+# vertice) la mesh e':
+#   verts        (N,3) float64, oppure float32 per dimezzare la memoria
+#   face_offsets (F+1,) int64  -> la faccia i usa face_indices[offsets[i]:offsets[i+1]]
+#   face_indices (sum,) int64  indici 0-based
+#   groups       struttura o/g di obj_io (group_faces, group_lines) oppure None
+# Le viste (face_range, group_views, components) condividono coordinate e indici
+# con la mesh da cui vengono; di una vista si ricalcolano solo gli offset.
+
+import numpy as np
+
+from obj_io import parse_obj_bytes, load_obj, faces_to_csr, select_groups, write_obj
+from mesh_topology import EdgeTable, face_components, face_sizes, select_faces
+
+
+class Mesh:
+    """Vertici (N,3) contigui e facce CSR, con la struttura o/g facoltativa."""
+
+    def __init__(self, verts, face_offsets, face_indices, groups=None, dtype=np.float64):
+        self.verts = np.ascontiguousarray(verts, dtype=dtype).reshape(-1, 3)
+        self.face_offsets = np.asarray(face_offsets, dtype=np.int64)
+        self.face_indices = np.asarray(face_indices, dtype=np.int64)
+        self.groups = groups
+
+    @classmethod
+    def empty(cls, dtype=np.float64):
+        return cls(np.zeros((0, 3)), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64), dtype=dtype)
+
+    @classmethod
+    def from_obj(cls, data, dtype=np.float64, with_groups=True, workers=None):
+        """Mesh da contenuto OBJ (bytes o str), vedi obj_io.parse_obj_bytes;
+        i buffer grandi sono letti in parallelo (workers=1 per il parse seriale)."""
+        return cls(*parse_obj_bytes(data, with_groups=with_groups, workers=workers), dtype=dtype)
+
+    @classmethod
+    def load(cls, path, dtype=np.float64, with_groups=True, workers=None):
+        return cls(*load_obj(path, with_groups=with_groups, workers=workers), dtype=dtype)
+
+    @classmethod
+    def from_lists(cls, vertices, faces, dtype=np.float64):
+        """Mesh da liste di vertici [x, y, z] e facce [i, j, k, ...]."""
+        return cls(np.asarray(vertices, dtype=dtype).reshape(-1, 3), *faces_to_csr(faces), dtype=dtype)
+
+    @property
+    def nverts(self):
+        return len(self.verts)
+
+    @property
+    def nfaces(self):
+        return len(self.face_offsets) - 1
+
+    @property
+    def nbytes(self):
+        return self.verts.nbytes + self.face_offsets.nbytes + self.face_indices.nbytes
+
+    def face(self, i):
+        """Indici dei vertici della faccia i (vista)."""
+        return self.face_indices[self.face_offsets[i]:self.face_offsets[i + 1]]
+
+    def add_vertices(self, positions):
+        """Accoda vertici; restituisce i loro indici."""
+        start = self.nverts
+        self.verts = np.concatenate([self.verts, np.asarray(positions, dtype=self.verts.dtype).reshape(-1, 3)])
+        return np.arange(start, self.nverts, dtype=np.int64)
+
+    def face_range(self, start, stop):
+        """Facce start..stop-1 come Mesh che condivide vertici e indici.
+
+        Gli indici dei vertici restano quelli della mesh intera; della
+        struttura o/g restano le righe che cadono dentro il tratto.
+        """
+        lo, hi = self.face_offsets[start], self.face_offsets[stop]
+        groups = None
+        if self.groups is not None:
+            group_faces, group_lines = self.groups
+            inside = (group_faces >= start) & (group_faces < stop)
+            groups = (group_faces[inside] - start, [line for line, k in zip(group_lines, inside) if k])
+        return Mesh(self.verts, self.face_offsets[start:stop + 1] - lo, self.face_indices[lo:hi], groups,
+                    dtype=self.verts.dtype)
+
+    def select(self, keep):
+        """Copia con le sole facce dove keep e' True (vertici condivisi)."""
+        offsets, indices = select_faces(self.face_offsets, self.face_indices, keep)
+        groups = select_groups(self.groups, keep) if self.groups is not None else None
+        return Mesh(self.verts, offsets, indices, groups, dtype=self.verts.dtype)
+
+    def group_ranges(self):
+        """Tratti di facce consecutive sotto la stessa riga o/g: [(riga, inizio, fine)].
+
+        La riga e' l'ultima o/g prima del tratto ("" per le facce prima della
+        prima riga); i tratti vuoti sono omessi.
+        """
+        if self.groups is None:
+            return [("", 0, self.nfaces)] if self.nfaces else []
+        group_faces, group_lines = self.groups
+        cuts = np.append(np.asarray(group_faces, dtype=np.int64), self.nfaces)
+        ranges = [("", 0, int(cuts[0]))]
+        ranges += [(line, int(a), int(b)) for line, a, b in zip(group_lines, cuts[:-1], cuts[1:])]
+        return [r for r in ranges if r[2] > r[1]]
+
+    def group_views(self):
+        """(riga o/g, vista) per ogni tratto di group_ranges()."""
+        for line, start, stop in self.group_ranges():
+            yield line, self.face_range(start, stop)
+
+    def by_component(self, edges=None):
+        """(mesh, bounds): copia con le facce ordinate per componente connessa
+        (stabile) e bounds (C+1,) dei loro tratti; le componenti sono poi
+        viste con face_range(bounds[i], bounds[i+1])."""
+        if edges is None:
+            edges = EdgeTable(self.face_offsets, self.face_indices, self.nverts)
+        labels, sizes = face_components(edges, self.nfaces)
+        order = np.argsort(labels, kind="stable")
+        counts = face_sizes(self.face_offsets)[order]
+        offsets = np.zeros(self.nfaces + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        starts = np.repeat(self.face_offsets[:-1][order] - offsets[:-1], counts)
+        indices = self.face_indices[starts + np.arange(len(starts), dtype=np.int64)]
+        bounds = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=bounds[1:])
+        # l'ordine delle facce cambia: la struttura o/g non si applica piu'
+        return Mesh(self.verts, offsets, indices, dtype=self.verts.dtype), bounds
+
+    def components(self, edges=None):
+        """Viste delle componenti connesse, dalla copia ordinata di by_component()."""
+        mesh, bounds = self.by_component(edges)
+        for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            yield mesh.face_range(start, stop)
+
+    def save(self, path, precision=None):
+        """Scrive la mesh in OBJ (vedi obj_io.write_obj)."""
+        write_obj(path, self.verts, self.face_offsets, self.face_indices, self.groups, precision)
@@ -0,0 +1,91 @@
+# Grandezze geometriche per faccia calcolate in blocco sul layout CSR.
+#
+# Le facce sono raggruppate per numero di vertici: per ogni gruppo gli indici
+# formano una matrice (m, k) e tutti i calcoli sono vettorizzati.
+
+import numpy as np
+
+# facce processate per blocco, per limitare gli array temporanei (m, k, 3)
+CHUNK_FACES = 1 << 20
+
+
+def _faces_by_size(face_offsets):
+    """Per ogni dimensione k >= 3: (k, id delle facce con k vertici)."""
+    sizes = np.diff(face_offsets)
+    order = np.argsort(sizes, kind="stable")
+    sorted_sizes = sizes[order]
+    ks, starts = np.unique(sorted_sizes, return_index=True)
+    ends = np.append(starts[1:], len(order))
+    for k, s, e in zip(ks.tolist(), starts.tolist(), ends.tolist()):
+        if k >= 3:
+            yield k, order[s:e]
+
+
+def _group_kernel(verts, corners):
+    """Aree a ventaglio e normali di Newell (non normalizzate) per facce (m, k)."""
+    p = verts[corners]                               # (m, k, 3)
+    e = p[:, 1:] - p[:, :1]                          # v_i - v_0
+    fan = np.cross(e[:, :-1], e[:, 1:])              # (m, k-2, 3)
+    area = 0.5 * np.sqrt(np.einsum("mtj,mtj->mt", fan, fan)).sum(axis=1)
+    # Newell con origine in v_0: coincide con la somma dei prodotti del ventaglio
+    return area, fan.sum(axis=1)
+
+
+def face_areas_normals(verts, face_offsets, face_indices):
+    """Area (somma dei triangoli a ventaglio) e normale unitaria di ogni faccia.
+
+    La normale e' quella di Newell, corretta anche per n-goni concavi.
+    Facce con meno di 3 vertici o normale nulla hanno normale (0, 0, 0).
+    """
+    nfaces = len(face_offsets) - 1
+    areas = np.zeros(nfaces, dtype=np.float64)
+    normals = np.zeros((nfaces, 3), dtype=np.float64)
+    for k, face_ids in _faces_by_size(face_offsets):
+        for s in range(0, len(face_ids), CHUNK_FACES):
+            ids = face_ids[s:s + CHUNK_FACES]
+            corners = face_indices[face_offsets[ids][:, None] + np.arange(k)]
+            areas[ids], normals[ids] = _group_kernel(verts, corners)
+    length = np.linalg.norm(normals, axis=1)
+    nonzero = length > 0
+    normals[nonzero] /= length[nonzero, None]
+    return areas, normals
+
+
+def chain_stats(verts, src, dst, chain_offsets):
+    """Numero di edge, perimetro e bounding box di ogni catena di edge.
+
+    src/dst sono gli estremi degli edge, raggruppati per catena secondo
+    chain_offsets (come restituiti da mesh_topology.boundary_loops).
+    """
+    n_edges = np.diff(chain_offsets)
+    starts = chain_offsets[:-1]
+    if len(starts) == 0:
+        return n_edges, np.zeros(0), np.zeros((0, 3)), np.zeros((0, 3))
+    p = verts[src]
+    q = verts[dst]
+    perimeter = np.add.reduceat(np.linalg.norm(q - p, axis=1), starts)
+    bbox_min = np.minimum(np.minimum.reduceat(p, starts), np.minimum.reduceat(q, starts))
+    bbox_max = np.maximum(np.maximum.reduceat(p, starts), np.maximum.reduceat(q, starts))
+    return n_edges, perimeter, bbox_min, bbox_max
+
+
+def chain_summary(verts, src, dst, chain_offsets, closed, limit=6):
+    """Voci del sommario di analyze sui bordi: conteggi di loop e catene aperte
+    e dettagli delle limit catene di perimetro maggiore."""
+    n_edges, perimeter, bbox_min, bbox_max = chain_stats(verts, src, dst, chain_offsets)
+    top = np.argsort(-perimeter, kind="stable")[:limit]
+    return {
+        "n_boundary_loops": int(closed.sum()),
+        "n_open_boundary_chains": int((~closed).sum()),
+        "boundary_loops": [
+            {
+                "closed": bool(closed[i]),
+                "n_edges": int(n_edges[i]),
+                "perimeter": float(perimeter[i]),
+                "bbox_min": bbox_min[i].tolist(),
+                "bbox_max": bbox_max[i].tolist(),
+                "start_vertex": int(src[chain_offsets[i]]),
+            }
+            for i in top.tolist()
+        ],
+    }
@@ -0,0 +1,140 @@
+# Suddivisione della mesh in pezzi con impronta, per la ri-analisi incrementale.
+#
+# Un pezzo e' un insieme di facce connesse tramite vertici condivisi: unisce
+# le componenti (per edge) che si toccano in un vertice, cosi' ogni edge,
+# ogni loop di bordo e ogni vertice non-manifold sta in un solo pezzo e i
+# risultati di analyze su un pezzo non dipendono dal resto della mesh.
+# L'impronta di un pezzo dipende solo da posizioni e facce con indici locali
+# (rango del vertice tra quelli del pezzo): un pezzo non toccato mantiene la
+# sua impronta anche se le altre parti del file cambiano e gli indici globali
+# si spostano.
+
+import numpy as np
+
+from mesh_topology import face_sizes, select_faces, union_find, expand_ranges
+
+# cambia quando cambia il contenuto dei risultati salvati per pezzo
+FINGERPRINT_VERSION = 3
+# i pezzi piu' piccoli sono rianalizzati insieme a ogni esecuzione: costano
+# meno di una lettura dalla cache
+MIN_CACHED_FACES = 1024
+
+_M1 = np.uint64(0xBF58476D1CE4E5B9)
+_M2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix(x):
+    """splitmix64 (finalizzatore) su array uint64."""
+    x = x ^ (x >> np.uint64(30))
+    x = x * _M1
+    x = x ^ (x >> np.uint64(27))
+    x = x * _M2
+    return x ^ (x >> np.uint64(31))
+
+
+def submesh(verts, face_offsets, face_indices, keep):
+    """Sotto-mesh delle facce con keep True, vertici rinumerati per rango:
+    (verts, face_offsets, face_indices, vertici globali, facce globali).
+    Facce e vertici restano nell'ordine globale."""
+    offsets, indices = select_faces(face_offsets, face_indices, keep)
+    vertex_ids = np.unique(indices)
+    return (np.asarray(verts[vertex_ids], dtype=np.float64), offsets, np.searchsorted(vertex_ids, indices),
+            vertex_ids, np.flatnonzero(keep))
+
+
+def vertex_pieces(face_offsets, face_indices, nverts):
+    """Pezzo di ogni faccia (facce connesse tramite vertici), numerati
+    nell'ordine della loro prima faccia; restituisce (label, numero di pezzi)."""
+    sizes = face_sizes(face_offsets)
+    full = sizes > 0
+    heads = face_indices[face_offsets[:-1][full]]
+    roots = union_find(nverts, face_indices, np.repeat(heads, sizes[full]))
+    # una faccia vuota non tocca vertici: e' un pezzo a se'
+    face_roots = np.empty(len(sizes), dtype=np.int64)
+    face_roots[full] = roots[heads]
+    face_roots[~full] = nverts + np.flatnonzero(~full)
+    _, first_face, labels = np.unique(face_roots, return_index=True, return_inverse=True)
+    # rinumerazione per prima faccia
+    rank = np.empty(len(first_face), dtype=np.int64)
+    rank[np.argsort(first_face, kind="stable")] = np.arange(len(first_face))
+    return rank[labels], len(first_face)
+
+
+class Pieces:
+    """Facce della mesh raggruppate per pezzo, con indici locali.
+
+    face_order elenca le facce pezzo per pezzo (CSR su face_bounds, ordine
+    globale dentro il pezzo); vertex_ids e' la CSR su vertex_bounds dei
+    vertici di ogni pezzo in ordine crescente, quindi l'indice locale di un
+    vertice e' il suo rango. local_indices sono i corner di face_order in
+    indici locali.
+    """
+
+    def __init__(self, face_offsets, face_indices, nverts):
+        self.labels, self.count = vertex_pieces(face_offsets, face_indices, nverts)
+        sizes = face_sizes(face_offsets)
+        self.face_order = np.argsort(self.labels, kind="stable")
+        self.face_bounds = np.searchsorted(self.labels[self.face_order], np.arange(self.count + 1))
+        self.sizes = sizes[self.face_order]
+        corner_offsets = np.zeros(len(self.sizes) + 1, dtype=np.int64)
+        np.cumsum(self.sizes, out=corner_offsets[1:])
+        self.corner_bounds = corner_offsets[self.face_bounds]
+        _, pos = expand_ranges(face_offsets[:-1][self.face_order], self.sizes)
+        corners = face_indices[pos]
+        # ogni vertice usato sta in un solo pezzo: ordinati per (pezzo, indice)
+        piece_of_vertex = np.full(nverts, -1, dtype=np.int64)
+        piece_of_vertex[face_indices] = np.repeat(self.labels, sizes)
+        used = np.flatnonzero(piece_of_vertex >= 0)
+        self.vertex_ids = used[np.argsort(piece_of_vertex[used], kind="stable")]
+        self.vertex_bounds = np.searchsorted(piece_of_vertex[self.vertex_ids], np.arange(self.count + 1))
+        local = np.empty(nverts, dtype=np.int64)
+        local[self.vertex_ids] = np.arange(len(self.vertex_ids)) - np.repeat(
+            self.vertex_bounds[:-1], np.diff(self.vertex_bounds))
+        self.local_indices = local[corners]
+
+    def nfaces(self):
+        return np.diff(self.face_bounds)
+
+    def mesh(self, verts, piece):
+        """Sotto-mesh di un pezzo in indici locali:
+        (verts, face_offsets, face_indices, vertici globali, facce globali)."""
+        vertex_ids = self.vertex_ids[self.vertex_bounds[piece]:self.vertex_bounds[piece + 1]]
+        f0, f1 = self.face_bounds[piece], self.face_bounds[piece + 1]
+        offsets = np.zeros(f1 - f0 + 1, dtype=np.int64)
+        np.cumsum(self.sizes[f0:f1], out=offsets[1:])
+        indices = self.local_indices[self.corner_bounds[piece]:self.corner_bounds[piece + 1]]
+        return np.asarray(verts[vertex_ids], dtype=np.float64), offsets, indices, vertex_ids, self.face_order[f0:f1]
+
+    def fingerprints(self, verts):
+        """Impronta a 128 bit di ogni pezzo come stringa esadecimale.
+
+        Somma (mod 2^64) di termini mescolati con splitmix64, ognuno legato
+        alla sua posizione nel pezzo: dimensioni delle facce, indici locali
+        dei corner e bit delle coordinate (-0.0 normalizzato a 0.0).
+        """
+        n = self.count
+        bits = np.ascontiguousarray(np.asarray(verts[self.vertex_ids], dtype=np.float64) + 0.0).view(np.uint64)
+        out = []
+        for salt in (FINGERPRINT_VERSION, FINGERPRINT_VERSION + (1 << 32)):
+            s = np.uint64(salt)
+            h = np.zeros(n, dtype=np.uint64)
+            # gli elementi di un pezzo sono contigui: differenze di cumsum, in
+            # uint64 con overflow modulare (add.reduceat non ammette segmenti
+            # vuoti, come quelli delle facce vuote)
+            for bounds, values, tag in (
+                (self.vertex_bounds, bits[:, 0], 1), (self.vertex_bounds, bits[:, 1], 2),
+                (self.vertex_bounds, bits[:, 2], 3), (self.face_bounds, self.sizes, 4),
+                (self.corner_bounds, self.local_indices, 5),
+            ):
+                if not len(values):
+                    continue
+                # posizione di ogni elemento dentro il suo pezzo
+                counts = np.diff(bounds)
+                pos = np.arange(len(values)) - np.repeat(bounds[:-1], counts)
+                terms = _mix(values.astype(np.uint64) ^ _mix(pos.astype(np.uint64) * np.uint64(8) + np.uint64(tag) + s))
+                total = np.concatenate([np.zeros(1, dtype=np.uint64), np.cumsum(terms, dtype=np.uint64)])
+                h += total[bounds[1:]] - total[bounds[:-1]]
+            # lo stesso contenuto con piu' o meno vertici/facce deve differire
+            h ^= _mix(np.diff(self.vertex_bounds).astype(np.uint64) * _M1 + np.diff(self.face_bounds).astype(np.uint64) + s)
+            out.append(h)
+        return [f"{a:016x}{b:016x}" for a, b in zip(out[0].tolist(), out[1].tolist())]
@@ -0,0 +1,256 @@
+# Auto-intersezioni: coppie di facce che si attraversano.
+#
+# Le facce sono triangolate a ventaglio. Ogni triangolo va in tutte le celle
+# di una griglia uniforme toccate dal suo box; le coppie candidate sono i
+# triangoli nella stessa cella con box sovrapposti. Una coppia viene generata
+# solo nella cella che contiene l'angolo minimo dell'intersezione dei due box,
+# cosi' ogni coppia esce una volta sola senza deduplicare. Le candidate sono
+# poi provate a blocchi con un test triangolo-triangolo vettorizzato (rette di
+# intersezione dei piani, piu' un test 2D per i triangoli complanari).
+#
+# Non contano:
+#   - le coppie che condividono un vertice (vicini nella mesh);
+#   - i contatti in un punto o lungo un lato senza sovrapposizione (entro
+#     eps), es. i T-junction;
+#   - i triangoli degeneri (area nulla), gia' riportati come facce degeneri.
+
+import numpy as np
+
+from mesh_topology import face_sizes, fan_triangles, expand_ranges
+
+# coppie candidate provate per blocco
+PAIR_BATCH = 1 << 18
+# voci (triangolo, cella) per triangolo oltre cui la cella viene allargata
+MAX_CELLS_PER_TRIANGLE = 8
+# bit per asse della chiave esatta della cella
+_CELL_BITS = 21
+
+
+def triangle_faces(face_offsets, face_indices):
+    """(triangoli (T,3), faccia di ogni triangolo), come mesh_topology.fan_triangles."""
+    ntri = np.maximum(face_sizes(face_offsets) - 2, 0)
+    return fan_triangles(face_offsets, face_indices), np.repeat(np.arange(len(ntri), dtype=np.int64), ntri)
+
+
+def cell_range(lo, hi, origin, size):
+    """(prima cella (n,3), celle per asse (n,3)) toccate da ogni box."""
+    first = np.floor((lo - origin) / size).astype(np.int64)
+    return first, np.floor((hi - origin) / size).astype(np.int64) - first + 1
+
+
+def initial_cell_size(origin, top, mean_extent):
+    """Lato di partenza della griglia: l'estensione media dei box, ma con le
+    celle per asse entro _CELL_BITS bit fra origin e top (angolo massimo)."""
+    span = float((np.asarray(top) - origin).max())
+    return max(float(mean_extent), span / (1 << (_CELL_BITS - 1)), 1e-300)
+
+
+def grid_cells(lo, hi):
+    """(origine, lato) della griglia: lato da initial_cell_size, raddoppiato
+    finche' ogni triangolo tocca in media al massimo MAX_CELLS_PER_TRIANGLE celle."""
+    origin = lo.min(axis=0)
+    size = initial_cell_size(origin, hi.max(axis=0), (hi - lo).max(axis=1).mean())
+    while cell_range(lo, hi, origin, size)[1].prod(axis=1).sum() > MAX_CELLS_PER_TRIANGLE * len(lo):
+        size *= 2
+    return origin, size
+
+
+def _cell_key(cells):
+    return (cells[:, 0] << (2 * _CELL_BITS)) | (cells[:, 1] << _CELL_BITS) | cells[:, 2]
+
+
+def cell_entries(lo, hi, origin, size):
+    """Voci (chiave della cella, chiave della prima cella del box, triangolo) per
+    ogni cella toccata da ogni box, ordinate per chiave della cella."""
+    first, span = cell_range(lo, hi, origin, size)
+    tri, pos = expand_ranges(np.zeros(len(lo), dtype=np.int64), span.prod(axis=1))
+    # pos -> offset (i, j, k) dentro il blocco di celle del box
+    ny, nz = span[tri, 1], span[tri, 2]
+    cells = first[tri] + np.stack([pos // (ny * nz), pos // nz % ny, pos % nz], axis=1)
+    keys = _cell_key(cells)
+    order = np.argsort(keys, kind="stable")
+    return keys[order], first[tri[order]], tri[order]
+
+
+def candidate_pairs(keys, first, tris, lo, hi, batch=PAIR_BATCH):
+    """Blocchi di coppie (i, j) di triangoli nella stessa cella con box sovrapposti.
+
+    Argomenti come da cell_entries. Ogni coppia esce una volta sola, nella
+    cella dell'angolo minimo dei box sovrapposti: le sue coordinate sono il
+    massimo delle prime celle dei due box (floor e' monotona), quindi il
+    controllo si fa sugli interi prima di leggere i box.
+    """
+    if not len(keys):
+        return
+    new = np.append(True, keys[1:] != keys[:-1])
+    group_end = np.append(np.flatnonzero(new)[1:], len(keys))[np.cumsum(new) - 1]
+    counts = group_end - np.arange(len(keys)) - 1
+    # blocchi di voci con circa batch coppie ciascuno
+    cum = np.cumsum(counts)
+    cuts = np.searchsorted(cum, np.arange(batch, int(cum[-1]), batch)) + 1
+    for start, stop in zip(np.append(0, cuts).tolist(), np.append(cuts, len(keys)).tolist()):
+        if stop <= start:
+            continue
+        owner, partner = expand_ranges(np.arange(start + 1, stop + 1, dtype=np.int64), counts[start:stop])
+        owner += start
+        here = _cell_key(np.maximum(first[owner], first[partner])) == keys[owner]
+        i, j = tris[owner[here]], tris[partner[here]]
+        overlap = np.maximum(lo[i], lo[j]) <= np.minimum(hi[i], hi[j])
+        keep = overlap[:, 0] & overlap[:, 1] & overlap[:, 2]
+        yield np.minimum(i, j)[keep], np.maximum(i, j)[keep]
+
+
+def _plane_distances(P, Q, eps):
+    """Normale unitaria di P e distanze (n,3) dei vertici di Q dal suo piano (0 entro eps)."""
+    n = np.cross(P[:, 1] - P[:, 0], P[:, 2] - P[:, 0])
+    n /= np.linalg.norm(n, axis=1, keepdims=True)
+    d = np.einsum("nij,nj->ni", Q - P[:, :1], n)
+    d[np.abs(d) <= eps[:, None]] = 0.0
+    return n, d
+
+
+def _same_side(d):
+    """Tutti e tre i vertici strettamente dalla stessa parte del piano."""
+    return (((d[:, 0] > 0) & (d[:, 1] > 0) & (d[:, 2] > 0)) |
+            ((d[:, 0] < 0) & (d[:, 1] < 0) & (d[:, 2] < 0)))
+
+
+def _interval(X, d, line):
+    """Tratto [lo, hi] della retta line in cui il triangolo X (distanze d dall'altro piano) la attraversa."""
+    p = np.einsum("nij,nj->ni", X, line)
+    lo = np.where(d == 0, p, np.inf)
+    hi = np.where(d == 0, p, -np.inf)
+    for a, b in ((0, 1), (1, 2), (2, 0)):
+        da, db = d[:, a], d[:, b]
+        cross = da * db < 0
+        t = p[:, a] + (p[:, b] - p[:, a]) * np.divide(da, da - db, out=np.zeros_like(da), where=cross)
+        lo[:, a] = np.minimum(lo[:, a], np.where(cross, t, np.inf))
+        hi[:, a] = np.maximum(hi[:, a], np.where(cross, t, -np.inf))
+    return lo.min(axis=1), hi.max(axis=1)
+
+
+def _orient2d(a, b, c):
+    return (b[..., 0] - a[..., 0]) * (c[..., 1] - a[..., 1]) - (b[..., 1] - a[..., 1]) * (c[..., 0] - a[..., 0])
+
+
+def _inside2d(T, p, atol):
+    """p (n,2) strettamente dentro il triangolo T (n,3,2)."""
+    sign = np.sign(_orient2d(T[:, 0], T[:, 1], T[:, 2]))
+    inside = np.ones(len(T), dtype=bool)
+    for a, b in ((0, 1), (1, 2), (2, 0)):
+        inside &= _orient2d(T[:, a], T[:, b], p) * sign > atol
+    return inside
+
+
+def _opposite(o1, o2, atol):
+    return ((o1 > atol) & (o2 < -atol)) | ((o1 < -atol) & (o2 > atol))
+
+
+def _coplanar_overlap(P, Q, normal, eps, scale):
+    """Triangoli complanari che si sovrappongono con area non nulla (proiezione 2D)."""
+    # si scarta l'asse dominante della normale
+    axis = np.abs(normal).argmax(axis=1)
+    keep = np.array([[1, 2], [0, 2], [0, 1]])[axis]
+    P2 = np.take_along_axis(P, keep[:, None, :], axis=2)
+    Q2 = np.take_along_axis(Q, keep[:, None, :], axis=2)
+    # orientamenti (aree) nulli entro eps * scala
+    atol = eps * scale
+    hit = np.zeros(len(P), dtype=bool)
+    # lati che si attraversano in un punto interno a entrambi
+    for a, b in ((0, 1), (1, 2), (2, 0)):
+        for c, d in ((0, 1), (1, 2), (2, 0)):
+            o1 = _orient2d(P2[:, a], P2[:, b], Q2[:, c])
+            o2 = _orient2d(P2[:, a], P2[:, b], Q2[:, d])
+            o3 = _orient2d(Q2[:, c], Q2[:, d], P2[:, a])
+            o4 = _orient2d(Q2[:, c], Q2[:, d], P2[:, b])
+            hit |= _opposite(o1, o2, atol) & _opposite(o3, o4, atol)
+    # un triangolo dentro l'altro (anche coincidenti): basta un vertice o il baricentro
+    for T, S in ((P2, Q2), (Q2, P2)):
+        hit |= _inside2d(T, S.mean(axis=1), atol)
+        for k in range(3):
+            hit |= _inside2d(T, S[:, k], atol)
+    return hit
+
+
+def triangles_intersect(P, Q, rel_eps=1e-9):
+    """Per ogni coppia di triangoli P[i], Q[i] (n,3,3): True se si attraversano.
+
+    Test di Moller: se i vertici di un triangolo stanno tutti da una parte del
+    piano dell'altro non c'e' intersezione; altrimenti i tratti in cui i due
+    triangoli attraversano la retta comune dei piani devono sovrapporsi per
+    piu' di eps. I triangoli complanari passano al test 2D. eps e' rel_eps
+    per l'estensione dei box della coppia: la tolleranza segue la scala
+    locale, non quella della mesh intera.
+    """
+    both = np.concatenate([P, Q], axis=1)
+    scale = (both.max(axis=1) - both.min(axis=1)).max(axis=1)
+    eps = rel_eps * scale
+    nP, dQ = _plane_distances(P, Q, eps)
+    nQ, dP = _plane_distances(Q, P, eps)
+    separated = _same_side(dQ) | _same_side(dP)
+    line = np.cross(nP, nQ)
+    length = np.linalg.norm(line, axis=1)
+    coplanar = ~separated & ((~dQ.any(axis=1) & ~dP.any(axis=1)) | (length <= 1e-12))
+    hit = np.zeros(len(P), dtype=bool)
+    m = ~separated & ~coplanar
+    line = line[m] / length[m, None]
+    lo_p, hi_p = _interval(P[m], dP[m], line)
+    lo_q, hi_q = _interval(Q[m], dQ[m], line)
+    hit[m] = np.minimum(hi_p, hi_q) - np.maximum(lo_p, lo_q) > eps[m]
+    hit[coplanar] = _coplanar_overlap(P[coplanar], Q[coplanar], nP[coplanar], eps[coplanar], scale[coplanar])
+    return hit
+
+
+def valid_triangles(verts, tris):
+    """(indici dei triangoli con area non nulla, loro vertici (n,3,3) float64):
+    i triangoli degeneri non hanno un piano."""
+    corners = np.asarray(verts[tris], dtype=np.float64)
+    area2 = np.linalg.norm(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis=1)
+    valid = np.flatnonzero(area2 > 0)
+    return valid, corners[valid]
+
+
+def intersecting_faces(i, j, tris, corners, tri_face, rel_eps=1e-9):
+    """Coppie di facce (K,2), i < j, dalle coppie candidate di triangoli (i, j)
+    che si intersecano senza condividere vertici."""
+    # vicini nella mesh: almeno un vertice in comune
+    ti, tj = tris[i], tris[j]
+    shared = np.zeros(len(i), dtype=bool)
+    for a in range(3):
+        for b in range(3):
+            shared |= ti[:, a] == tj[:, b]
+    i, j = i[~shared], j[~shared]
+    hit = triangles_intersect(corners[i], corners[j], rel_eps)
+    fi, fj = tri_face[i[hit]], tri_face[j[hit]]
+    pairs = np.stack([np.minimum(fi, fj), np.maximum(fi, fj)], axis=1)
+    return pairs[pairs[:, 0] != pairs[:, 1]]
+
+
+def unique_pairs(found):
+    """Coppie (K,2) ordinate e senza ripetizioni da una lista di blocchi."""
+    pairs = np.concatenate(found) if found else np.zeros((0, 2), dtype=np.int64)
+    return np.unique(pairs, axis=0) if len(pairs) else pairs.reshape(0, 2)
+
+
+def self_intersections(verts, face_offsets, face_indices, rel_eps=1e-9, limit=None, batch=PAIR_BATCH):
+    """(coppie di facce (K,2) con i < j, ordinate, che si intersecano; completo).
+
+    rel_eps e' la tolleranza relativa alla dimensione di ogni coppia (vedi
+    triangles_intersect). Con limit la ricerca si ferma appena trovate almeno
+    limit coppie (zuppe di triangoli grandi e sovrapposti ne hanno un numero
+    quadratico): completo e' allora False.
+    """
+    tris, tri_face = triangle_faces(face_offsets, face_indices)
+    valid, corners = valid_triangles(verts, tris)
+    tris, tri_face = tris[valid], tri_face[valid]
+    found, n_found = [], 0
+    if len(tris) < 2:
+        return unique_pairs(found), True
+    lo, hi = corners.min(axis=1), corners.max(axis=1)
+    origin, size = grid_cells(lo, hi)
+    for i, j in candidate_pairs(*cell_entries(lo, hi, origin, size), lo, hi, batch):
+        found.append(intersecting_faces(i, j, tris, corners, tri_face, rel_eps))
+        n_found += len(found[-1])
+        if limit is not None and n_found >= limit:
+            return unique_pairs(found), False
+    return unique_pairs(found), True
@@ -0,0 +1,132 @@
+# Mesh semplificata per la visualizzazione (LOD) tramite vertex clustering.
+#
+# I vertici sono raggruppati per cella di una griglia regolare e ogni cella
+# diventa un vertice (media delle posizioni); i triangoli che collassano o si
+# ripetono vengono scartati. I vertici "protetti" (estremi degli edge di
+# confine e non-manifold) restano vertici a se', alla posizione originale,
+# cosi' quegli edge restano esatti. La dimensione della cella e' scelta per
+# stare nel budget di triangoli.
+
+import numpy as np
+
+from mesh_topology import fan_triangles
+
+# iterazioni massime per adattare la cella al budget
+MAX_ROUNDS = 4
+# frazione del budget di triangoli a cui mira la stima
+TARGET_FILL = (0.7, 0.95)
+# fino a questo numero di celle della griglia si usa una maschera densa
+DENSE_CELLS = 1 << 24
+
+
+def _cell_keys(verts, origin, cell):
+    """Chiave di cella di ogni vertice e numero di celle della griglia."""
+    ijk = np.floor((verts - origin) / cell).astype(np.int64)
+    dims = ijk.max(axis=0) + 1 if len(ijk) else np.ones(3, dtype=np.int64)
+    return (ijk[:, 0] * dims[1] + ijk[:, 1]) * dims[2] + ijk[:, 2], int(np.prod(dims))
+
+
+def _rank_cells(keys, ncells, count_only=False):
+    """Numero di celle occupate e, per ogni chiave, l'indice 0..n-1 della sua cella."""
+    if ncells <= DENSE_CELLS:
+        # griglia piccola: maschera densa e cumsum invece di un sort
+        occupied = np.zeros(ncells, dtype=bool)
+        occupied[keys] = True
+        if count_only:
+            return int(np.count_nonzero(occupied)), None
+        rank = np.cumsum(occupied, dtype=np.int64) - 1
+        return int(rank[-1]) + 1, rank[keys]
+    if count_only:
+        return len(np.unique(keys)), None
+    cells, inverse = np.unique(keys, return_inverse=True)
+    return len(cells), inverse
+
+
+def _cluster(verts, tris, free_ids, free_keys, prot_ids):
+    """Un passo di clustering: (verts, tris) della mesh ridotta e mappa vecchio -> nuovo."""
+    cluster = np.full(len(verts), -1, dtype=np.int64)
+    ncells, cluster[free_ids] = _rank_cells(*free_keys)
+    cluster[prot_ids] = ncells + np.arange(len(prot_ids))
+    n = ncells + len(prot_ids)
+
+    # posizione = media del cluster (un vertice protetto e' da solo nel suo)
+    ids = np.concatenate([free_ids, prot_ids])
+    owner = cluster[ids]
+    counts = np.bincount(owner, minlength=n).astype(np.float64)
+    new_verts = np.stack([np.bincount(owner, weights=verts[ids, k], minlength=n) for k in range(3)], axis=1)
+    new_verts /= counts[:, None]
+
+    t = cluster[tris]
+    t = t[(t[:, 0] != t[:, 1]) & (t[:, 1] != t[:, 2]) & (t[:, 0] != t[:, 2])]
+    # triangoli ripetuti (stessi tre cluster): si tiene il primo, con il suo verso
+    s = np.sort(t, axis=1)
+    if n < (1 << 21):
+        _, first = np.unique((s[:, 0] << 42) | (s[:, 1] << 21) | s[:, 2], return_index=True)
+    else:
+        _, first = np.unique(s, axis=0, return_index=True)
+    return new_verts, t[np.sort(first)], cluster
+
+
+def decimate(verts, face_offsets, face_indices, max_triangles, protected=None):
+    """Mesh triangolata con al piu' ~max_triangles triangoli per la visualizzazione.
+
+    protected: maschera (N,) dei vertici da non spostare ne' fondere (estremi
+    degli edge da ispezionare). Restituisce (verts (M,3), tris (K,3), vertex_map)
+    con vertex_map[i] = indice del vertice i nella mesh ridotta (-1 se non
+    usato). Se i triangoli sono gia' nel budget la mesh e' solo triangolata.
+    I triangoli che toccano solo vertici protetti non si riducono: il budget
+    non puo' scendere sotto quelli.
+    """
+    verts = np.asarray(verts, dtype=np.float64)
+    tris = fan_triangles(face_offsets, face_indices)
+    nverts = len(verts)
+    if protected is None:
+        protected = np.zeros(nverts, dtype=bool)
+    if len(tris) <= max_triangles:
+        return verts, tris, np.arange(nverts, dtype=np.int64)
+
+    used = np.zeros(nverts, dtype=bool)
+    used[tris.ravel()] = True
+    free_ids = np.flatnonzero(used & ~protected)
+    prot_ids = np.flatnonzero(used & protected)
+    free_verts = verts if len(free_ids) == nverts else verts[free_ids]
+    lo, hi = verts[used].min(axis=0), verts[used].max(axis=0)
+    extent = hi - lo
+    # al piu' 2^20 celle per asse: le chiavi restano in int64
+    min_cell = extent.max() / (1 << 20)
+    if min_cell <= 0:
+        return verts, tris, np.arange(nverts, dtype=np.int64)
+    # stima iniziale per una superficie: ~2 triangoli per cella occupata, su
+    # un'area dell'ordine della somma delle facce del bbox
+    area = extent[0] * extent[1] + extent[1] * extent[2] + extent[0] * extent[2]
+    cell = max(np.sqrt(2.0 * area / max_triangles), min_cell)
+
+    # la cella si adatta contando le celle occupate (solo un sort, senza
+    # costruire la mesh); su una superficie scalano come 1 / cella^2
+    for _ in range(MAX_ROUNDS):
+        keys = _cell_keys(free_verts, lo, cell)
+        estimate = 2 * _rank_cells(*keys, count_only=True)[0]
+        if TARGET_FILL[0] * max_triangles <= estimate <= TARGET_FILL[1] * max_triangles:
+            break
+        cell = max(cell * np.sqrt(estimate / (np.mean(TARGET_FILL) * max_triangles)), min_cell)
+        keys = None
+    if keys is None:
+        keys = _cell_keys(free_verts, lo, cell)
+    best = _cluster(verts, tris, free_ids, keys, prot_ids)
+    if len(best[1]) > max_triangles:
+        # stima troppo ottimista: un secondo passo con la cella ingrandita
+        cell *= np.sqrt(len(best[1]) / (TARGET_FILL[0] * max_triangles))
+        retry = _cluster(verts, tris, free_ids, _cell_keys(free_verts, lo, cell), prot_ids)
+        if len(retry[1]) < len(best[1]):
+            best = retry
+    new_verts, new_tris, cluster = best
+
+    # solo i vertici referenziati, rinumerati in ordine
+    keep = np.zeros(len(new_verts), dtype=bool)
+    keep[new_tris.ravel()] = True
+    keep[cluster[prot_ids]] = True
+    remap = np.cumsum(keep) - 1
+    vertex_map = np.full(nverts, -1, dtype=np.int64)
+    mapped = cluster >= 0
+    vertex_map[mapped] = np.where(keep[cluster[mapped]], remap[cluster[mapped]], -1)
+    return new_verts[keep], remap[new_tris], vertex_map
@@ -0,0 +1,133 @@
+# Strumentazione per fase (tempo, memoria, numero di elementi) di analisi e riparazioni.
+#
+# Uso:
+#     prof = profiler_from_env(label=path)
+#     with prof.stage("parse") as st:
+#         ...
+#         st.items = nfaces
+#     prof.emit()
+#
+# Con OBJ_DOCTOR_PROFILE non impostata profiler_from_env restituisce
+# NULL_PROFILER, le cui fasi sono un contesto vuoto condiviso: il costo e' una
+# chiamata di metodo per fase. Valori della variabile:
+#   1 / time   tempo, RSS di picco e conteggi
+#   memory     anche il picco tracemalloc per fase (rallenta il codice Python)
+# Il JSON (una riga per esecuzione) va su stderr o, se impostata, in append sul
+# file OBJ_DOCTOR_PROFILE_OUT.
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_ENV = "OBJ_DOCTOR_PROFILE"
+PROFILE_OUT_ENV = "OBJ_DOCTOR_PROFILE_OUT"
+
+
+def _rss_peak_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux in KiB, macOS in byte
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _Stage:
+    def __init__(self, profiler, name, items):
+        self.profiler = profiler
+        self.name = name
+        self.items = items
+
+    def __enter__(self):
+        if self.profiler.trace_memory:
+            tracemalloc.reset_peak()
+            self._mem0 = tracemalloc.get_traced_memory()[0]
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record = {"stage": self.name, "seconds": time.perf_counter() - self._t0, "items": self.items}
+        if self.profiler.trace_memory:
+            record["peak_bytes"] = tracemalloc.get_traced_memory()[1] - self._mem0
+        record["rss_peak_bytes"] = _rss_peak_bytes()
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        self.profiler.stages.append(record)
+        return False
+
+
+class Profiler:
+    """Raccoglie un record per fase; emit() li scrive come una riga JSON."""
+
+    enabled = True
+
+    def __init__(self, label=None, trace_memory=False, out=None):
+        self.label = label
+        self.trace_memory = trace_memory
+        self.out = out
+        self.stages = []
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name, items=None):
+        return _Stage(self, name, items)
+
+    def to_dict(self):
+        return {
+            "label": self.label,
+            "total_seconds": sum(s["seconds"] for s in self.stages),
+            "stages": self.stages,
+        }
+
+    def emit(self):
+        line = json.dumps(self.to_dict())
+        if self.out:
+            with open(self.out, "a") as f:
+                f.write(line + "\n")
+        else:
+            print(line, file=sys.stderr, flush=True)
+
+
+class _NullStage:
+    items = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+class _NullProfiler:
+    enabled = False
+    stages = ()
+    _stage = _NullStage()
+
+    def stage(self, name, items=None):
+        return self._stage
+
+    def to_dict(self):
+        return {}
+
+    def emit(self):
+        pass
+
+
+NULL_PROFILER = _NullProfiler()
+
+
+def profiler_from_env(label=None):
+    """Profiler configurato da OBJ_DOCTOR_PROFILE, o NULL_PROFILER se assente."""
+    mode = os.environ.get(PROFILE_ENV, "").strip().lower()
+    if mode in ("", "0", "off", "false"):
+        return NULL_PROFILER
+    return Profiler(label, trace_memory=(mode == "memory"), out=os.environ.get(PROFILE_OUT_ENV) or None)
@@ -0,0 +1,20 @@
+# Import degli script con il trattino nel nome (fix-non-mainfold.py,
+# fix-non-mainfold2.py, visualize-non-mainfold.py), che non si possono
+# importare con import. Ogni script e' eseguito una volta per processo.
+
+import importlib.util
+import os
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+_scripts = {}
+
+
+def load_script(filename):
+    """Modulo dello script filename (nella cartella di questo file)."""
+    if filename not in _scripts:
+        spec = importlib.util.spec_from_file_location(filename[:-3].replace("-", "_"), os.path.join(HERE, filename))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _scripts[filename] = module
+    return _scripts[filename]
@@ -0,0 +1,262 @@
+# Servizio locale di analisi: un processo che resta in vita e tiene le mesh
+# usate di recente gia' parsate.
+#
+# Un server asyncio ascolta su un socket Unix (o su 127.0.0.1) e riceve una
+# richiesta JSON per riga (protocollo in mesh_client). Il lavoro di calcolo
+# gira in un pool di processi worker; ogni worker ha la sua MemoryMeshCache
+# (mesh, MeshTopology, sommari di analyze) con una parte del budget, e ogni
+# file e' assegnato sempre allo stesso worker (hash del percorso), cosi' le
+# richieste su un file trovano la cache calda e quelle su file diversi
+# girano in parallelo. Le richieste sullo stesso file sono servite in ordine.
+#
+# Operazioni: analyze, remove_nonmanifold, repair, visualize e stats.
+#
+# Le richieste scelgono dove scrivere (output, reoriented_path). Il socket
+# Unix e' accessibile solo all'utente che ha avviato il server; su TCP ogni
+# richiesta deve portare il token che il server scrive all'avvio in un file
+# con permessi 0600. Con --output-dir le scritture sono ammesse solo sotto
+# quella cartella.
+
+import argparse
+import asyncio
+import contextlib
+import hmac
+import io
+import json
+import os
+import secrets
+import signal
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from check import analyze
+from mesh_cache import MemoryMeshCache, DEFAULT_MEMORY_BYTES
+from mesh_client import DEFAULT_SOCKET, DEFAULT_TOKEN_FILE, HOST
+from mesh_data import Mesh
+from mesh_scripts import load_script
+
+# stato di ogni processo worker
+_cache = None
+_output_dir = None
+
+
+def _init_worker(max_bytes, parse_workers, output_dir):
+    global _cache, _output_dir
+    _cache = MemoryMeshCache(max_bytes, workers=parse_workers)
+    _output_dir = output_dir
+
+
+def _writable(path):
+    """path, se il server ci puo' scrivere (sotto --output-dir, se data)."""
+    if _output_dir is not None and os.path.commonpath([_output_dir, os.path.realpath(path)]) != _output_dir:
+        raise PermissionError(f"{path} is outside the output directory {_output_dir}")
+    return path
+
+
+# --- operazioni, eseguite nel worker del file
+
+def _analyze(path, tol=1e-6, reoriented_path=None):
+    if reoriented_path is not None:
+        return analyze(path, tol, _cache, reoriented_path=_writable(reoriented_path))[0]
+    return _cache.result(path, ("analyze", tol), lambda: analyze(path, tol, _cache)[0])
+
+
+def _remove_nonmanifold(path, output):
+    load_script("fix-non-mainfold.py").remove_nonmanifold(path, _writable(output), cache=_cache)
+    return {"output": output}
+
+
+def _repair(path, output=None, split_vertices=False):
+    if output is not None:
+        _writable(output)
+    mesh = _cache.mesh(path)
+    repair = load_script("fix-non-mainfold2.py").MeshRepair()
+    # la riparazione riscrive solo gli indici delle facce: copie di quelli in cache
+    repair.mesh = Mesh(mesh.verts, mesh.face_offsets, mesh.face_indices.copy(), mesh.groups)
+    repair.topology = _cache.topology(path).copy()
+    result = repair.repair_mesh(split_vertices=split_vertices)
+    if output is not None:
+        repair.save_obj(output)
+    return {**result, "nverts": repair.mesh.nverts, "output": output}
+
+
+def _visualize(path, output=None, max_triangles=None, sidecar=False):
+    if output is None:
+        output = os.path.splitext(path)[0] + ".html"
+    _writable(output)
+    viz = load_script("visualize-non-mainfold.py").BoundaryVisualizer()
+    # la visualizzazione legge soltanto: mesh e topologia della cache
+    viz.mesh = _cache.mesh(path)
+    viz.topology = _cache.topology(path)
+    viz.create_html_visualization(output, sidecar=sidecar, max_triangles=max_triangles)
+    return {"output": output}
+
+
+OPS = {
+    "analyze": _analyze,
+    "remove_nonmanifold": _remove_nonmanifold,
+    "repair": _repair,
+    "visualize": _visualize,
+}
+
+
+def _run(op, params):
+    """(risultato, testo stampato dall'operazione); applica poi il budget della cache."""
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            result = OPS[op](**params)
+    finally:
+        _cache.evict()
+    return result, log.getvalue()
+
+
+def _stats():
+    return _cache.stats()
+
+
+class MeshServer:
+    """Server asyncio con un worker (processo) per shard di file."""
+
+    def __init__(self, workers=None, cache_bytes=DEFAULT_MEMORY_BYTES, output_dir=None):
+        self.nworkers = max(1, workers or os.cpu_count() or 1)
+        # i worker sono processi figli, dove obj_io non apre un altro pool: il
+        # parse di un file e' seriale nel suo worker, il parallelismo e' tra file
+        self._initargs = (cache_bytes // self.nworkers, 1,
+                          os.path.realpath(output_dir) if output_dir is not None else None)
+        self._pools = [self._pool() for _ in range(self.nworkers)]
+        # richiesto in ogni richiesta quando il server ascolta su TCP (vedi serve)
+        self.token = None
+
+    def _pool(self):
+        return ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=self._initargs)
+
+    def _shard(self, path):
+        return zlib.crc32(os.path.abspath(path).encode()) % self.nworkers
+
+    async def _submit(self, shard, fn, *args):
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pools[shard], fn, *args)
+        except BrokenProcessPool:
+            # worker terminato (es. dal kernel per memoria): si riparte con la cache vuota
+            self._pools[shard].shutdown(wait=False)
+            self._pools[shard] = self._pool()
+            raise
+
+    async def respond(self, request):
+        """Risposta (dict) a una richiesta gia' decodificata."""
+        op = request.get("op")
+        params = {k: v for k, v in request.items() if k not in ("op", "id", "token")}
+        try:
+            if self.token is not None and not hmac.compare_digest(str(request.get("token", "")), self.token):
+                raise PermissionError("missing or wrong token")
+            if op == "stats":
+                workers = await asyncio.gather(*(self._submit(s, _stats) for s in range(self.nworkers)))
+                result, log = {"workers": workers}, ""
+            elif op in OPS:
+                if not isinstance(params.get("path"), str):
+                    raise ValueError(f"{op} needs a path")
+                result, log = await self._submit(self._shard(params["path"]), _run, op, params)
+            else:
+                raise ValueError(f"unknown op {op!r}, expected one of {', '.join([*OPS, 'stats'])}")
+        except Exception as exc:
+            return {"id": request.get("id"), "ok": False, "error": f"{type(exc).__name__}: {exc}"}
+        return {"id": request.get("id"), "ok": True, "result": result, "log": log}
+
+    async def _client(self, reader, writer):
+        # le richieste di una connessione sono servite in ordine; connessioni diverse in parallelo
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("a request is a JSON object")
+                except ValueError as exc:
+                    response = {"id": None, "ok": False, "error": f"{type(exc).__name__}: {exc}"}
+                else:
+                    response = await self.respond(request)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # client sparito o riga oltre il limite dello stream
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path=DEFAULT_SOCKET, port=None, token_file=DEFAULT_TOKEN_FILE):
+        """Ascolta su socket_path (o su 127.0.0.1:port) finche' il task non viene cancellato.
+
+        Su TCP genera un token nuovo e lo scrive in token_file (0600): le
+        richieste senza quel token sono rifiutate.
+        """
+        if port is not None:
+            self.token = secrets.token_urlsafe(32)
+            _write_private(token_file, self.token)
+            server = await asyncio.start_server(self._client, HOST, port)
+            where = f"{HOST}:{port}"
+        else:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            # solo l'utente che ha avviato il server: il socket nasce gia' 0600
+            umask = os.umask(0o177)
+            try:
+                server = await asyncio.start_unix_server(self._client, socket_path)
+            finally:
+                os.umask(umask)
+            where = socket_path
+        # SIGTERM chiude come Ctrl-C, rimuovendo il socket
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        print(json.dumps({"listening": where, "workers": self.nworkers}), file=sys.stderr, flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if port is None and os.path.exists(socket_path):
+                os.remove(socket_path)
+            if port is not None and os.path.exists(token_file):
+                os.remove(token_file)
+
+    def close(self):
+        for pool in self._pools:
+            pool.shutdown(cancel_futures=True)
+
+
+def _write_private(path, text):
+    """Scrive path leggibile solo dall'utente, senza seguire un file gia' esistente."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(text + "\n")
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve analyze/repair/visualize requests with a hot mesh cache.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket to listen on (default %(default)s)")
+    parser.add_argument("--port", type=int, default=None, help="listen on 127.0.0.1:PORT instead of the socket")
+    parser.add_argument("--token-file", default=DEFAULT_TOKEN_FILE,
+                        help="with --port, where the request token is written (default %(default)s)")
+    parser.add_argument("--output-dir", default=None,
+                        help="only write outputs (output, reoriented_path) under this directory")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--cache-bytes", type=int, default=DEFAULT_MEMORY_BYTES,
+                        help="memory budget of the mesh cache, split among the workers (default %(default)s)")
+    args = parser.parse_args(argv)
+    server = MeshServer(args.workers, args.cache_bytes, args.output_dir)
+    try:
+        asyncio.run(server.serve(args.socket, args.port, args.token_file))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# Ricerche spaziali vettorizzate sui vertici (griglia uniforme / spatial hash).
+
+import numpy as np
+
+from mesh_topology import expand_ranges
+
+# primi per l'hash delle celle; le collisioni producono solo candidati in piu',
+# scartati dal test sulla distanza
+_P1, _P2, _P3 = 73856093, 19349663, 83492791
+
+# combinazioni del blocco 2x2x2 di celle interrogato per ogni vertice
+_BLOCK = np.array(
+    [(bx, by, bz) for bx in (0, 1) for by in (0, 1) for bz in (0, 1)],
+    dtype=np.int64,
+)
+
+
+def _cell_keys(cells):
+    return (cells[:, 0] * _P1) ^ (cells[:, 1] * _P2) ^ (cells[:, 2] * _P3)
+
+
+def _lookup(sorted_keys, queries):
+    """Intervalli [lo, hi) di sorted_keys uguali a ogni query (needle ordinate per velocita')."""
+    q_order = np.argsort(queries)
+    q_sorted = queries[q_order]
+    lo = np.searchsorted(sorted_keys, q_sorted, side="left")
+    hit = lo < len(sorted_keys)
+    hit[hit] = sorted_keys[lo[hit]] == q_sorted[hit]
+    hi = lo.copy()
+    hi[hit] = np.searchsorted(sorted_keys, q_sorted[hit], side="right")
+    return q_order[hit], lo[hit], hi[hit] - lo[hit]
+
+
+def cell_queries(verts, tol):
+    """Chiave della cella di ogni vertice e chiavi delle celle da interrogare.
+
+    I vertici sono messi in celle di lato 2*tol: la sfera di raggio tol attorno
+    a un vertice tocca al piu' il blocco 2x2x2 di celle verso cui il vertice e'
+    piu' vicino, quindi bastano 8 ricerche per vertice. Con tol <= 0 la "cella"
+    e' la posizione esatta (bit delle coordinate) e basta una ricerca.
+    """
+    if tol <= 0:
+        # +0.0 porta -0.0 su 0.0, cosi' posizioni uguali hanno gli stessi bit
+        keys = _cell_keys((verts + 0.0).view(np.int64).reshape(-1, 3))
+        return keys, [keys]
+    scaled = verts / (2.0 * tol)
+    cells = np.floor(scaled).astype(np.int64)
+    side = np.where(scaled - cells < 0.5, -1, 1).astype(np.int64)
+    return _cell_keys(cells), [_cell_keys(cells + side * b) for b in _BLOCK]
+
+
+def join_cells(verts, own_keys, own_ids, query_keys, query_ids, tol):
+    """Coppie di vertici entro tol tra le query e i vertici delle celle cercate.
+
+    own_keys/own_ids: cella e id dei vertici candidati; query_keys/query_ids:
+    celle cercate e id del vertice che cerca. verts e' indicizzato con gli id.
+    Restituisce (min, max) di ogni coppia trovata, eventualmente ripetuta.
+    """
+    order = np.argsort(own_keys, kind="stable")
+    sorted_keys = own_keys[order]
+    q, lo, counts = _lookup(sorted_keys, query_keys)
+    owner, pos = expand_ranges(lo, counts)
+    i, j = query_ids[q[owner]], own_ids[order[pos]]
+    keep = i != j
+    i, j = i[keep], j[keep]
+    d = verts[i] - verts[j]
+    close = np.sqrt(np.einsum("ij,ij->i", d, d)) <= tol
+    i, j = i[close], j[close]
+    return np.minimum(i, j), np.maximum(i, j)
+
+
+def close_vertex_pairs(verts, tol):
+    """Coppie (i, j) con i < j e distanza <= tol, ordinate per (i, j)."""
+    n = len(verts)
+    if n < 2:
+        return np.zeros((0, 2), dtype=np.int64)
+    keys, queries = cell_queries(verts, tol)
+    ids = np.arange(n, dtype=np.int64)
+    # gia' ordinate: l'argsort stabile in join_cells diventa lineare
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    pair_keys = []
+    for query_keys in queries:
+        i, j = join_cells(verts, sorted_keys, order, query_keys, ids, tol)
+        pair_keys.append(i * n + j)
+    # la stessa coppia puo' essere trovata da entrambi i vertici o per collisioni di hash
+    pk = np.unique(np.concatenate(pair_keys))
+    return np.stack([pk // n, pk % n], axis=1)
+
+
+def groups_from_pairs(pairs):
+    """Gruppi greedy da coppie (i, j), i < j, ordinate: vedi near_duplicate_groups."""
+    if len(pairs) == 0:
+        return []
+    firsts, starts = np.unique(pairs[:, 0], return_index=True)
+    ends = np.append(starts[1:], len(pairs))
+    js = pairs[:, 1].tolist()
+    assigned = set()
+    groups = []
+    for i, s, e in zip(firsts.tolist(), starts.tolist(), ends.tolist()):
+        if i in assigned:
+            continue
+        group = [i] + [j for j in js[s:e] if j not in assigned]
+        if len(group) > 1:
+            assigned.update(group)
+            groups.append(group)
+    return groups
+
+
+def near_duplicate_groups(verts, tol=1e-6):
+    """Gruppi di vertici entro tol, con la stessa regola greedy di check.analyze.
+
+    Scorrendo i vertici in ordine, ogni vertice non ancora assegnato apre un
+    gruppo con tutti i vertici successivi, non assegnati, entro tol da lui.
+    Restituisce solo i gruppi con piu' di un vertice.
+    """
+    pairs = close_vertex_pairs(np.asarray(verts, dtype=np.float64), tol)
+    return groups_from_pairs(pairs)
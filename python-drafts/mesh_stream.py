@@ -0,0 +1,666 @@
+# Analisi out-of-core per mesh piu' grandi della RAM.
+#
+# analyze_streaming() produce lo stesso dizionario di check.analyze() senza
+# tenere in memoria la mesh intera:
+#   1. il file e' letto a blocchi di righe; vertici, dimensioni delle facce e
+#      indici sono accodati a file binari temporanei e riletti come memmap;
+#   2. per blocchi di facce si calcolano aree/normali (normali su memmap) e le
+#      chiavi degli edge, scritte come run ordinate su disco;
+#   3. un merge a k vie delle run conta gli edge (boundary / non-manifold) e
+#      unisce le facce adiacenti in un union-find il cui array dei padri e'
+#      anch'esso un memmap; il verso degli half-edge viaggia nel bit basso
+#      della faccia: sulle coppie manifold da' l'orientamento incoerente
+#      (versi uguali) e un secondo union-find a parita' propaga il verso, gli
+#      half-edge di bordo sono poi concatenati in loop (su disco, con run
+#      ordinate e un union-find, se non stanno nel budget);
+#   4. i vertici sono distribuiti in bucket per cella (hash) per trovare
+#      duplicati esatti e quasi-duplicati bucket per bucket;
+#   5. i triangoli (con i loro box) sono accodati nel passo 2 e le loro voci
+#      (cella, triangolo) della griglia di mesh_intersect distribuite in
+#      bucket per cella: le auto-intersezioni si cercano bucket per bucket.
+#
+# memory_limit regola la dimensione dei blocchi e il numero di bucket: e' un
+# tetto approssimato sugli array temporanei in RAM, non sulla page cache dei
+# memmap (che il sistema operativo puo' liberare).
+
+import os
+import tempfile
+
+import numpy as np
+
+from obj_io import parse_obj_bytes
+from mesh_geometry import face_areas_normals, chain_summary
+from mesh_spatial import cell_queries, join_cells, groups_from_pairs
+from mesh_topology import half_edges, corner_next, chain_boundary, pair_ends
+from mesh_intersect import (triangle_faces, valid_triangles, cell_range, initial_cell_size, cell_entries,
+                            candidate_pairs, intersecting_faces, unique_pairs, MAX_CELLS_PER_TRIANGLE)
+
+DEFAULT_MEMORY_LIMIT = 1 << 30
+# component_sizes elenca solo le componenti piu' grandi
+COMPONENT_SIZES_LIMIT = 100
+# RAM per edge di bordo di chain_boundary + chain_summary; oltre memory_limit
+# le catene sono concatenate su disco (_chain_summary)
+_CHAIN_BYTES_PER_EDGE = 512
+
+# le chiavi degli edge non conoscono ancora nverts: (min << 32) | max ha lo
+# stesso ordine di min * nverts + max usato da EdgeTable
+_KEY_SHIFT = np.int64(32)
+_KEY_MASK = np.int64((1 << 32) - 1)
+
+
+class _Spill:
+    """File temporaneo a cui si accodano array di un dtype fisso."""
+
+    def __init__(self, tmp_dir, name, dtype, width=1):
+        self.path = os.path.join(tmp_dir, name)
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        self.count = 0
+        self._f = open(self.path, "wb")
+
+    def append(self, arr):
+        arr = np.ascontiguousarray(arr, dtype=self.dtype)
+        self._f.write(arr.data)
+        self.count += len(arr)
+
+    def array(self):
+        """Chiude il file e lo riapre come memmap in sola lettura."""
+        if not self._f.closed:
+            self._f.close()
+        shape = (self.count, self.width) if self.width > 1 else (self.count,)
+        if self.count == 0:
+            return np.zeros(shape, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode="r", shape=shape)
+
+
+class _BucketSpill:
+    """Array di un dtype fisso divisi in nbuckets bucket, tutti in un solo file.
+
+    Ogni append scrive un blocco gia' ordinato per bucket e ricorda dove
+    inizia il tratto di ogni bucket: i file aperti restano uno per spill
+    qualunque sia il numero di bucket.
+    """
+
+    def __init__(self, tmp_dir, name, dtype, nbuckets, width=1):
+        self._spill = _Spill(tmp_dir, name, dtype, width)
+        self._chunks = [[] for _ in range(nbuckets)]
+        self._array = None
+
+    def append(self, arr, bounds):
+        """arr ordinato per bucket; il bucket b e' arr[bounds[b]:bounds[b + 1]]."""
+        base = self._spill.count
+        for b in np.flatnonzero(np.diff(bounds)).tolist():
+            self._chunks[b].append((base + int(bounds[b]), base + int(bounds[b + 1])))
+        self._spill.append(arr)
+
+    def bucket(self, b):
+        if self._array is None:
+            self._array = self._spill.array()
+        chunks = self._chunks[b]
+        if not chunks:
+            return self._array[:0].copy()
+        return np.concatenate([self._array[start:stop] for start, stop in chunks])
+
+
+def _scatter_order(keys, nbuckets):
+    """(ordine per bucket, confini (nbuckets+1,)) delle chiavi di cella."""
+    bucket = _bucket_of(keys, nbuckets)
+    order = np.argsort(bucket, kind="stable")
+    return order, np.searchsorted(bucket[order], np.arange(nbuckets + 1))
+
+
+def _zeros_memmap(tmp_dir, name, dtype, shape):
+    if shape[0] == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(os.path.join(tmp_dir, name), dtype=dtype, mode="w+", shape=shape)
+
+
+def _text_chunks(path, chunk_bytes):
+    """Blocchi del file che terminano sempre a fine riga."""
+    rest = b""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                if rest:
+                    yield rest
+                return
+            block = rest + block
+            cut = block.rfind(b"\n") + 1
+            rest = block[cut:]
+            if cut:
+                yield block[:cut]
+
+
+def _merge_runs(runs, block):
+    """Merge a k vie di run (chiavi, payload) ordinate per chiave.
+
+    Restituisce blocchi globalmente ordinati; a parita' di chiave l'ordine e'
+    quello delle run. Una chiave puo' essere divisa tra due blocchi.
+    """
+    pos = [0] * len(runs)
+    while True:
+        bufs = []
+        cutoff = cut_run = None
+        for r, (keys, _) in enumerate(runs):
+            if pos[r] >= len(keys):
+                continue
+            end = min(pos[r] + block, len(keys))
+            bufs.append((r, end))
+            if end < len(keys):
+                last = keys[end - 1]
+                if cutoff is None or last < cutoff:
+                    cutoff, cut_run = last, r
+        if not bufs:
+            return
+        out_keys, out_vals = [], []
+        for r, end in bufs:
+            keys, vals = runs[r]
+            k = np.asarray(keys[pos[r]:end])
+            # la chiave cutoff puo' continuare oltre il buffer di cut_run: le
+            # run successive la rimandano al blocco dopo, per non scavalcarla
+            side = "right" if cutoff is None or r <= cut_run else "left"
+            take = len(k) if cutoff is None else int(np.searchsorted(k, cutoff, side=side))
+            out_keys.append(k[:take])
+            out_vals.append(np.asarray(vals[pos[r]:pos[r] + take]))
+            pos[r] += take
+        keys = np.concatenate(out_keys)
+        order = np.argsort(keys, kind="stable")
+        yield keys[order], np.concatenate(out_vals)[order]
+
+
+def _find(parent, x):
+    """Radici dei nodi x; dimezza i cammini percorsi (parent[r] = nonno)."""
+    r = parent[x]
+    while True:
+        rr = parent[r]
+        if np.array_equal(rr, r):
+            return r
+        parent[r] = parent[rr]
+        r = rr
+
+
+def _union(parent, u, v):
+    """Union-find a blocchi su parent (anche memmap): radice minore vince."""
+    nodes = np.concatenate([u, v])
+    while len(u):
+        ru = _find(parent, u)
+        rv = _find(parent, v)
+        differ = ru != rv
+        if not differ.any():
+            break
+        u, v = u[differ], v[differ]
+        np.minimum.at(parent, np.maximum(ru[differ], rv[differ]), np.minimum(ru[differ], rv[differ]))
+    # compressione dei cammini dei nodi toccati
+    parent[nodes] = _find(parent, nodes)
+
+
+def _bucket_of(keys, nbuckets):
+    return (keys.view(np.uint64) % np.uint64(nbuckets)).astype(np.int64)
+
+
+def _vertex_duplicates(verts, tol, tmp_dir, block, nbuckets):
+    """(duplicati esatti, gruppi di quasi-duplicati) con join per bucket su disco."""
+    n = len(verts)
+    own_k, own_i, query_k, query_i, exact_i = (_BucketSpill(tmp_dir, p, np.int64, nbuckets)
+                                               for p in ("ok", "oi", "qk", "qi", "xi"))
+
+    def scatter(keys, ids, id_spill, key_spill=None):
+        order, bounds = _scatter_order(keys, nbuckets)
+        id_spill.append(ids[order], bounds)
+        if key_spill is not None:
+            key_spill.append(keys[order], bounds)
+
+    for s in range(0, n, block):
+        chunk = np.asarray(verts[s:s + block])
+        ids = np.arange(s, s + len(chunk), dtype=np.int64)
+        keys, queries = cell_queries(chunk, tol)
+        scatter(keys, ids, own_i, own_k)
+        for qk in queries:
+            scatter(qk, ids, query_i, query_k)
+        pos_keys, _ = cell_queries(chunk, 0)
+        scatter(pos_keys, ids, exact_i)
+
+    n_dup = 0
+    pair_keys = []
+    for b in range(nbuckets):
+        ids = exact_i.bucket(b)
+        if len(ids):
+            _, first = np.unique(np.asarray(verts[ids]) + 0.0, axis=0, return_index=True)
+            n_dup += len(ids) - len(first)
+        ok, qk = own_k.bucket(b), query_k.bucket(b)
+        if len(ok) and len(qk):
+            oi, qi = own_i.bucket(b), query_i.bucket(b)
+            i, j = join_cells(verts, ok, oi, qk, qi, tol)
+            pair_keys.append(i * n + j)
+    # i quasi-duplicati sono rari: le coppie trovate restano in memoria
+    if pair_keys:
+        pk = np.unique(np.concatenate(pair_keys))
+        pairs = np.stack([pk // n, pk % n], axis=1)
+    else:
+        pairs = np.zeros((0, 2), dtype=np.int64)
+    return n_dup, groups_from_pairs(pairs)
+
+
+def _self_intersections(verts, tris, tri_face, lo, hi, tmp_dir, block, memory_limit, limit):
+    """Come mesh_intersect.self_intersections sui triangoli validi accodati
+    (memmap): voci della griglia in bucket su disco per hash della cella."""
+    ntris = len(tris)
+    if ntris < 2:
+        return unique_pairs([]), True
+    origin, top, extent = np.full(3, np.inf), np.full(3, -np.inf), 0.0
+    for s in range(0, ntris, block):
+        l, h = np.asarray(lo[s:s + block]), np.asarray(hi[s:s + block])
+        origin, top = np.minimum(origin, l.min(axis=0)), np.maximum(top, h.max(axis=0))
+        extent += float((h - l).max(axis=1).sum())
+    size = initial_cell_size(origin, top, extent / ntris)
+
+    def n_entries(size):
+        return sum(int(cell_range(lo[s:s + block], hi[s:s + block], origin, size)[1].prod(axis=1).sum())
+                   for s in range(0, ntris, block))
+
+    total = n_entries(size)
+    while total > MAX_CELLS_PER_TRIANGLE * ntris:
+        size *= 2
+        total = n_entries(size)
+    # ~40 byte per voce su disco, ~400 in RAM durante il bucket
+    nbuckets = max(1, -(-total * 400 // memory_limit))
+    key_spill = _BucketSpill(tmp_dir, "tk", np.int64, nbuckets)
+    first_spill = _BucketSpill(tmp_dir, "tf", np.int64, nbuckets, 3)
+    tri_spill = _BucketSpill(tmp_dir, "tt", np.int64, nbuckets)
+    for s in range(0, ntris, max(1, block // MAX_CELLS_PER_TRIANGLE)):
+        stop = min(s + max(1, block // MAX_CELLS_PER_TRIANGLE), ntris)
+        keys, first, t = cell_entries(np.asarray(lo[s:stop]), np.asarray(hi[s:stop]), origin, size)
+        order, bounds = _scatter_order(keys, nbuckets)
+        key_spill.append(keys[order], bounds)
+        first_spill.append(first[order], bounds)
+        tri_spill.append(t[order] + s, bounds)
+
+    found, n_found = [], 0
+    for b in range(nbuckets):
+        keys = key_spill.bucket(b)
+        if not len(keys):
+            continue
+        order = np.argsort(keys, kind="stable")
+        # triangoli del bucket rinumerati localmente
+        ids, local = np.unique(tri_spill.bucket(b)[order], return_inverse=True)
+        b_tris = np.asarray(tris[ids])
+        corners = np.asarray(verts[b_tris], dtype=np.float64)
+        b_face = np.asarray(tri_face[ids])
+        for i, j in candidate_pairs(keys[order], first_spill.bucket(b)[order], local.ravel(),
+                                    np.asarray(lo[ids]), np.asarray(hi[ids]), block):
+            found.append(intersecting_faces(i, j, b_tris, corners, b_face))
+            n_found += len(found[-1])
+            if limit is not None and n_found >= limit:
+                return unique_pairs(found), False
+    return unique_pairs(found), True
+
+
+def _chain_summary(verts, src, dst, tmp_dir, block, limit=6):
+    """Come mesh_geometry.chain_summary(verts, *chain_boundary(src, dst)) con
+    src/dst su memmap.
+
+    Edge in ordine canonico ed estremi ordinati per vertice passano per run
+    su disco e _merge_runs; gli estremi di un vertice sono accoppiati
+    insieme (pair_ends) e le catene sono le componenti di un union-find
+    sugli edge, con conteggi, perimetri e box su memmap indicizzati dalla
+    radice (l'edge minimo della catena). I perimetri sono sommati in un
+    altro ordine che lungo la catena: possono differire nell'ultima cifra.
+    """
+    n = len(src)
+    per_run = max(1 << 10, block // max(-(-n // block), 1))
+
+    def merged(spill_keys, spill_vals, chunk):
+        # run ordinate di chunk elementi, poi un merge a k vie
+        keys, vals = spill_keys.array(), spill_vals.array()
+        runs = [(keys[a:a + chunk], vals[a:a + chunk]) for a in range(0, len(keys), chunk)]
+        return _merge_runs(runs, per_run)
+
+    # 1. edge in ordine (src, dst) come in chain_boundary; gli edge uguali
+    # sono intercambiabili
+    run_keys = _Spill(tmp_dir, "chain.runs", np.int64)
+    for s in range(0, n, block):
+        run_keys.append(np.sort((np.asarray(src[s:s + block]) << _KEY_SHIFT) | np.asarray(dst[s:s + block])))
+    canon_spill = _Spill(tmp_dir, "chain.canon", np.int64)
+    for keys, _ in merged(run_keys, run_keys, block):
+        canon_spill.append(keys)
+    canon = canon_spill.array()
+
+    # 2. estremi 2i (uscita da src) e 2i+1 (entrata in dst) ordinati per
+    # (2 * vertice + entrata, estremo)
+    end_keys = _Spill(tmp_dir, "chain.ends.k", np.int64)
+    end_ids = _Spill(tmp_dir, "chain.ends.i", np.int64)
+    for s in range(0, n, block):
+        c = np.asarray(canon[s:s + block])
+        i = np.arange(s, s + len(c), dtype=np.int64)
+        keys = np.concatenate([2 * (c >> _KEY_SHIFT), 2 * (c & _KEY_MASK) + 1])
+        order = np.argsort(keys, kind="stable")
+        end_keys.append(keys[order])
+        end_ids.append(np.concatenate([2 * i, 2 * i + 1])[order])
+
+    # 3. compagni, un vertice alla volta (come le chiavi nel merge degli edge)
+    partner = _zeros_memmap(tmp_dir, "chain.partner", np.int64, (2 * n,))
+
+    def pair(keys, ids):
+        pos = pair_ends(keys)
+        partner[ids] = np.where(pos >= 0, ids[np.maximum(pos, 0)], -1)
+
+    carry_keys = carry_ids = np.zeros(0, dtype=np.int64)
+    for keys, ids in merged(end_keys, end_ids, 2 * block):
+        keys, ids = np.concatenate([carry_keys, keys]), np.concatenate([carry_ids, ids])
+        # l'ultimo vertice potrebbe continuare nel blocco successivo
+        cut = int(np.searchsorted(keys >> 1, keys[-1] >> 1, side="left"))
+        carry_keys, carry_ids = keys[cut:], ids[cut:]
+        if cut:
+            pair(keys[:cut], ids[:cut])
+    if len(carry_keys):
+        pair(carry_keys, carry_ids)
+
+    # 4. catene: edge uniti attraverso gli estremi accoppiati
+    parent = _zeros_memmap(tmp_dir, "chain.parent", np.int64, (n,))
+    for s in range(0, n, block):
+        parent[s:s + block] = np.arange(s, min(s + block, n))
+    for s in range(0, 2 * n, block):
+        p = np.asarray(partner[s:s + block])
+        e = np.arange(s, s + len(p))
+        # ogni coppia compare due volte
+        keep = p > e
+        _union(parent, e[keep] >> 1, p[keep] >> 1)
+
+    # 5. per radice: edge, perimetro, box e primi estremi liberi (uscita, entrata)
+    n_edges = _zeros_memmap(tmp_dir, "chain.n", np.int64, (n,))
+    perimeter = _zeros_memmap(tmp_dir, "chain.perimeter", np.float64, (n,))
+    bbox_min = _zeros_memmap(tmp_dir, "chain.min", np.float64, (n, 3))
+    bbox_max = _zeros_memmap(tmp_dir, "chain.max", np.float64, (n, 3))
+    free = _zeros_memmap(tmp_dir, "chain.free", np.int64, (n, 2))
+    for s in range(0, n, block):
+        bbox_min[s:s + block], bbox_max[s:s + block], free[s:s + block] = np.inf, -np.inf, 2 * n
+    for s in range(0, n, block):
+        c = np.asarray(canon[s:s + block])
+        roots = _find(parent, np.arange(s, s + len(c)))
+        p, q = np.asarray(verts[c >> _KEY_SHIFT]), np.asarray(verts[c & _KEY_MASK])
+        np.add.at(n_edges, roots, 1)
+        np.add.at(perimeter, roots, np.linalg.norm(q - p, axis=1))
+        np.minimum.at(bbox_min, roots, np.minimum(p, q))
+        np.maximum.at(bbox_max, roots, np.maximum(p, q))
+        ends = np.flatnonzero(np.asarray(partner[2 * s:2 * (s + len(c))]) < 0) + 2 * s
+        np.minimum.at(free, (roots[(ends >> 1) - s], ends & 1), ends)
+
+    # 6. ordine delle catene in chain_boundary: prima le aperte dalla prima
+    # uscita libera, poi dalla prima entrata libera, poi i cicli dal loro
+    # edge minimo; si tengono le limit di perimetro maggiore
+    n_loops = n_chains = 0
+    top = np.zeros(0, dtype=np.int64)
+    top_rank = np.zeros(0, dtype=np.int64)
+    top_start = np.zeros(0, dtype=np.int64)
+    for s in range(0, n, block):
+        ids = np.arange(s, min(s + block, n))
+        roots = ids[np.asarray(parent[s:s + block]) == ids]
+        f = np.asarray(free[roots])
+        kind = np.where(f[:, 0] < 2 * n, 0, np.where(f[:, 1] < 2 * n, 1, 2))
+        start = np.where(kind == 0, f[:, 0], np.where(kind == 1, f[:, 1], 2 * roots))
+        n_loops += int(np.count_nonzero(kind == 2))
+        n_chains += len(roots)
+        top, top_rank, top_start = (np.concatenate([top, roots]), np.concatenate([top_rank, kind * 2 * n + start]),
+                                    np.concatenate([top_start, start]))
+        keep = np.lexsort((top_rank, -np.asarray(perimeter[top])))[:limit]
+        top, top_rank, top_start = top[keep], top_rank[keep], top_start[keep]
+    start_edges = np.asarray(canon[top_start >> 1])
+    start_vertex = np.where(top_start & 1, start_edges & _KEY_MASK, start_edges >> _KEY_SHIFT)
+    return {
+        "n_boundary_loops": n_loops,
+        "n_open_boundary_chains": n_chains - n_loops,
+        "boundary_loops": [
+            {
+                "closed": bool(rank >= 4 * n),
+                "n_edges": int(n_edges[r]),
+                "perimeter": float(perimeter[r]),
+                "bbox_min": np.asarray(bbox_min[r]).tolist(),
+                "bbox_max": np.asarray(bbox_max[r]).tolist(),
+                "start_vertex": int(v),
+            }
+            for r, rank, v in zip(top.tolist(), top_rank.tolist(), start_vertex.tolist())
+        ],
+    }
+
+
+def analyze_streaming(path, tol=1e-6, memory_limit=DEFAULT_MEMORY_LIMIT, tmp_dir=None,
+                      intersection_limit=None):
+    """Come check.analyze(path, tol)[0], con memoria limitata a circa memory_limit.
+
+    intersection_limit: coppie di triangoli che si intersecano dopo cui la
+    ricerca delle auto-intersezioni si ferma (vedi mesh_intersect).
+    """
+    # ~512 byte di temporanei per elemento (faccia, vertice, edge) nei passi a blocchi
+    block = max(1 << 12, memory_limit // 512)
+    with tempfile.TemporaryDirectory(prefix="objdoctor-", dir=tmp_dir) as tmp:
+        # 1. parse a blocchi
+        vert_spill = _Spill(tmp, "verts", np.float64, 3)
+        size_spill = _Spill(tmp, "sizes", np.int64)
+        index_spill = _Spill(tmp, "indices", np.int64)
+        for chunk in _text_chunks(path, max(1 << 20, memory_limit // 8)):
+            v, off, idx = parse_obj_bytes(chunk, vertex_base=vert_spill.count)
+            vert_spill.append(v)
+            size_spill.append(np.diff(off))
+            index_spill.append(idx)
+        verts = vert_spill.array()
+        sizes = size_spill.array()
+        indices = index_spill.array()
+        nverts, nfaces = len(verts), len(sizes)
+
+        # 2. aree e run ordinate di chiavi degli edge
+        n_degenerate = 0
+        degenerate = []
+        # run ordinate accodate in due soli file; run_bounds delimita ogni run
+        run_keys = _Spill(tmp, "runs.k", np.int64)
+        run_faces = _Spill(tmp, "runs.f", np.int64, 3)
+        run_bounds = [0]
+        start = 0
+        # triangoli validi con faccia e box, per le auto-intersezioni
+        tri_spill = _Spill(tmp, "tris", np.int64, 3)
+        tri_face_spill = _Spill(tmp, "tri_face", np.int64)
+        lo_spill = _Spill(tmp, "tri_lo", np.float64, 3)
+        hi_spill = _Spill(tmp, "tri_hi", np.float64, 3)
+        for s in range(0, nfaces, block):
+            chunk_sizes = np.asarray(sizes[s:s + block])
+            off = np.zeros(len(chunk_sizes) + 1, dtype=np.int64)
+            np.cumsum(chunk_sizes, out=off[1:])
+            idx = np.asarray(indices[start:start + off[-1]])
+            start += int(off[-1])
+            areas, _ = face_areas_normals(verts, off, idx)
+            deg = np.flatnonzero(areas <= 1e-9)
+            n_degenerate += len(deg)
+            degenerate.extend((deg[:6 - len(degenerate)] + s).tolist())
+            src, dst, face_of = half_edges(off, idx)
+            keys = (np.minimum(src, dst) << _KEY_SHIFT) | np.maximum(src, dst)
+            order = np.argsort(keys, kind="stable")
+            run_keys.append(keys[order])
+            # faccia * 2 + verso dell'half-edge (1 se va da max a min), per i loop di bordo,
+            # e i corner globali del suo estremo minore e maggiore, per i ventagli
+            corner = np.arange(len(idx), dtype=np.int64)
+            nxt = corner_next(off)
+            lo_corner = np.where(src > dst, nxt, corner) + start - off[-1]
+            hi_corner = np.where(src > dst, corner, nxt) + start - off[-1]
+            run_faces.append(np.stack([((face_of + s) << 1) | (src > dst), lo_corner, hi_corner], axis=1)[order])
+            run_bounds.append(run_keys.count)
+            tris, tri_face = triangle_faces(off, idx)
+            valid, corners = valid_triangles(verts, tris)
+            tri_spill.append(tris[valid])
+            tri_face_spill.append(tri_face[valid] + s)
+            lo_spill.append(corners.min(axis=1))
+            hi_spill.append(corners.max(axis=1))
+
+        # 3. merge delle run: conteggi edge, coppie flipped, union-find
+        all_keys, all_faces = run_keys.array(), run_faces.array()
+        runs = [(all_keys[a:b], all_faces[a:b]) for a, b in zip(run_bounds[:-1], run_bounds[1:])]
+        parent = _zeros_memmap(tmp, "parent", np.int64, (nfaces,))
+        # nodi 2f / 2f+1: faccia f tenuta / invertita (vedi mesh_topology.orientation)
+        parity = _zeros_memmap(tmp, "parity", np.int64, (2 * nfaces,))
+        for s in range(0, nfaces, block):
+            parent[s:s + block] = np.arange(s, min(s + block, nfaces))
+        for s in range(0, 2 * nfaces, block):
+            parity[s:s + block] = np.arange(s, min(s + block, 2 * nfaces))
+        # ventagli: union-find sui corner (vedi mesh_topology.vertex_fans)
+        ncorners = len(indices)
+        fans = _zeros_memmap(tmp, "fans", np.int64, (ncorners,))
+        for s in range(0, ncorners, block):
+            fans[s:s + block] = np.arange(s, min(s + block, ncorners))
+        stats = {"boundary": 0, "nonmanifold": 0, "flipped": 0}
+        examples = {"boundary": [], "nonmanifold": [], "flipped": []}
+
+        def decode(keys):
+            return list(zip((keys >> _KEY_SHIFT).tolist(), (keys & _KEY_MASK).tolist()))
+
+        boundary_src = _Spill(tmp, "boundary.src", np.int64)
+        boundary_dst = _Spill(tmp, "boundary.dst", np.int64)
+
+        def consume(keys, payload):
+            tagged = payload[:, 0]
+            faces = tagged >> 1
+            new = np.empty(len(keys), dtype=bool)
+            new[:1] = True
+            np.not_equal(keys[1:], keys[:-1], out=new[1:])
+            starts = np.flatnonzero(new)
+            counts = np.diff(np.append(starts, len(keys)))
+            for name, mask in (("boundary", counts == 1), ("nonmanifold", counts > 2)):
+                stats[name] += int(mask.sum())
+                have = examples[name]
+                have.extend(decode(keys[starts[mask][:6 - len(have)]]))
+            # half-edge di bordo orientati come nella loro faccia
+            b = starts[counts == 1]
+            lo, hi = keys[b] >> _KEY_SHIFT, keys[b] & _KEY_MASK
+            flip = (tagged[b] & 1).astype(bool)
+            boundary_src.append(np.where(flip, hi, lo))
+            boundary_dst.append(np.where(flip, lo, hi))
+            pair = starts[counts == 2]
+            # gli edge (v, v) non hanno verso
+            pair = pair[(keys[pair] >> _KEY_SHIFT) != (keys[pair] & _KEY_MASK)]
+            fi, fj = faces[pair], faces[pair + 1]
+            # stesso verso sui due half-edge: facce incoerenti
+            flipped = ((tagged[pair] ^ tagged[pair + 1]) & 1) == 0
+            stats["flipped"] += int(flipped.sum())
+            _union(parity, np.concatenate([2 * fi, 2 * fi + 1]),
+                   np.concatenate([2 * fj + flipped, 2 * fj + 1 - flipped]))
+            have = examples["flipped"]
+            take = np.flatnonzero(flipped)[:6 - len(have)]
+            have.extend(zip(fi[take].tolist(), fj[take].tolist(), decode(keys[pair[take]])))
+            link = ~new[1:]
+            _union(parent, faces[:-1][link], faces[1:][link])
+            # corner sullo stesso estremo di un edge: stesso ventaglio
+            # negli edge (v, v) i due estremi sono lo stesso vertice
+            loop = (keys >> _KEY_SHIFT) == (keys & _KEY_MASK)
+            _union(fans, np.concatenate([payload[:-1, 1][link], payload[:-1, 2][link], payload[loop, 1]]),
+                   np.concatenate([payload[1:, 1][link], payload[1:, 2][link], payload[loop, 2]]))
+
+        carry_keys = np.zeros(0, dtype=np.int64)
+        carry_faces = np.zeros((0, 3), dtype=np.int64)
+        per_run = max(1 << 10, block // max(len(runs), 1))
+        for keys, faces in _merge_runs(runs, per_run):
+            keys = np.concatenate([carry_keys, keys])
+            faces = np.concatenate([carry_faces, faces])
+            # l'ultima chiave potrebbe continuare nel blocco successivo
+            cut = int(np.searchsorted(keys, keys[-1], side="left"))
+            carry_keys, carry_faces = keys[cut:], faces[cut:]
+            if cut:
+                consume(keys[:cut], faces[:cut])
+        if len(carry_keys):
+            consume(carry_keys, carry_faces)
+
+        # loop di bordo: in memoria se ci stanno, altrimenti su disco (es. una
+        # zuppa di triangoli, dove ogni edge e' di bordo)
+        src, dst = boundary_src.array(), boundary_dst.array()
+        if len(src) * _CHAIN_BYTES_PER_EDGE <= memory_limit:
+            loops = chain_summary(verts, *chain_boundary(np.asarray(src), np.asarray(dst)))
+        else:
+            loops = _chain_summary(verts, src, dst, tmp, block)
+
+        # componenti: radice (faccia minima) di ogni faccia, conteggi su memmap;
+        # delle dimensioni restano solo le COMPONENT_SIZES_LIMIT maggiori
+        comp_count = _zeros_memmap(tmp, "comp_count", np.int64, (nfaces,))
+        for s in range(0, nfaces, block):
+            roots, counts = np.unique(_find(parent, np.arange(s, min(s + block, nfaces))), return_counts=True)
+            comp_count[roots] += counts
+        n_components = 0
+        component_sizes = np.zeros(0, dtype=np.int64)
+        for s in range(0, nfaces, block):
+            c = np.asarray(comp_count[s:s + block])
+            c = c[c > 0]
+            n_components += len(c)
+            component_sizes = np.sort(np.concatenate([component_sizes, c]))[::-1][:COMPONENT_SIZES_LIMIT]
+
+        # verso: come in mesh_topology.orientation, per componente si inverte
+        # il gruppo di facce piu' piccolo; i conteggi sono indicizzati dalla
+        # faccia minima della componente
+        n_side = _zeros_memmap(tmp, "n_side", np.int64, (nfaces,))
+        n_comp = _zeros_memmap(tmp, "n_comp", np.int64, (nfaces,))
+
+        def sides(s):
+            f = np.arange(s, min(s + block, nfaces))
+            r0, r1 = _find(parity, 2 * f), _find(parity, 2 * f + 1)
+            return np.minimum(r0, r1) >> 1, r0 > r1, r0 == r1
+
+        for s in range(0, nfaces, block):
+            comp, side, _ = sides(s)
+            roots, counts = np.unique(comp, return_counts=True)
+            n_comp[roots] += counts
+            roots, counts = np.unique(comp[side], return_counts=True)
+            n_side[roots] += counts
+        n_flip = 0
+        # componenti non orientabili, segnate sulla loro radice
+        non_orientable_roots = _zeros_memmap(tmp, "non_orientable", np.bool_, (nfaces,))
+        for s in range(0, nfaces, block):
+            comp, side, non_orientable = sides(s)
+            keep_side = 2 * np.asarray(n_side[comp]) > np.asarray(n_comp[comp])
+            n_flip += int(np.count_nonzero((side != keep_side) & ~non_orientable))
+            non_orientable_roots[_find(parent, comp[non_orientable])] = True
+        n_non_orientable = sum(int(np.count_nonzero(non_orientable_roots[s:s + block]))
+                               for s in range(0, nfaces, block))
+
+        # vertici non-manifold: ventagli (corner radice) per vertice, conteggi su memmap
+        n_fans = _zeros_memmap(tmp, "n_fans", np.int64, (nverts,))
+        for s in range(0, ncorners, block):
+            c = np.arange(s, min(s + block, ncorners))
+            roots = c[_find(fans, c) == c]
+            v, counts = np.unique(np.asarray(indices[roots]), return_counts=True)
+            n_fans[v] += counts
+        n_bowties = 0
+        bowties = []
+        for s in range(0, nverts, block):
+            found = np.flatnonzero(np.asarray(n_fans[s:s + block]) > 1)
+            n_bowties += len(found)
+            bowties.extend((found[:6 - len(bowties)] + s).tolist())
+
+        # 4. duplicati esatti e quasi-duplicati per bucket, ~512 byte per vertice in RAM
+        nbuckets = max(1, -(-nverts * 512 // memory_limit))
+        n_dup, near_dups = _vertex_duplicates(verts, tol, tmp, block, nbuckets)
+
+        # 5. auto-intersezioni per bucket di celle
+        pairs, complete = _self_intersections(verts, tri_spill.array(), tri_face_spill.array(), lo_spill.array(),
+                                              hi_spill.array(), tmp, block, memory_limit, intersection_limit)
+
+        summary = {
+            "path": path,
+            "nverts": nverts,
+            "nfaces": nfaces,
+            "duplicate_positions_exact_count": int(n_dup),
+            "near_duplicate_groups_count": len(near_dups),
+            "n_components": n_components,
+            "component_sizes": component_sizes.tolist(),
+            "n_boundary_edges": stats["boundary"],
+            "n_nonmanifold_edges": stats["nonmanifold"],
+            "n_nonmanifold_vertices": n_bowties,
+            **loops,
+            "n_degenerate_faces": n_degenerate,
+            "n_flipped_adjacent_pairs": stats["flipped"],
+            "n_faces_to_flip": n_flip,
+            "n_non_orientable_components": n_non_orientable,
+            "examples_boundary_edges": examples["boundary"],
+            "examples_nonmanifold_edges": examples["nonmanifold"],
+            "examples_nonmanifold_vertices": bowties,
+            "examples_flipped_pairs": examples["flipped"],
+            "degenerate_faces": degenerate,
+            "n_self_intersecting_pairs": len(pairs),
+            "self_intersections_complete": complete,
+            "examples_self_intersecting_pairs": list(map(tuple, pairs[:6].tolist())),
+        }
+        return summary
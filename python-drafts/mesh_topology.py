@@ -0,0 +1,539 @@
+# Topologia della mesh su array: tabella degli edge e relazione edge -> facce.
+#
+# Tutte le funzioni lavorano sul layout CSR prodotto da obj_io:
+# face_offsets (F+1,) e face_indices (sum,), indici 0-based.
+
+import copy
+
+import numpy as np
+
+
+def face_sizes(face_offsets):
+    return np.diff(face_offsets)
+
+
+def select_faces(face_offsets, face_indices, keep):
+    """Sotto-mesh CSR con le sole facce per cui keep (maschera booleana) e' True."""
+    sizes = face_sizes(face_offsets)[keep]
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    return offsets, face_indices[np.repeat(keep, face_sizes(face_offsets))]
+
+
+def reverse_faces(face_offsets, face_indices, flip):
+    """face_indices con l'ordine dei vertici invertito nelle facce dove flip e' True."""
+    corners = np.arange(len(face_indices), dtype=np.int64)
+    face_of = corner_faces(face_offsets)
+    mirrored = face_offsets[:-1][face_of] + face_offsets[1:][face_of] - 1 - corners
+    return face_indices[np.where(flip[face_of], mirrored, corners)]
+
+
+def corner_next(face_offsets):
+    """Per ogni corner il corner successivo nella stessa faccia."""
+    sizes = face_sizes(face_offsets)
+    nxt = np.arange(1, int(face_offsets[-1]) + 1, dtype=np.int64)
+    nonempty = sizes > 0
+    # l'ultimo corner di ogni faccia torna al primo
+    nxt[face_offsets[1:][nonempty] - 1] = face_offsets[:-1][nonempty]
+    return nxt
+
+
+def corner_faces(face_offsets):
+    """Per ogni corner la faccia a cui appartiene."""
+    sizes = face_sizes(face_offsets)
+    return np.repeat(np.arange(len(sizes), dtype=np.int64), sizes)
+
+
+def half_edges(face_offsets, face_indices):
+    """Half-edge di tutte le facce: (origine, destinazione, faccia), uno per corner."""
+    return face_indices, face_indices[corner_next(face_offsets)], corner_faces(face_offsets)
+
+
+def fan_triangles(face_offsets, face_indices):
+    """Triangolazione a ventaglio (v0, vj, vj+1) di tutte le facce, array (T, 3).
+
+    Le facce con meno di 3 vertici non producono triangoli; se sono tutte
+    triangoli il risultato e' una vista di face_indices.
+    """
+    sizes = face_sizes(face_offsets)
+    if len(face_indices) == 3 * len(sizes) and (sizes == 3).all():
+        return face_indices.reshape(-1, 3)
+    ntri = np.maximum(sizes - 2, 0)
+    first = np.repeat(face_offsets[:-1], ntri)
+    j = first + np.arange(int(ntri.sum()), dtype=np.int64) - np.repeat(np.cumsum(ntri) - ntri, ntri) + 1
+    return np.stack([face_indices[first], face_indices[j], face_indices[j + 1]], axis=1)
+
+
+def edge_keys(src, dst, nverts):
+    """Chiave int64 dell'edge non orientato: min * nverts + max."""
+    return np.minimum(src, dst) * np.int64(max(nverts, 1)) + np.maximum(src, dst)
+
+
+def expand_ranges(starts, counts):
+    """Per ogni range i: (i ripetuto, starts[i] + 0..counts[i]-1)."""
+    owner = np.repeat(np.arange(len(starts), dtype=np.int64), counts)
+    pos = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    return owner, pos
+
+
+def _merge_sorted(keys, corners, drop, new_keys, new_corners):
+    """Toglie le posizioni drop e inserisce (new_keys, new_corners) mantenendo
+    l'ordine per (chiave, corner), con lavoro lineare invece di un nuovo sort."""
+    keys, corners = keys[~drop], corners[~drop]
+    o = np.lexsort((new_corners, new_keys))
+    new_keys, new_corners = new_keys[o], new_corners[o]
+    lo = np.searchsorted(keys, new_keys, side="left")
+    hi = np.searchsorted(keys, new_keys, side="right")
+    # dentro un gruppo di chiavi uguali: quanti corner esistenti vengono prima
+    owner, pos = expand_ranges(lo, hi - lo)
+    before = np.bincount(owner, weights=corners[pos] < new_corners[owner], minlength=len(new_keys))
+    ins = lo + before.astype(np.int64)
+    return np.insert(keys, ins, new_keys), np.insert(corners, ins, new_corners)
+
+
+class EdgeTable:
+    """Edge non orientati della mesh con conteggio e lista di facce (CSR).
+
+    Gli edge sono coppie (min, max) codificate come chiave int64
+    min * nverts + max e ordinati per chiave. Ogni half-edge contribuisce una
+    volta, come nel vecchio defaultdict(list): una faccia che ripete un edge
+    compare piu' volte nella sua lista.
+    """
+
+    # array che descrivono completamente la tabella (vedi to_arrays/from_arrays)
+    ARRAYS = ("keys", "edges", "edge_face_offsets", "edge_faces", "half_edge_edge")
+
+    def __init__(self, face_offsets, face_indices, nverts=None):
+        src, dst, face_of = half_edges(face_offsets, face_indices)
+        if nverts is None:
+            nverts = int(face_indices.max()) + 1 if len(face_indices) else 0
+        keys = edge_keys(src, dst, nverts)
+        order = np.argsort(keys, kind="stable")
+        self._build(keys[order], order, face_of, nverts)
+
+    @classmethod
+    def from_sorted_half_edges(cls, sorted_keys, order, face_of, nverts):
+        """Tabella da half-edge gia' ordinati per chiave (order: posizione -> corner)."""
+        table = cls.__new__(cls)
+        table._build(sorted_keys, order, face_of, nverts)
+        return table
+
+    def _build(self, sorted_keys, order, face_of, nverts):
+        self.nverts = nverts
+        new_edge = np.empty(len(sorted_keys), dtype=bool)
+        new_edge[:1] = True
+        np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=new_edge[1:])
+        starts = np.flatnonzero(new_edge)
+
+        self.keys = sorted_keys[starts]
+        n = np.int64(max(nverts, 1))
+        self.edges = np.stack([self.keys // n, self.keys % n], axis=1)
+        self.edge_face_offsets = np.append(starts, len(sorted_keys)).astype(np.int64)
+        self.face_count = np.diff(self.edge_face_offsets)
+        self.edge_faces = face_of[order]
+        # per ogni corner (half-edge in posizione face_indices) l'id dell'edge
+        self.half_edge_edge = np.empty(len(sorted_keys), dtype=np.int64)
+        self.half_edge_edge[order] = np.cumsum(new_edge) - 1
+
+    def to_arrays(self):
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, arrays, nverts):
+        """Ricostruisce la tabella da to_arrays() (es. array mmap dalla cache)."""
+        table = cls.__new__(cls)
+        table.nverts = nverts
+        for name in cls.ARRAYS:
+            setattr(table, name, arrays[name])
+        table.face_count = np.diff(table.edge_face_offsets)
+        return table
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def boundary_mask(self):
+        return self.face_count == 1
+
+    @property
+    def manifold_mask(self):
+        return self.face_count == 2
+
+    @property
+    def nonmanifold_mask(self):
+        return self.face_count > 2
+
+    def faces_of(self, edge_ids, skip=0, return_edges=False):
+        """Facce (con ripetizioni) che usano gli edge indicati.
+
+        skip salta le prime facce di ogni edge; con return_edges=True
+        restituisce anche, per ogni faccia, l'edge da cui proviene.
+        """
+        edge_ids = np.asarray(edge_ids, dtype=np.int64)
+        starts = self.edge_face_offsets[edge_ids] + skip
+        counts = np.maximum(self.face_count[edge_ids] - skip, 0)
+        owner, pos = expand_ranges(starts, counts)
+        if return_edges:
+            return self.edge_faces[pos], edge_ids[owner]
+        return self.edge_faces[pos]
+
+    def edge_face_dict(self, mask):
+        """{(a, b): [facce]} per gli edge selezionati, per il codice a dizionario."""
+        ids = np.flatnonzero(mask)
+        bounds = self.edge_face_offsets.tolist()
+        faces = self.edge_faces.tolist()
+        return {
+            (a, b): faces[bounds[e]:bounds[e + 1]]
+            for e, (a, b) in zip(ids.tolist(), self.edges[ids].tolist())
+        }
+
+
+def union_find(n, u, v):
+    """Radici delle componenti del grafo (u, v) su n nodi.
+
+    Union-find vettorizzato: ad ogni giro ogni arco aggancia la radice maggiore
+    a quella minore, poi i puntatori vengono compressi fino alle radici. La
+    radice finale di ogni componente e' il suo nodo di indice minimo.
+    """
+    parent = np.arange(n, dtype=np.int64)
+    while len(u):
+        ru = parent[u]
+        rv = parent[v]
+        differ = ru != rv
+        if not differ.any():
+            break
+        u, v = u[differ], v[differ]
+        lo = np.minimum(ru[differ], rv[differ])
+        hi = np.maximum(ru[differ], rv[differ])
+        np.minimum.at(parent, hi, lo)
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+    return parent
+
+
+def face_components(edges, nfaces):
+    """Componenti connesse di facce che condividono un edge.
+
+    Usa direttamente la CSR edge -> facce: le facce di ogni edge sono collegate
+    a catena, quindi gli archi sono lineari nel numero di half-edge anche su
+    edge molto non-manifold. Restituisce (label per faccia, dimensioni); le
+    componenti sono numerate nell'ordine della loro prima faccia.
+    """
+    owner = np.repeat(np.arange(len(edges)), edges.face_count)
+    link = np.flatnonzero(owner[1:] == owner[:-1])
+    roots = union_find(nfaces, edges.edge_faces[link], edges.edge_faces[link + 1])
+    _, labels, sizes = np.unique(roots, return_inverse=True, return_counts=True)
+    return labels.astype(np.int64), sizes
+
+
+def orientation(face_offsets, face_indices, edges):
+    """Coerenza del verso delle facce dai soli half-edge, senza normali.
+
+    Sugli edge con esattamente 2 facce i due half-edge devono avere versi
+    opposti; se partono dallo stesso vertice le due facce sono incoerenti.
+    Gli edge non-manifold non vincolano l'orientamento. Il verso si propaga
+    in ogni componente con un union-find a parita' (nodi 2f e 2f+1 = faccia f
+    tenuta o invertita): una componente e' non orientabile (es. Moebius) se
+    i due nodi di una faccia finiscono insieme. In ogni componente orientabile
+    si inverte il gruppo di facce piu' piccolo.
+    Restituisce (edge incoerenti ordinati, flip (F,) bool, non_orientable (F,)
+    bool); le facce delle componenti non orientabili non sono mai in flip.
+    """
+    nfaces = len(face_offsets) - 1
+    hee = edges.half_edge_edge
+    corners = np.flatnonzero(edges.manifold_mask[hee])
+    e = hee[corners]
+    # uno qualsiasi dei due corner di ogni edge, poi l'altro
+    first = np.empty(len(edges), dtype=np.int64)
+    first[e] = corners
+    b = corners[first[e] != corners]
+    e = hee[b]
+    a = first[e]
+    # gli edge (v, v) non hanno verso
+    proper = edges.edges[e, 0] != edges.edges[e, 1]
+    a, b, e = a[proper], b[proper], e[proper]
+    inconsistent = face_indices[a] == face_indices[b]
+    bad = np.zeros(len(edges), dtype=bool)
+    bad[e[inconsistent]] = True
+
+    face_of = corner_faces(face_offsets)
+    fa, fb = 2 * face_of[a], 2 * face_of[b] + inconsistent
+    roots = union_find(2 * nfaces, np.concatenate([fa, fa + 1]), np.concatenate([fb, fb ^ 1]))
+    r0, r1 = roots[0::2], roots[1::2]
+    non_orientable = r0 == r1
+    # la radice minore e' sempre 2 * (faccia minima della componente)
+    comp = np.minimum(r0, r1) >> 1
+    side = r0 > r1
+    n_side = np.bincount(comp[side], minlength=nfaces)
+    n_comp = np.bincount(comp, minlength=nfaces)
+    keep_side = 2 * n_side[comp] > n_comp[comp]
+    flip = (side != keep_side) & ~non_orientable
+    return np.flatnonzero(bad), flip, non_orientable
+
+
+def vertex_fans(face_offsets, face_indices, edges):
+    """Ventagli di facce attorno a ogni vertice.
+
+    Due corner sullo stesso vertice stanno nello stesso ventaglio se le loro
+    facce condividono un edge che contiene quel vertice. Ogni half-edge tocca
+    i corner dei suoi due estremi: per ogni (edge, estremo) i corner sono
+    agganciati a uno di loro con uno scatter, senza ordinamenti, e un solo
+    union-find sui corner da' i ventagli. Un vertice con piu' di un ventaglio
+    e' non-manifold (bowtie): superfici che si toccano in un punto.
+    Restituisce (ventaglio di ogni corner = suo corner minimo, numero di
+    ventagli per vertice (V,)).
+    """
+    ncorners = len(face_indices)
+    corners = np.arange(ncorners, dtype=np.int64)
+    nxt = corner_next(face_offsets)
+    hee = edges.half_edge_edge
+    # (edge, estremo) -> nodo 2e (vertice minore) o 2e+1 (maggiore)
+    at_src = 2 * hee + (face_indices > face_indices[nxt])
+    at_dst = 2 * hee + (face_indices[nxt] > face_indices)
+    first = np.empty(2 * len(edges), dtype=np.int64)
+    first[at_src] = corners
+    first[at_dst] = nxt
+    fans = union_find(ncorners, np.concatenate([corners, nxt]), np.concatenate([first[at_src], first[at_dst]]))
+    n_fans = np.bincount(face_indices[fans == corners], minlength=edges.nverts)
+    return fans, n_fans
+
+
+def split_vertex_fans(face_indices, fans, nverts):
+    """face_indices con un vertice nuovo per ogni ventaglio oltre il primo.
+
+    Il ventaglio con il corner minore tiene il vertice originale. Restituisce
+    (face_indices, vertice originale di ogni vertice nuovo); i nuovi vertici
+    sono numerati da nverts in poi.
+    """
+    roots = np.flatnonzero(fans == np.arange(len(face_indices)))
+    # radici gia' in ordine crescente: lexsort stabile per vertice
+    order = roots[np.argsort(face_indices[roots], kind="stable")]
+    v = face_indices[order]
+    extra = order[np.append(False, v[1:] == v[:-1])]
+    new_id = np.full(len(face_indices), -1, dtype=np.int64)
+    new_id[extra] = nverts + np.arange(len(extra), dtype=np.int64)
+    moved = new_id[fans]
+    return np.where(moved >= 0, moved, face_indices), face_indices[extra]
+
+
+def pair_ends(sorted_key):
+    """Compagni degli estremi di edge in ogni vertice, come in chain_boundary.
+
+    sorted_key: 2 * vertice + (1 per un'entrata, 0 per un'uscita) di ogni
+    estremo, ordinate; a parita' di chiave l'ordine decide gli accoppiamenti.
+    Restituisce per ogni posizione quella del compagno, -1 se non ne ha.
+    """
+    idx = np.arange(len(sorted_key))
+    group_lo = np.searchsorted(sorted_key, sorted_key, side="left")
+    group_count = np.searchsorted(sorted_key, sorted_key, side="right") - group_lo
+    rank = idx - group_lo
+    # estremi dell'altro tipo (entrate per un'uscita e viceversa) nello stesso vertice
+    opp_lo = np.searchsorted(sorted_key, sorted_key ^ 1, side="left")
+    opp_count = np.searchsorted(sorted_key, sorted_key ^ 1, side="right") - opp_lo
+    pos = np.full(len(sorted_key), -1, dtype=np.int64)
+    crossed = rank < opp_count
+    pos[crossed] = opp_lo[crossed] + rank[crossed]
+    # quelli rimasti a coppie tra loro: (0, 1), (2, 3), ...
+    left = rank - opp_count
+    even = ~crossed & (left % 2 == 0) & (rank + 1 < group_count)
+    pos[even] = idx[even] + 1
+    odd = ~crossed & (left % 2 == 1)
+    pos[odd] = idx[odd] - 1
+    return pos
+
+
+def chain_boundary(src, dst):
+    """Concatena gli edge di bordo src -> dst in loop chiusi e catene aperte.
+
+    Gli edge sono concatenati per adiacenza dei vertici, senza guardare il
+    verso: un bordo resta un loop anche se qualche faccia e' girata al
+    contrario (o se la superficie non e' orientabile, come un nastro di
+    Moebius). In ogni vertice gli estremi sono accoppiati prima entrata con
+    uscita, in ordine, e poi quelli rimasti tra loro; un estremo senza
+    compagno (nei vertici con un numero dispari di edge di bordo) chiude una
+    catena aperta. Restituisce (src, dst, chain_offsets, closed): src/dst
+    riordinati catena per catena e girati nel verso di percorrenza, che
+    segue quello delle facce dove sono coerenti; closed[i] dice se la
+    catena i e' un loop (un buco).
+    """
+    n = len(src)
+    # ordine canonico per (src, dst): il risultato non dipende dall'ordine
+    # in cui arrivano gli edge
+    canon = np.lexsort((dst, src))
+    src, dst = src[canon], dst[canon]
+    # estremo 2i: uscita dell'edge i da src[i]; estremo 2i+1: entrata in dst[i]
+    end_vertex = np.empty(2 * n, dtype=np.int64)
+    end_vertex[0::2], end_vertex[1::2] = src, dst
+    is_in = np.arange(2 * n, dtype=np.int64) & 1
+    key = 2 * end_vertex + is_in
+    by_key = np.argsort(key, kind="stable")
+    pos = pair_ends(key[by_key])
+    partner = np.full(2 * n, -1, dtype=np.int64)
+    partner[by_key] = np.where(pos >= 0, by_key[np.maximum(pos, 0)], -1)
+
+    # prima le catene aperte, dagli estremi senza compagno (le uscite prima,
+    # cosi' il verso segue le facce), poi i cicli rimasti
+    free = np.flatnonzero(partner < 0)
+    starts = np.concatenate([free[free % 2 == 0], free[free % 2 == 1], 2 * np.arange(n)]).tolist()
+    nxt = partner.tolist()
+    seen = bytearray(n)
+    order = []
+    backward = []
+    offsets = [0]
+    closed = []
+    for start in starts:
+        if seen[start >> 1]:
+            continue
+        end = start
+        while end != -1 and not seen[end >> 1]:
+            seen[end >> 1] = 1
+            order.append(end >> 1)
+            backward.append(end & 1)
+            # si esce dall'altro estremo e si entra nell'edge accoppiato
+            end = nxt[end ^ 1]
+        offsets.append(len(order))
+        closed.append(end == start)
+    order = np.array(order, dtype=np.int64)
+    backward = np.array(backward, dtype=bool)
+    src, dst = src[order], dst[order]
+    return (np.where(backward, dst, src), np.where(backward, src, dst),
+            np.array(offsets, dtype=np.int64), np.array(closed, dtype=bool))
+
+
+def boundary_loops(face_offsets, face_indices, edges):
+    """Bordi della mesh come catene di edge (vedi chain_boundary).
+
+    Restituisce (src, dst, chain_offsets, closed) con src/dst gia' nell'ordine
+    di percorrenza: la catena i e' src[chain_offsets[i]:chain_offsets[i+1]].
+    Dove le facce sono orientate in modo coerente il verso e' il loro, quindi
+    un buco viene percorso al contrario rispetto al bordo esterno.
+    """
+    corners = np.flatnonzero(edges.boundary_mask[edges.half_edge_edge])
+    src = face_indices[corners]
+    dst = face_indices[corner_next(face_offsets)[corners]]
+    return chain_boundary(src, dst)
+
+
+class MeshTopology:
+    """Indice topologico di una mesh, costruito una volta e riusato dalle query.
+
+    Contiene gli half-edge (un half-edge per corner: origine face_indices[c],
+    destinazione face_indices[next[c]], faccia face_of[c]), la EdgeTable e,
+    costruite alla prima richiesta, le relazioni vertice -> facce e
+    faccia -> facce in CSR. Dopo una modifica locale che cambia i vertici di
+    alcune facce (es. duplicazione di vertici) replace_face_corners aggiorna
+    gli indici con merge lineari invece di riordinare tutto.
+    """
+
+    def __init__(self, face_offsets, face_indices, nverts=None):
+        self.face_offsets = np.asarray(face_offsets, dtype=np.int64)
+        self.face_indices = np.array(face_indices, dtype=np.int64)
+        if nverts is None:
+            nverts = int(self.face_indices.max()) + 1 if len(self.face_indices) else 0
+        self.nverts = nverts
+        self.nfaces = len(self.face_offsets) - 1
+        self.half_edge_next = corner_next(self.face_offsets)
+        self.half_edge_face = corner_faces(self.face_offsets)
+        keys = edge_keys(self.face_indices, self.face_indices[self.half_edge_next], nverts)
+        self._he_order = np.argsort(keys, kind="stable")
+        self._he_keys = keys[self._he_order]
+        self.edges = EdgeTable.from_sorted_half_edges(self._he_keys, self._he_order, self.half_edge_face, nverts)
+        self._vf = None
+        self._face_faces = None
+        self._twin = None
+
+    @property
+    def half_edge_src(self):
+        return self.face_indices
+
+    @property
+    def half_edge_dst(self):
+        return self.face_indices[self.half_edge_next]
+
+    @property
+    def twin(self):
+        """Half-edge opposto sugli edge con esattamente 2 facce, -1 altrove."""
+        if self._twin is None:
+            twin = np.full(len(self.face_indices), -1, dtype=np.int64)
+            first = self.edges.edge_face_offsets[:-1][self.edges.manifold_mask]
+            a, b = self._he_order[first], self._he_order[first + 1]
+            twin[a], twin[b] = b, a
+            self._twin = twin
+        return self._twin
+
+    def vertex_faces(self):
+        """(offsets, facce) in CSR: facce incidenti a ogni vertice, con ripetizioni."""
+        if self._vf is None:
+            order = np.argsort(self.face_indices, kind="stable")
+            self._vf = (self.face_indices[order], order)
+        keys, corners = self._vf
+        offsets = np.searchsorted(keys, np.arange(self.nverts + 1))
+        return offsets, self.half_edge_face[corners]
+
+    def face_faces(self):
+        """(offsets, facce) in CSR: facce che condividono almeno un edge con ogni faccia."""
+        if self._face_faces is None:
+            e = self.edges
+            owner, pos = expand_ranges(e.edge_face_offsets[e.half_edge_edge], e.face_count[e.half_edge_edge])
+            a = self.half_edge_face[owner]
+            b = e.edge_faces[pos]
+            keep = a != b
+            pairs = np.unique(a[keep] * np.int64(max(self.nfaces, 1)) + b[keep])
+            src = pairs // max(self.nfaces, 1)
+            offsets = np.searchsorted(src, np.arange(self.nfaces + 1))
+            self._face_faces = (offsets, pairs % max(self.nfaces, 1))
+        return self._face_faces
+
+    def face_corners(self, face_ids):
+        """Indici dei corner delle facce indicate, faccia dopo faccia."""
+        face_ids = np.asarray(face_ids, dtype=np.int64)
+        starts = self.face_offsets[face_ids]
+        _, pos = expand_ranges(starts, self.face_offsets[face_ids + 1] - starts)
+        return pos
+
+    def copy(self):
+        """Copia da modificare con replace_face_corners senza toccare questa.
+
+        Solo face_indices viene scritto sul posto; gli altri array sono
+        sostituiti, non modificati, e restano condivisi.
+        """
+        other = copy.copy(self)
+        other.face_indices = self.face_indices.copy()
+        return other
+
+    def replace_face_corners(self, face_ids, corners, nverts=None):
+        """Sostituisce i vertici delle facce face_ids (stesse dimensioni).
+
+        corners sono i nuovi indici, concatenati nell'ordine di face_ids;
+        nverts e' il nuovo numero di vertici se ne sono stati aggiunti.
+        """
+        face_ids = np.asarray(face_ids, dtype=np.int64)
+        changed = self.face_corners(face_ids)
+        # gli half-edge che escono dai corner cambiati o vi entrano
+        prev = np.empty_like(self.half_edge_next)
+        prev[self.half_edge_next] = np.arange(len(prev))
+        touched = np.unique(np.concatenate([changed, prev[changed]]))
+
+        if nverts is not None and nverts != self.nverts:
+            old_n, new_n = np.int64(max(self.nverts, 1)), np.int64(max(nverts, 1))
+            # la codifica delle chiavi dipende da nverts; l'ordine non cambia
+            self._he_keys = (self._he_keys // old_n) * new_n + self._he_keys % old_n
+            self.nverts = nverts
+
+        is_touched = np.zeros(len(self.face_indices), dtype=bool)
+        is_touched[touched] = True
+        is_changed = np.zeros(len(self.face_indices), dtype=bool)
+        is_changed[changed] = True
+        self.face_indices[changed] = corners
+
+        new_keys = edge_keys(self.face_indices[touched], self.face_indices[self.half_edge_next[touched]], self.nverts)
+        self._he_keys, self._he_order = _merge_sorted(
+            self._he_keys, self._he_order, is_touched[self._he_order], new_keys, touched)
+        self.edges = EdgeTable.from_sorted_half_edges(self._he_keys, self._he_order, self.half_edge_face, self.nverts)
+        if self._vf is not None:
+            self._vf = _merge_sorted(self._vf[0], self._vf[1], is_changed[self._vf[1]], self.face_indices[changed], changed)
+        self._face_faces = None
+        self._twin = None
@@ -0,0 +1,549 @@
+# Stima rapida dello stato di una mesh (triage) da un campione del file.
+#
+# Un passaggio sequenziale divide il file in blocchi di righe intere e conta
+# le righe v e f di ogni blocco (obj_io.count_block_lines, senza convertire
+# numeri): da qui il numero esatto di vertici e facce e l'indice globale del
+# primo vertice/faccia di ogni blocco. E' lineare nella dimensione del file
+# (circa mezzo secondo ogni 100 MB), tutto il resto dipende solo dal
+# budget. Poi si leggono solo:
+#   - blocchi di vertici, uno a caso per strato di posizione nel file, in due
+#     estrazioni indipendenti;
+#   - blocchi di facce, uno a caso per strato;
+#   - le sole righe v usate da ogni blocco di facce: un blocco di facce entra
+#     nel campione se anche queste righe stanno nel budget. Cosi' si
+#     campionano le facce anche quando i loro vertici sono sparsi su tutto il
+#     file (es. tutte le righe v prima di tutte le f); se nessun blocco di
+#     facce ci sta, il sommario lo dice in triage["warnings"].
+# Le stime sono rapporti stratificati: ogni blocco pesa per le unita' del suo
+# strato nel file. Le unita' lette sono poi divise tra le celle di una griglia
+# GRID_CELLS^3 sul box dei vertici letti (strati spaziali): le unita' vicine
+# nello spazio non sono indipendenti, e la varianza e' tra i pezzi di blocco
+# di ogni cella piu' quella delle quote delle celle tra blocchi, mai meno
+# della varianza tra blocchi. L'intervallo e' quello di Wilson sul numero
+# effettivo di unita'; il limite superiore non scende sotto quello che si
+# avrebbe senza eventi visti, con ogni blocco come un solo campione: i difetti
+# raggruppati nel file (es. facce appese in fondo) possono stare tutti nei
+# blocchi non letti.
+#
+# Un duplicato si vede solo se anche la sua copia e' tra i blocchi estratti:
+# le due estrazioni danno a ogni coppia di blocchi una probabilita' nota di
+# essere letta insieme, e la stima pesa ogni duplicato visto per il suo
+# inverso. Una coppia di facce adiacenti conta solo se tutte le facce attorno
+# a un suo estremo sono nel campione: se no un edge non-manifold con due sole
+# facce lette sembrerebbe una coppia con verso incoerente. In un file con le
+# facce in ordine sparso (es. l'output di uno scanner) queste coppie non ci
+# sono quasi mai, e la stima delle coppie incoerenti e' None.
+
+import mmap
+import os
+from statistics import NormalDist
+
+import numpy as np
+
+from obj_io import parse_obj_bytes, count_block_lines, vertex_lines
+from mesh_geometry import face_areas_normals
+from mesh_spatial import near_duplicate_groups
+from mesh_profile import NULL_PROFILER
+from mesh_topology import EdgeTable, orientation
+
+# byte letti al massimo per i blocchi campionati
+TRIAGE_BUDGET = 16 << 20
+# blocchi di budget/4096 byte (almeno 4 KiB): molti cluster anche con budget piccoli
+BLOCKS_PER_BUDGET = 4096
+# byte letti per volta dal passaggio che conta le righe
+INDEX_CHUNK = 64 << 20
+# celle per asse della griglia degli strati spaziali
+GRID_CELLS = 8
+# quota di punti letti lasciata fuori da ogni lato del box della griglia
+BOX_QUANTILE = 0.005
+
+
+def block_index(path, block_bytes):
+    """Blocchi di righe intere del file: (confini (B+1,), righe v (B,), righe f (B,)).
+
+    Il file e' letto a pezzi di INDEX_CHUNK byte; ogni blocco finisce
+    all'ultima riga che chiude prima del multiplo successivo di block_bytes
+    (una riga piu' lunga di un blocco ne allunga uno).
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    chunk = max(INDEX_CHUNK // block_bytes, 1) * block_bytes
+    bounds, nv, nf = [np.zeros(1, dtype=np.int64)], [], []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = 0
+        while pos < size:
+            end = size if pos + chunk >= size else mm.rfind(b"\n", pos, pos + chunk) + 1
+            if end <= pos:
+                end = mm.find(b"\n", pos + chunk) + 1 or size
+            data = mm[pos:end]
+            ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10) + 1
+            at = np.searchsorted(ends, np.arange(block_bytes, len(data), block_bytes), side="right") - 1
+            cuts = np.unique(np.append(ends[at[at >= 0]], len(data)))
+            v, fc = count_block_lines(data, np.append(0, cuts))
+            bounds.append(pos + cuts); nv.append(v); nf.append(fc)
+            pos = end
+    return np.concatenate(bounds), np.concatenate(nv), np.concatenate(nf)
+
+
+def _draw_edges(count, n):
+    """Confini degli n strati consecutivi tra count candidati (None se si prendono tutti)."""
+    if count <= n:
+        return None
+    return np.linspace(0, count, n + 1).astype(np.int64)
+
+
+def _stratified(candidates, n, rng):
+    """Un elemento a caso per ognuno degli n strati consecutivi di candidates."""
+    edges = _draw_edges(len(candidates), n)
+    if edges is None:
+        return candidates
+    return candidates[rng.integers(edges[:-1], edges[1:])]
+
+
+def _seen_with(blocks, candidates, n):
+    """Probabilita' di leggere il blocco blocks[:, 1] sapendo letto blocks[:, 0], e il suo minimo.
+
+    I blocchi di vertici sono l'unione di due estrazioni indipendenti di
+    _stratified(candidates, n): un blocco di uno strato di B candidati e'
+    letto con probabilita' (2B - 1) / B^2, e due blocchi dello stesso
+    strato insieme con 2 / B^2 (uno per estrazione).
+    """
+    edges = _draw_edges(len(candidates), n)
+    if edges is None:
+        return np.ones(len(blocks)), 1.0
+    width = np.diff(edges).astype(np.float64)
+    h = np.searchsorted(edges, np.searchsorted(candidates, blocks), side="right") - 1
+    size = width[h[:, 1]]
+    p = np.where(h[:, 0] == h[:, 1], 2 / (2 * size - 1), (2 * size - 1) / size ** 2)
+    p[blocks[:, 0] == blocks[:, 1]] = 1.0
+    return p, float(2 / (2 * width.max() - 1))
+
+
+def _strata(blocks, sampled, units):
+    """Strati di posizione attorno ai blocchi letti: (unita', blocchi) di ognuno.
+
+    Lo strato del blocco sampled[i] (ordinati) va fino a meta' strada dai
+    blocchi letti vicini tra quelli di blocks, cosi' anche i blocchi scartati
+    per il budget appartengono a uno strato.
+    """
+    at = np.searchsorted(blocks, sampled)
+    edges = np.concatenate([[0], (at[:-1] + at[1:]) // 2 + 1, [len(blocks)]])
+    total = np.concatenate([[0], np.cumsum(units[blocks])])
+    return total[edges[1:]] - total[edges[:-1]], np.diff(edges)
+
+
+def _box(points):
+    """Box della griglia degli strati spaziali: quantili estremi dei punti letti.
+
+    I quantili e non min/max: pochi vertici lontani (es. facce degeneri
+    appese fuori dalla mesh) schiaccerebbero il resto in poche celle.
+    """
+    if not len(points):
+        return np.zeros(3), np.zeros(3)
+    return np.quantile(points, BOX_QUANTILE, axis=0), np.quantile(points, 1 - BOX_QUANTILE, axis=0)
+
+
+def _cells(points, lo, hi):
+    """Cella della griglia GRID_CELLS^3 sul box [lo, hi] di ogni punto (fuori dal box: la cella di bordo)."""
+    span = np.where(hi > lo, hi - lo, 1.0)
+    ijk = np.clip(((points - lo) / span * GRID_CELLS).astype(np.int64), 0, GRID_CELLS - 1)
+    return (ijk[:, 0] * GRID_CELLS + ijk[:, 1]) * GRID_CELLS + ijk[:, 2]
+
+
+def _satterthwaite(parts):
+    """Gradi di liberta' di una somma di varianze stimate, parts = [(varianza, gradi)]."""
+    parts = [(v, d) for v, d in parts if v > 0 and d > 0]
+    if not parts:
+        return 0
+    return sum(v for v, _ in parts) ** 2 / sum(v * v / d for v, d in parts)
+
+
+def _collapsed(u, w, blocks):
+    """Varianza di sum(u) tra strati con un blocco campionato, fusi a coppie consecutive.
+
+    u e w sono contributo e peso di ogni strato, blocks i suoi blocchi nel
+    file; con un solo strato la varianza non e' stimabile (None). Restituisce
+    anche i gradi di liberta' di Satterthwaite: pochi quando la varianza
+    viene quasi tutta da un gruppo (es. un blocco pieno di difetti).
+    """
+    if len(u) < 2:
+        return None, 0
+    # gruppi di due strati consecutivi, l'ultimo di tre se sono dispari
+    group = np.arange(len(u)) // 2
+    group[-1] = group[-2] if len(u) % 2 else group[-1]
+    k_g = np.bincount(group).astype(np.float64)
+    b_g = np.bincount(group, blocks)
+    r_g = np.bincount(group, u) / np.bincount(group, w)
+    v_g = (1 - k_g / b_g) * k_g / (k_g - 1) * np.bincount(group, (u - w * r_g[group]) ** 2)
+    return float(v_g.sum()), _satterthwaite(zip(v_g.tolist(), (k_g - 1).tolist()))
+
+
+def proportion(hit, cluster, stratum, stratum_units, stratum_blocks, cell, confidence=0.95,
+               detect=None, detect_floor=1.0, block_units=None):
+    """Proporzione stratificata da un campione a blocchi (cluster), post-stratificata per cella.
+
+    hit, cluster, stratum e cell sono per unita'; stratum_units e
+    stratum_blocks dicono quante unita' e quanti blocchi ha ogni strato di
+    posizione nel file. Ogni strato campionato pesa per la sua quota di
+    unita', e le quote delle celle spaziali sono stimate con gli stessi pesi.
+    La varianza ha due parti:
+      - tra le celle: quanto cambia da un blocco all'altro la quota di
+        ogni cella, tra blocchi di strati fusi a coppie consecutive;
+      - dentro le celle: tra i pezzi di blocco che cadono nella stessa
+        cella (cluster spaziali), fondendo le celle con un solo pezzo.
+    Le unita' vicine nello spazio non sono indipendenti, quelle di un
+    blocco lontane tra loro si': in un file ordinato per posizione un
+    blocco cade in poche celle e conta come pochi campioni, in un file
+    mescolato come molti. La somma non scende sotto la varianza tra
+    blocchi della proporzione. L'intervallo e' quello di Wilson sul numero
+    effettivo di unita', con il quantile t dei gradi di liberta' di
+    Satterthwaite; se nessuna unita' (o tutte) e' un evento, sul numero
+    effettivo di blocchi: i difetti raggruppati nel file possono stare
+    tutti nei blocchi non letti.
+
+    detect e' la probabilita' che un evento di ogni unita' sia visto (es. un
+    duplicato solo se anche la sua copia e' letta), detect_floor il suo
+    minimo per gli eventi non visti: la stima pesa ogni evento visto per
+    1/detect (Horvitz-Thompson) e il limite superiore e' diviso per
+    detect_floor. Le unita' di uno strato pesano per le unita' dello strato
+    nel file diviso quelle del blocco letto, block_units (per strato, come
+    stratum_units) se le unita' campionate ne sono solo una parte, se no
+    quelle lette: la stima e' un rapporto combinato, stabile anche con
+    poche unita' per blocco. Restituisce {"estimate", "low", "high",
+    "units", "blocks", "clusters"}; con zero unita' la stima e' None.
+    """
+    hit = np.asarray(hit, dtype=np.float64)
+    n = len(hit)
+    if n == 0:
+        return {"estimate": None, "low": None, "high": None, "units": 0, "blocks": 0, "clusters": 0}
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    strata, s_of = np.unique(stratum, return_inverse=True)
+    m_h = np.bincount(s_of).astype(np.float64) if block_units is None else block_units[strata]
+    # peso di ogni unita' nella stima: rate = sum(a * hit), sum(a) = 1
+    a = (stratum_units[strata] / m_h)[s_of]
+    a /= a.sum()
+    w_h = np.bincount(s_of, a)
+    u_h = np.bincount(s_of, a * hit)
+    rate = float(u_h.sum())
+    estimate = rate if detect is None else float((a * hit / detect).sum())
+    _, b_of = np.unique(cluster, return_inverse=True)
+    # cluster spaziali: unita' dello stesso blocco nella stessa cella
+    pieces, piece = np.unique(np.stack([cluster, cell]), axis=1, return_inverse=True)
+    piece = piece.ravel()
+    out = {"estimate": min(estimate, 1.0), "units": n, "blocks": int(b_of.max()) + 1,
+           "clusters": pieces.shape[1]}
+
+    sampled = np.flatnonzero(stratum_blocks[strata] > 1)
+    if not len(sampled) and block_units is None:
+        # tutti gli strati letti per intero
+        return {**out, "low": out["estimate"], "high": out["estimate"]}
+    var, df = 0.0, 0
+    if hit.min() != hit.max():
+        y, m = np.bincount(piece, a * hit), np.bincount(piece, a)
+        _, c_of = np.unique(pieces[1], return_inverse=True)
+        p_c = np.bincount(c_of, y) / np.bincount(c_of, m)
+        resid = y - p_c[c_of] * m
+        # celle con un solo pezzo: fuse in una, con la loro proporzione comune
+        single = np.bincount(c_of)[c_of] == 1
+        if single.sum() > 1:
+            resid[single] = y[single] - y[single].sum() / m[single].sum() * m[single]
+        fused = np.where(single, len(p_c), c_of)
+        k_c = np.bincount(fused)
+        v_c = (k_c / np.maximum(k_c - 1, 1) * np.bincount(fused, resid ** 2))[k_c > 1]
+        within = float(v_c.sum())
+        df_within = _satterthwaite(zip(v_c.tolist(), (k_c[k_c > 1] - 1).tolist()))
+        # quote delle celle: contributo di ogni strato di posizione a sum(a * (p_cella - rate))
+        shift = np.bincount(s_of, a * (p_c[c_of[piece]] - rate))
+        between, df_between = _collapsed(shift[sampled], w_h[sampled], stratum_blocks[strata][sampled])
+        var = within + (between or 0.0)
+        df = _satterthwaite([(within, df_within), (between or 0.0, df_between)])
+        # almeno la varianza tra blocchi della proporzione stessa: copre i
+        # difetti raggruppati nel file ma sparsi nello spazio
+        blockwise, df_blockwise = _collapsed(u_h[sampled], w_h[sampled], stratum_blocks[strata][sampled])
+        if blockwise is not None and blockwise > var:
+            var, df = blockwise, df_blockwise
+    # nessuna variazione osservata: le unita' di un blocco contano come un
+    # campione (Kish sulle dimensioni dei blocchi); un evento visto con
+    # probabilita' detect_floor conta per tanto
+    size = np.bincount(b_of).astype(np.float64)
+    n_blocks = min(n * n / (size ** 2).sum(), n * detect_floor)
+    if var > 0:
+        # numero effettivo di unita' (Kish): Wilson resta asimmetrico vicino a 0
+        low, high = _wilson(rate, min(n, rate * (1 - rate) / var), df, z)
+    else:
+        low, high = _wilson(rate, n_blocks, len(size) - 1, z)
+    if hit.max() > 0:
+        # i blocchi non letti possono avere eventi raggruppati come quando
+        # non se ne vede nessuno
+        high = max(high / detect_floor, rate + _wilson(0.0, n_blocks, len(size) - 1, z)[1])
+    return {**out, "low": float(max(0.0, min(low, out["estimate"]))),
+            "high": float(min(1.0, max(high, out["estimate"])))}
+
+
+def _wilson(rate, n_eff, df, z):
+    """Intervallo di Wilson su n_eff unita', con il quantile t di df gradi di liberta'."""
+    # quantile t con df gradi di liberta' (espansione di Cornish-Fisher)
+    t = z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df * df) if df > 0 else z
+    centre = (rate + t * t / (2 * n_eff)) / (1 + t * t / n_eff)
+    half = t * np.sqrt(rate * (1 - rate) / n_eff + t * t / (4 * n_eff * n_eff)) / (1 + t * t / n_eff)
+    return centre - half, centre + half
+
+
+def _scaled(rate, total, seen=0):
+    """Conteggio stimato e suo intervallo da una proporzione su total unita'.
+
+    seen sono gli eventi visti nel campione: il conteggio vero non e' minore.
+    """
+    if rate["estimate"] is None:
+        return None, None
+    low = max(int(np.floor(rate["low"] * total)), int(seen))
+    high = max(int(np.ceil(rate["high"] * total)), low)
+    return min(max(int(round(rate["estimate"] * total)), low), high), [low, high]
+
+
+def triage_summary(path, tol=1e-6, budget=TRIAGE_BUDGET, seed=0, confidence=0.95,
+                   prof=NULL_PROFILER):
+    """Sommario con le chiavi di check.analyze stimato da un campione del file.
+
+    Conteggi e intervalli sono stimati per facce degeneri, posizioni
+    duplicate, gruppi di quasi-duplicati e coppie adiacenti con verso
+    incoerente; le chiavi che dipendono dalla mesh intera (componenti,
+    bordi, loop, edge e vertici non-manifold, facce da girare,
+    auto-intersezioni) sono None, esempi compresi. Anche le coppie
+    incoerenti sono None se nessuna coppia del campione ha tutte le facce
+    attorno a un estremo (es. facce in ordine sparso nel file), e
+    triage["warnings"] lo dice. Gli altri esempi sono presi dal campione
+    (indici globali). Il tempo e' quello di una lettura sequenziale del
+    file piu' il parse di circa budget byte.
+    """
+    rng = np.random.default_rng(seed)
+    with prof.stage("block_index") as st:
+        bounds, nv, nf = block_index(path, max(budget // BLOCKS_PER_BUDGET, 1 << 12))
+        vbase = np.concatenate([[0], np.cumsum(nv)])
+        fbase = np.concatenate([[0], np.cumsum(nf)])
+        st.items = len(nv)
+    nverts, nfaces = int(vbase[-1]), int(fbase[-1])
+    nbytes = np.diff(bounds)
+    # byte medi di una riga v di ogni blocco, per la stima del costo delle righe
+    line_bytes = nbytes / np.maximum(nv + nf, 1)
+
+    with prof.stage("sample_parse", items=budget) as st:
+        per_block = max(int(nbytes.mean()), 1) if len(nbytes) else 1
+        # due estrazioni indipendenti: due blocchi vicini (es. un vertice e la
+        # sua copia) possono essere letti insieme anche nello stesso strato
+        n_draw = max(budget // 8 // per_block, 1)
+        vertex_blocks = np.unique(np.concatenate([_stratified(np.flatnonzero(nv), n_draw, rng)
+                                                  for _ in range(2)]))
+        candidates = _stratified(np.flatnonzero(nf), max(budget // 2 // per_block, 1), rng)
+        parsed = {}
+
+        def parse(b):
+            if b not in parsed:
+                with open(path, "rb") as f:
+                    f.seek(bounds[b])
+                    parsed[b] = parse_obj_bytes(f.read(nbytes[b]), vertex_base=int(vbase[b]), workers=1)
+            return parsed[b]
+
+        for b in vertex_blocks.tolist():
+            parse(b)
+        spent = int(nbytes[vertex_blocks].sum())
+        # un blocco di facce entra nel campione solo se c'e' budget anche per
+        # le righe v dei suoi vertici; l'ordine casuale non privilegia
+        # nessuna zona del file
+        face_blocks = []
+        need = set()
+        estimated = 0
+        for b in rng.permutation(candidates).tolist():
+            if spent + nbytes[b] * (b not in parsed) > budget:
+                continue
+            spent += int(nbytes[b]) * (b not in parsed)
+            ids = np.unique(parse(b)[2])
+            # indici fuori dal file: facce scartate piu' avanti
+            ids = ids[(ids >= 0) & (ids < nverts)]
+            owner = np.searchsorted(vbase, ids, side="right") - 1
+            ids = ids[~np.isin(owner, list(parsed))]
+            new = np.array([i for i in ids.tolist() if i not in need], dtype=np.int64)
+            cost = int(np.ceil(line_bytes[np.searchsorted(vbase, new, side="right") - 1].sum()))
+            if spent + cost > budget:
+                continue
+            spent += cost
+            estimated += cost
+            need.update(new.tolist())
+            face_blocks.append(b)
+        face_blocks = np.sort(np.array(face_blocks, dtype=np.int64))
+
+        # righe v dei vertici mancanti, lette blocco per blocco; il costo
+        # vero sostituisce la stima
+        spent -= estimated
+        need = np.array(sorted(need), dtype=np.int64)
+        need_owner = np.searchsorted(vbase, need, side="right") - 1
+        keep = ~np.isin(need_owner, list(parsed))
+        need, need_owner = need[keep], need_owner[keep]
+        fetched = []
+        owners = np.unique(need_owner)
+        # blocchi consecutivi letti insieme, a pezzi di al piu' INDEX_CHUNK byte circa
+        cut = (np.diff(owners) > 1) | (np.diff(bounds[owners] // INDEX_CHUNK) != 0)
+        runs = np.split(owners, np.flatnonzero(cut) + 1) if len(owners) else []
+        with open(path, "rb") as f:
+            for run in runs:
+                o, last = int(run[0]), int(run[-1])
+                f.seek(bounds[o])
+                data = f.read(bounds[last + 1] - bounds[o])
+                starts, ends = vertex_lines(data)
+                wanted = (need_owner >= o) & (need_owner <= last)
+                local = need[wanted] - vbase[o]
+                lines = [data[a:e] for a, e in zip(starts[local].tolist(), ends[local].tolist())]
+                spent += sum(map(len, lines)) + len(lines)
+                fetched.append((vbase[o] + local, parse_obj_bytes(b"\n".join(lines) + b"\n")[0], need_owner[wanted]))
+        st.items = spent
+
+    # vertici letti in ordine globale
+    pieces = [(vbase[b] + np.arange(len(parsed[b][0])), parsed[b][0], b) for b in parsed] + fetched
+    vertex_ids = np.concatenate([p[0] for p in pieces] or [np.zeros(0, np.int64)])
+    by_id = np.argsort(vertex_ids, kind="stable")
+    vertex_ids = vertex_ids[by_id]
+    verts = np.concatenate([p[1] for p in pieces] or [np.zeros((0, 3))])[by_id]
+    vertex_block = np.concatenate([np.full(len(p[0]), p[2]) for p in pieces] or [np.zeros(0, np.int64)])[by_id]
+    # strati spaziali: celle di una griglia sul box dei vertici letti
+    lo, hi = _box(verts)
+    vertex_cell = _cells(verts, lo, hi)
+
+    with prof.stage("duplicates", items=len(verts)):
+        # duplicati cercati solo tra i vertici dei blocchi estratti: cosi' la
+        # probabilita' di leggere anche la copia dipende solo dalle estrazioni
+        in_sample = np.isin(vertex_block, vertex_blocks)
+        sample, v_blocks = verts[in_sample], vertex_block[in_sample]
+        _, first, copy_of = np.unique(sample + 0.0, axis=0, return_index=True, return_inverse=True)
+        repeat = np.ones(len(sample), dtype=bool)
+        repeat[first] = False
+        # per ogni vertice, la copia che lo rende un evento: la prima
+        partner = first[copy_of.ravel()]
+        member = np.zeros(len(sample), dtype=bool)
+        leader = np.zeros(len(sample), dtype=bool)
+        group_partner = np.arange(len(sample))
+        for g in near_duplicate_groups(sample, tol):
+            member[g] = True
+            leader[g[0]] = True
+            group_partner[g] = g[0]
+            group_partner[g[0]] = g[1]
+        v_strata = (np.searchsorted(vertex_blocks, v_blocks), *_strata(np.flatnonzero(nv), vertex_blocks, nv),
+                    vertex_cell[in_sample])
+        seen_repeat, floor = _seen_with(np.column_stack([v_blocks, v_blocks[partner]]), np.flatnonzero(nv), n_draw)
+        seen_group, _ = _seen_with(np.column_stack([v_blocks, v_blocks[group_partner]]), np.flatnonzero(nv), n_draw)
+        near_rate = proportion(member, v_blocks, *v_strata, confidence, seen_group, floor)
+        exact_count, exact_interval = _scaled(proportion(repeat, v_blocks, *v_strata, confidence, seen_repeat, floor),
+                                              nverts, repeat.sum())
+        group_count, group_interval = _scaled(proportion(leader, v_blocks, *v_strata, confidence, seen_group, floor),
+                                              nverts, leader.sum())
+
+    with prof.stage("faces", items=len(face_blocks)):
+        # facce campionate con tutti i vertici letti, in indici locali
+        offs, idxs, face_ids, face_block = [np.zeros(1, np.int64)], [], [], []
+        for b in face_blocks.tolist():
+            offsets, indices = parsed[b][1], parsed[b][2]
+            pos = np.searchsorted(vertex_ids, indices).clip(max=max(len(vertex_ids) - 1, 0))
+            ok = vertex_ids[pos] == indices if len(vertex_ids) else np.zeros(len(indices), dtype=bool)
+            sizes = np.diff(offsets)
+            keep = np.logical_and.reduceat(ok, offsets[:-1]) if len(indices) else np.zeros(0, dtype=bool)
+            keep &= sizes > 0
+            corner_keep = np.repeat(keep, sizes)
+            offs.append(offs[-1][-1] + np.cumsum(sizes[keep]))
+            idxs.append(pos[corner_keep])
+            face_ids.append(fbase[b] + np.flatnonzero(keep))
+            face_block.append(np.full(int(keep.sum()), b))
+        face_offsets = np.concatenate(offs)
+        face_indices = np.concatenate(idxs) if idxs else np.zeros(0, np.int64)
+        face_ids = np.concatenate(face_ids) if face_ids else np.zeros(0, np.int64)
+        face_block = np.concatenate(face_block) if face_block else np.zeros(0, np.int64)
+        face_stratum = np.searchsorted(face_blocks, face_block)
+        f_strata = _strata(np.flatnonzero(nf), face_blocks, nf)
+        # cella di una faccia: quella del suo primo vertice
+        face_cell = vertex_cell[face_indices[face_offsets[:-1]]] if len(face_ids) else np.zeros(0, np.int64)
+        areas, _ = face_areas_normals(verts, face_offsets, face_indices)
+        degenerate = areas <= 1e-9
+        deg_rate = proportion(degenerate, face_block, face_stratum, *f_strata, face_cell, confidence)
+        deg_count, deg_interval = _scaled(deg_rate, nfaces, degenerate.sum())
+
+    with prof.stage("orientation", items=len(face_indices)):
+        edges = EdgeTable(face_offsets, face_indices, len(verts))
+        bad_edges, _, _ = orientation(face_offsets, face_indices, edges)
+        # unita': coppie di facce adiacenti del campione (edge manifold, estremi
+        # distinti) con il ventaglio di almeno un estremo chiuso, cioe' ogni
+        # edge del campione che lo tocca ha due facce: allora anche ogni
+        # faccia dell'edge, che contiene l'estremo, e' nel campione. Se no una
+        # faccia non letta potrebbe toccare l'edge: due facce di un edge
+        # non-manifold sembrerebbero una coppia con verso incoerente.
+        count = np.diff(edges.edge_face_offsets)
+        open_vertex = np.zeros(len(verts), dtype=bool)
+        open_vertex[edges.edges[count != 2].ravel()] = True
+        closed = ~open_vertex[edges.edges].all(axis=1)
+        pairs = np.flatnonzero(edges.manifold_mask & (edges.edges[:, 0] != edges.edges[:, 1]) & closed)
+        bad_edges = bad_edges[closed[bad_edges]]
+        first_face = edges.edge_faces[edges.edge_face_offsets[pairs]]
+        # una coppia pesa per le facce del suo blocco: le coppie chiuse sono
+        # solo una parte delle coppie del blocco
+        flip_rate = proportion(np.isin(pairs, bad_edges), face_block[first_face], face_stratum[first_face],
+                               *f_strata, face_cell[first_face], confidence, block_units=nf[face_blocks])
+        # coppie adiacenti nella mesh intera: un edge ogni due corner, come in
+        # una mesh chiusa (i vicini di una faccia possono stare fuori dal campione)
+        n_pairs = len(face_indices) / max(len(face_ids), 1) * nfaces / 2
+        flip_count, flip_interval = _scaled(flip_rate, n_pairs, len(bad_edges))
+        bad_first = edges.edge_face_offsets[bad_edges]
+        flipped_pairs = list(zip(face_ids[edges.edge_faces[bad_first]].tolist(),
+                                 face_ids[edges.edge_faces[bad_first + 1]].tolist(),
+                                 map(tuple, vertex_ids[edges.edges[bad_edges]].tolist())))
+
+    warnings = []
+    if nfaces and not len(face_ids):
+        warnings.append("face metrics were not sampled: no face block fit in the budget together with its vertices")
+    elif nfaces and flip_count is None:
+        warnings.append("flipped pairs were not estimated: no sampled edge has every face around one of its ends in the sample")
+
+    return {
+        "path": path,
+        "nverts": nverts,
+        "nfaces": nfaces,
+        "duplicate_positions_exact_count": exact_count,
+        "near_duplicate_groups_count": group_count,
+        "n_components": None,
+        "component_sizes": None,
+        "n_boundary_edges": None,
+        "n_nonmanifold_edges": None,
+        "n_nonmanifold_vertices": None,
+        "n_boundary_loops": None,
+        "n_open_boundary_chains": None,
+        "boundary_loops": None,
+        "n_degenerate_faces": deg_count,
+        "n_flipped_adjacent_pairs": flip_count,
+        "n_faces_to_flip": None,
+        "n_non_orientable_components": None,
+        "examples_boundary_edges": None,
+        "examples_nonmanifold_edges": None,
+        "examples_nonmanifold_vertices": None,
+        "examples_flipped_pairs": flipped_pairs[:6],
+        "degenerate_faces": face_ids[degenerate][:6].tolist(),
+        "n_self_intersecting_pairs": None,
+        "self_intersections_complete": None,
+        "examples_self_intersecting_pairs": None,
+        "estimated": True,
+        "triage": {
+            "confidence": confidence,
+            "sampled_bytes": spent,
+            "file_bytes": int(bounds[-1]),
+            "sampled_faces": len(face_ids),
+            "sampled_vertices": len(sample),
+            "warnings": warnings,
+            "rates": {
+                "degenerate_faces": deg_rate,
+                "near_duplicate_vertices": near_rate,
+                "flipped_adjacent_pairs": flip_rate,
+            },
+            "intervals": {
+                "duplicate_positions_exact_count": exact_interval,
+                "near_duplicate_groups_count": group_interval,
+                "n_degenerate_faces": deg_interval,
+                "n_flipped_adjacent_pairs": flip_interval,
+            },
+        },
+    }
@@ -0,0 +1,452 @@
+# Loader OBJ condiviso dagli script in python-drafts.
+#
+# Il file viene letto in blocco: le righe "v" e "f" sono estratte con una regex
+# sull'intero buffer e convertite in array NumPy senza creare tuple/liste per
+# vertice o per faccia.
+#
+# Layout restituito:
+#   verts        (N,3) float64
+#   face_offsets (F+1,) int64   -> la faccia i usa face_indices[offsets[i]:offsets[i+1]]
+#   face_indices (sum,) int64   indici 0-based
+# e, a richiesta, la struttura o/g come (group_faces, group_lines): la riga
+# group_lines[k] (es. "g group-0") precede la faccia group_faces[k].
+
+import itertools
+import multiprocessing
+import os
+import re
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# il corpo della riga si ferma a un eventuale commento finale ("f 1 2 3 # ...");
+# una riga f senza indici non e' una faccia
+_V_LINE = re.compile(rb"^[ \t]*v[ \t]+([^\r\n#]*)", re.M)
+_F_LINE = re.compile(rb"^[ \t]*f[ \t]+([^\s#][^\r\n#]*)", re.M)
+_G_LINE = re.compile(rb"^[ \t]*([og](?:[ \t][^\r\n]*)?)[ \t\r]*$", re.M)
+_F_START = re.compile(rb"^[ \t]*f[ \t]+[^\s#]", re.M)
+# tutto cio' che segue il primo '/' in un token "v/vt/vn"
+_SLASH_TAIL = re.compile(rb"/[^ \t\n]*")
+# byte che dopo "f " non aprono un indice (spazi, fine riga, commento)
+_NOT_INDEX = np.isin(np.arange(256), (9, 10, 13, 32, 35))
+# messaggio di _malformed: numero di riga e resto
+_ERROR_LINE = re.compile(r"line (\d+): (.*)", re.S)
+
+
+def _numbers(buf, dtype):
+    """Numeri separati da spazi in buf; None se un token non e' un numero.
+
+    np.fromstring si ferma al primo token non valido: le versioni vecchie di
+    NumPy avvisano e restituiscono i numeri letti fin li', le nuove sollevano
+    ValueError. In entrambi i casi l'array non corrisponde alle righe.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            return np.fromstring(buf, dtype=dtype, sep=" ")
+        except ValueError:
+            return None
+
+
+def _malformed(data, pattern, bodies, ok, what):
+    """ValueError con il numero della prima riga di pattern in data il cui corpo non passa ok."""
+    k = next((i for i, body in enumerate(bodies) if not ok(body)), 0)
+    m = next(itertools.islice(pattern.finditer(data), k, None))
+    line = data.count(b"\n", 0, m.start()) + 1
+    return ValueError(f"line {line}: malformed {what} line {m.group(0).strip().decode(errors='replace')!r}")
+
+
+def _is_vertex(body):
+    try:
+        return len([float(t) for t in body.split()[:3]]) == 3
+    except ValueError:
+        return False
+
+
+def _is_face(body):
+    try:
+        [int(t) for t in _SLASH_TAIL.sub(b"", body).split()]
+        return True
+    except ValueError:
+        return False
+
+
+def _token_counts(joined, n):
+    """Token per riga di n righe unite da "\n", senza split in Python."""
+    a = np.frombuffer(joined, dtype=np.uint8)
+    space = (a == 32) | (a == 9) | (a == 10) | (a == 13)
+    starts = np.flatnonzero(~space[1:] & space[:-1]) + 1
+    if len(a) and not space[0]:
+        starts = np.append(0, starts)
+    return np.bincount(np.searchsorted(np.flatnonzero(a == 10), starts), minlength=n)
+
+
+def _parse_vertices(data):
+    bodies = _V_LINE.findall(data)
+    if not bodies:
+        return np.zeros((0, 3), dtype=np.float64)
+    joined = b"\n".join(bodies)
+    counts = _token_counts(joined, len(bodies))
+    if (counts < 3).any():
+        raise _malformed(data, _V_LINE, bodies, _is_vertex, "v")
+    if (counts == 3).all():
+        flat = _numbers(joined, np.float64)
+    else:
+        # righe con w o colori per vertice: si tengono solo x y z
+        flat = _numbers(b" ".join(b" ".join(body.split()[:3]) for body in bodies), np.float64)
+    if flat is None or flat.size != 3 * len(bodies):
+        raise _malformed(data, _V_LINE, bodies, _is_vertex, "v")
+    return flat.reshape(-1, 3)
+
+
+def _parse_faces(data, vertex_base=0, return_relative=False):
+    """(offsets, indici 0-based); con return_relative anche le posizioni degli
+    indici che erano negativi, risolti rispetto a vertex_base."""
+    bodies = _F_LINE.findall(data)
+    if not bodies:
+        empty = (np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        return empty + (np.zeros(0, dtype=np.int64),) if return_relative else empty
+    counts = np.fromiter((len(body.split()) for body in bodies), dtype=np.int64, count=len(bodies))
+    joined = b"\n".join(bodies)
+    if b"/" in joined:
+        joined = _SLASH_TAIL.sub(b"", joined)
+    idx = _numbers(joined, np.int64)
+    offsets = np.zeros(len(bodies) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    if idx is None or idx.size != offsets[-1]:
+        raise _malformed(data, _F_LINE, bodies, _is_face, "f")
+
+    neg = idx < 0
+    if neg.any():
+        # indici relativi: -1 e' l'ultimo vertice definito prima della faccia
+        vpos = np.fromiter((m.start() for m in _V_LINE.finditer(data)), dtype=np.int64)
+        fpos = np.fromiter((m.start() for m in _F_LINE.finditer(data)), dtype=np.int64)
+        vbase = vertex_base + np.repeat(np.searchsorted(vpos, fpos), counts)
+        idx = np.where(neg, vbase + idx, idx - 1)
+    else:
+        idx -= 1
+    if return_relative:
+        return offsets, idx, np.flatnonzero(neg)
+    return offsets, idx
+
+
+def _parse_groups(data):
+    lines = []
+    faces_before = []
+    count = 0
+    last = 0
+    for m in _G_LINE.finditer(data):
+        count += len(_F_START.findall(data, last, m.start()))
+        last = m.start()
+        lines.append(m.group(1).decode(errors="replace").strip())
+        faces_before.append(count)
+    return np.array(faces_before, dtype=np.int64), lines
+
+
+def count_lines(data):
+    """(righe v, righe f) di un blocco di righe intere, senza parse (vedi mesh_triage)."""
+    nv, nf = count_block_lines(data, [0, len(data)])
+    return int(nv[0]), int(nf[0])
+
+
+def count_block_lines(data, bounds):
+    """(righe v (B,), righe f (B,)) dei blocchi data[bounds[i]:bounds[i+1]] di righe intere.
+
+    Un solo passaggio vettoriale su tutto data; stessi conteggi di
+    count_lines su ogni blocco.
+    """
+    bounds = np.asarray(bounds, dtype=np.int64)
+    nblocks = len(bounds) - 1
+    # primi due byte di ogni riga, come uint16
+    a = np.frombuffer(data, dtype=np.uint8)
+    if len(a) < 2:
+        return np.zeros(nblocks, dtype=np.int64), np.zeros(nblocks, dtype=np.int64)
+    starts = np.append(0, np.flatnonzero(a[:-2] == 10) + 1)
+    key = a[starts].astype(np.uint16) << 8 | a[starts + 1]
+    is_f = (key == 0x6620) | (key == 0x6609)
+    # byte dopo "f ": spazi, fine riga o commento vanno guardati dalla regex
+    after_f = starts[is_f] + 2
+    odd = len(after_f) and (after_f[-1] >= len(a) or _NOT_INDEX[a[after_f[after_f < len(a)]]].any())
+    if np.any(((key >> 8) == 32) | ((key >> 8) == 9)) or odd:
+        # righe indentate o righe f senza indici: le contano le regex del parser
+        view = memoryview(data)
+        counts = [(len(_V_LINE.findall(view[s:e])), len(_F_START.findall(view[s:e])))
+                  for s, e in zip(bounds[:-1].tolist(), bounds[1:].tolist())]
+        return np.array(counts, dtype=np.int64).reshape(-1, 2).T.copy()
+    block = np.searchsorted(bounds, starts, side="right") - 1
+    inside = (block >= 0) & (block < nblocks)
+    is_v = (key == 0x7620) | (key == 0x7609)
+    nv = np.bincount(block[inside & is_v], minlength=nblocks)
+    nf = np.bincount(block[inside & is_f], minlength=nblocks)
+    return nv.astype(np.int64), nf.astype(np.int64)
+
+
+def vertex_lines(data):
+    """(inizi, fini) in byte delle righe v di un blocco, nell'ordine e con il conteggio di count_lines."""
+    a = np.frombuffer(data, dtype=np.uint8)
+    if len(a) < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    starts = np.append(0, np.flatnonzero(a[:-2] == 10) + 1)
+    key = a[starts].astype(np.uint16) << 8 | a[starts + 1]
+    if np.any(((key >> 8) == 32) | ((key >> 8) == 9)):
+        starts = np.fromiter((m.start() for m in _V_LINE.finditer(data)), dtype=np.int64)
+    else:
+        starts = starts[(key == 0x7620) | (key == 0x7609)]
+    newlines = np.flatnonzero(a == 10)
+    at = np.searchsorted(newlines, starts)
+    ends = np.where(at < len(newlines), newlines[np.minimum(at, len(newlines) - 1)] if len(newlines) else 0, len(a))
+    return starts, ends
+
+
+def parse_obj_bytes(data, vertex_base=0, with_groups=False, workers=1):
+    """Parse di contenuto OBJ (bytes o str) in (verts, face_offsets, face_indices).
+
+    vertex_base e' il numero di vertici definiti prima di data, quando data e'
+    un blocco di righe di un file piu' grande: serve a risolvere gli indici
+    negativi. Il blocco deve contenere righe intere. Con with_groups=True
+    restituisce anche la struttura o/g come quarto elemento. workers=None
+    sceglie il parse parallelo per i buffer grandi (vedi load_obj).
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    if vertex_base == 0:
+        workers = _default_workers(len(data), workers)
+        if workers > 1:
+            return parse_parallel(data, workers, with_groups)
+    verts = _parse_vertices(data)
+    offsets, indices = _parse_faces(data, vertex_base)
+    if with_groups:
+        return verts, offsets, indices, _parse_groups(data)
+    return verts, offsets, indices
+
+
+def load_obj(path, with_groups=False, workers=None):
+    """Legge un file OBJ da disco e restituisce (verts, face_offsets, face_indices[, groups]).
+
+    I file di almeno PARALLEL_MIN_BYTES sono letti a tratti in un pool di
+    processi (vedi parse_parallel); workers=1 forza il parse seriale.
+    """
+    workers = _default_workers(os.path.getsize(path), workers)
+    if workers > 1:
+        return parse_parallel(path, workers, with_groups)
+    with open(path, "rb") as f:
+        data = f.read()
+    return parse_obj_bytes(data, with_groups=with_groups)
+
+
+# parse parallelo: file (o buffer) di almeno questa dimensione
+PARALLEL_MIN_BYTES = 64 << 20
+# tratti per processo, per bilanciare righe di lunghezza diversa
+RANGES_PER_WORKER = 4
+
+# buffer in memoria ereditato dai processi figli (solo con fork)
+_SHARED_DATA = None
+
+
+def _default_workers(nbytes, workers):
+    if workers is not None:
+        return max(1, workers)
+    # dentro un processo figlio (es. un pool per file) si resta seriali
+    if nbytes < PARALLEL_MIN_BYTES or multiprocessing.parent_process() is not None:
+        return 1
+    return os.cpu_count() or 1
+
+
+def _range_bounds(size, read_at, nranges):
+    """Confini [0, ..., size] dei tratti, spostati subito dopo un a capo."""
+    bounds = [0]
+    for k in range(1, nranges):
+        pos = max(size * k // nranges, bounds[-1])
+        while pos < size:
+            block = read_at(pos, 1 << 16)
+            cut = block.find(b"\n")
+            if cut >= 0:
+                pos += cut + 1
+                break
+            pos += len(block)
+        bounds.append(min(pos, size))
+    bounds.append(size)
+    return bounds
+
+
+def _parse_range(source, start, stop, with_groups):
+    """Parse di un tratto di righe intere: indici negativi risolti sui soli
+    vertici del tratto, con le loro posizioni per correggerli dopo."""
+    if source is None:
+        data = _SHARED_DATA[start:stop]
+    else:
+        with open(source, "rb") as f:
+            f.seek(start)
+            data = f.read(stop - start)
+    try:
+        verts = _parse_vertices(data)
+        offsets, indices, relative = _parse_faces(data, 0, return_relative=True)
+    except ValueError as e:
+        m = _ERROR_LINE.match(str(e))
+        if not m:
+            raise
+        # numero di riga nel tratto -> nel file
+        if source is None:
+            before = _SHARED_DATA[:start].count(b"\n")
+        else:
+            with open(source, "rb") as f:
+                before = f.read(start).count(b"\n")
+        raise ValueError(f"line {int(m.group(1)) + before}: {m.group(2)}") from None
+    groups = _parse_groups(data) if with_groups else None
+    return verts, offsets, indices, relative, groups
+
+
+def parse_parallel(source, workers, with_groups=False):
+    """Come load_obj/parse_obj_bytes, con il parse diviso su un pool di processi.
+
+    source e' un path oppure il contenuto (bytes). Il file e' diviso in tratti
+    che finiscono a fine riga; ogni processo restituisce i suoi array e il
+    numero di righe v, da cui si ricava il vertex_base di ogni tratto per
+    gli indici negativi. Il risultato e' identico al parse seriale.
+    Un buffer in memoria si condivide solo via fork: dove non c'e' il parse
+    e' seriale.
+    """
+    global _SHARED_DATA
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = source
+        if "fork" not in multiprocessing.get_all_start_methods():
+            return parse_obj_bytes(data, with_groups=with_groups)
+        size = len(data)
+        read_at = lambda pos, n: bytes(data[pos:pos + n])
+        path, context = None, multiprocessing.get_context("fork")
+    else:
+        path, context = source, None
+        size = os.path.getsize(path)
+        f = open(path, "rb")
+
+        def read_at(pos, n):
+            f.seek(pos)
+            return f.read(n)
+    try:
+        bounds = _range_bounds(size, read_at, workers * RANGES_PER_WORKER)
+    finally:
+        if path is not None:
+            f.close()
+
+    if path is None:
+        _SHARED_DATA = data
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            parts = list(pool.map(_parse_range, [path] * (len(bounds) - 1), bounds[:-1], bounds[1:],
+                                  [with_groups] * (len(bounds) - 1)))
+    finally:
+        _SHARED_DATA = None
+
+    vertex_base = np.cumsum([0] + [len(p[0]) for p in parts])
+    face_base = np.cumsum([0] + [len(p[1]) - 1 for p in parts])
+    verts = np.concatenate([p[0] for p in parts]) if parts else np.zeros((0, 3))
+    sizes = np.concatenate([np.diff(p[1]) for p in parts]) if parts else np.zeros(0, dtype=np.int64)
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    for (_, _, indices, relative, _), base in zip(parts, vertex_base.tolist()):
+        indices[relative] += base
+    indices = np.concatenate([p[2] for p in parts]) if parts else np.zeros(0, dtype=np.int64)
+    if not with_groups:
+        return verts, offsets, indices
+    group_faces = np.concatenate([p[4][0] + base for p, base in zip(parts, face_base.tolist())]).astype(np.int64)
+    group_lines = [line for p in parts for line in p[4][1]]
+    return verts, offsets, indices, (group_faces, group_lines)
+
+
+def face_lists(offsets, indices):
+    """Liste di indici per faccia, per il codice che lavora ancora faccia per faccia."""
+    flat = indices.tolist()
+    bounds = offsets.tolist()
+    return [flat[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+
+def faces_to_csr(faces):
+    """Converte una lista di facce (liste di indici) in (face_offsets, face_indices)."""
+    sizes = np.fromiter((len(f) for f in faces), dtype=np.int64, count=len(faces))
+    offsets = np.zeros(len(faces) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    indices = np.fromiter((v for f in faces for v in f), dtype=np.int64, count=int(offsets[-1]))
+    return offsets, indices
+
+
+def select_groups(groups, keep):
+    """Struttura o/g dopo aver tenuto solo le facce con keep[i] True."""
+    group_faces, group_lines = groups
+    kept_before = np.concatenate([[0], np.cumsum(keep, dtype=np.int64)])
+    return kept_before[group_faces], list(group_lines)
+
+
+# righe per blocco di scrittura
+WRITE_BLOCK = 1 << 16
+
+
+def _shortest(values):
+    """Per ogni float (float32, float16) il float64 con meno cifre
+    significative che rilegge esattamente lo stesso valore: %r lo scrive
+    corto (0.1 e non 0.10000000149011612)."""
+    values = values.ravel()
+    out = values.astype(np.float64)
+    idx = np.flatnonzero(np.isfinite(out) & (out != 0))
+    x = out[idx]
+    exp10 = np.floor(np.log10(np.abs(x)))
+    digits = 1
+    # i valori rimasti si riprovano con una cifra in piu'; 17 cifre bastano sempre
+    while len(idx) and digits <= 17:
+        scale = 10.0 ** (digits - 1 - exp10)
+        rounded = np.round(x * scale) / scale
+        ok = rounded.astype(values.dtype) == values[idx]
+        out[idx[ok]] = rounded[ok]
+        idx, x, exp10 = idx[~ok], x[~ok], exp10[~ok]
+        digits += 1
+    return out
+
+
+def _vertex_block(block, precision):
+    if block.dtype.itemsize < 8:
+        block = _shortest(block).reshape(block.shape) if precision is None else block.astype(np.float64)
+    if precision is None:
+        # %r di un float Python e' la rappresentazione piu' corta che rilegge lo stesso valore
+        return ("v %r %r %r\n" * len(block)) % tuple(block.ravel().tolist())
+    fmt = f"v %.{precision}f %.{precision}f %.{precision}f\n"
+    return (fmt * len(block)) % tuple(block.ravel().tolist())
+
+
+def _face_block(sizes, indices, templates):
+    fmt = "".join(templates.get(k) or templates.setdefault(k, "f" + " %d" * k + "\n") for k in sizes.tolist())
+    return fmt % tuple((indices + 1).tolist())
+
+
+def write_obj(path, verts, face_offsets, face_indices, groups=None, precision=None):
+    """Scrive una mesh OBJ formattando vertici e facce a blocchi.
+
+    precision: cifre decimali fisse, oppure None per la rappresentazione piu'
+    corta che rilegge esattamente lo stesso float. groups: struttura o/g da
+    load_obj(..., with_groups=True), riscritta davanti alle stesse facce.
+    """
+    verts = np.asarray(verts)
+    # i float32 restano tali fino alla formattazione (vedi _shortest)
+    if verts.dtype.kind != "f" or verts.dtype.itemsize > 8:
+        verts = verts.astype(np.float64)
+    nfaces = len(face_offsets) - 1
+    if groups is None:
+        group_faces, group_lines = np.zeros(0, dtype=np.int64), []
+    else:
+        group_faces, group_lines = groups
+    # le facce sono scritte a tratti tra una riga o/g e la successiva
+    cuts = sorted(set(np.asarray(group_faces).tolist()) | {0, nfaces})
+    templates = {}
+    with open(path, "w", buffering=1 << 22) as f:
+        for s in range(0, len(verts), WRITE_BLOCK):
+            f.write(_vertex_block(verts[s:s + WRITE_BLOCK], precision))
+        g = 0
+        for start, stop in zip(cuts[:-1] or [0], cuts[1:] or [0]):
+            while g < len(group_lines) and group_faces[g] <= start:
+                f.write(group_lines[g] + "\n")
+                g += 1
+            for s in range(start, stop, WRITE_BLOCK):
+                e = min(s + WRITE_BLOCK, stop)
+                lo, hi = face_offsets[s], face_offsets[e]
+                f.write(_face_block(np.diff(face_offsets[s:e + 1]), face_indices[lo:hi], templates))
+        for line in group_lines[g:]:
+            f.write(line + "\n")
@@ -0,0 +1,70 @@
+# Test dell'analisi incrementale (python -m pytest python-drafts).
+
+import numpy as np
+
+from check import analyze, analyze_incremental
+from mesh_cache import ComponentCache
+from mesh_incremental import vertex_pieces, MIN_CACHED_FACES
+from mesh_topology import EdgeTable
+
+
+class _Mesh:
+    # al posto di MeshCache: la mesh e' gia' in memoria
+    def __init__(self, verts, face_offsets, face_indices):
+        self.mesh = verts, face_offsets, face_indices
+
+    def load_obj(self, path):
+        return self.mesh
+
+    def edge_table(self, path, face_offsets, face_indices, nverts):
+        return EdgeTable(face_offsets, face_indices, nverts)
+
+
+def _grid(n, empty=()):
+    # griglia n x n di quad, con facce vuote dopo quelle in empty
+    g = np.mgrid[0:n + 1, 0:n + 1].reshape(2, -1).T
+    verts = np.c_[g, np.zeros(len(g))].astype(np.float64)
+    sizes = []
+    indices = []
+    for j in range(n):
+        for i in range(n):
+            a = j * (n + 1) + i
+            indices += [a, a + 1, a + n + 2, a + n + 1]
+            sizes.append(4)
+            if j * n + i in empty:
+                sizes.append(0)
+    face_offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=face_offsets[1:])
+    return verts, face_offsets, np.array(indices, dtype=np.int64)
+
+
+def test_empty_faces_are_pieces():
+    face_offsets = np.array([0, 3, 3, 6, 6])
+    labels, count = vertex_pieces(face_offsets, np.arange(6), 6)
+    assert labels.tolist() == [0, 1, 2, 3] and count == 4
+
+
+def test_empty_faces_match_analyze(tmp_path):
+    mesh = _Mesh(*_grid(30, empty=(100, 30 * 30 - 1)))
+    expected = analyze("mesh.obj", cache=mesh)[0]
+    components = ComponentCache(str(tmp_path))
+    for _ in range(2):
+        assert analyze_incremental("mesh.obj", components, cache=mesh) == expected
+
+
+def test_cached_piece_sees_edits(tmp_path):
+    # un pezzo abbastanza grande da finire in cache, con una faccia vuota in coda
+    n = 33
+    verts, face_offsets, face_indices = _grid(n, empty=(n * n - 1,))
+    assert n * n >= MIN_CACHED_FACES
+    components = ComponentCache(str(tmp_path))
+    mesh = _Mesh(verts, face_offsets, face_indices)
+    before = analyze("mesh.obj", cache=mesh)[0]
+    assert analyze_incremental("mesh.obj", components, cache=mesh) == before
+    # l'ultimo vertice del pezzo sul primo corner del suo quad: il quad diventa degenere
+    edited = verts.copy()
+    edited[-1] = edited[-1 - (n + 2)]
+    mesh = _Mesh(edited, face_offsets, face_indices)
+    expected = analyze("mesh.obj", cache=mesh)[0]
+    assert expected["n_degenerate_faces"] == before["n_degenerate_faces"] + 1
+    assert analyze_incremental("mesh.obj", components, cache=mesh) == expected
@@ -0,0 +1,60 @@
+# Test dell'analisi out-of-core (python -m pytest python-drafts).
+
+import tracemalloc
+
+import numpy as np
+
+from mesh_geometry import chain_summary
+from mesh_stream import analyze_streaming, COMPONENT_SIZES_LIMIT, _chain_summary, _merge_runs
+from mesh_topology import chain_boundary
+from obj_io import write_obj
+
+
+def test_merge_runs_keeps_run_order():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        runs = []
+        for r in range(rng.integers(1, 6)):
+            keys = np.sort(rng.integers(0, 10, rng.integers(0, 40)))
+            runs.append((keys, np.stack([np.full(len(keys), r), np.arange(len(keys))], axis=1)))
+        blocks = list(_merge_runs(runs, int(rng.integers(1, 8))))
+        keys = np.concatenate([k for k, _ in blocks] or [np.zeros(0, dtype=np.int64)])
+        vals = np.concatenate([v for _, v in blocks] or [np.zeros((0, 2), dtype=np.int64)])
+        # per chiave, poi run, poi posizione nella run
+        np.testing.assert_array_equal(np.lexsort((vals[:, 1], vals[:, 0], keys)), np.arange(len(keys)))
+
+
+def test_chain_summary_on_disk(tmp_path):
+    rng = np.random.default_rng(1)
+    for _ in range(30):
+        nverts = int(rng.integers(3, 60))
+        n = int(rng.integers(1, 400))
+        src, dst = rng.integers(0, nverts, n), rng.integers(0, nverts, n)
+        verts = rng.random((nverts, 3))
+        expected = chain_summary(verts, *chain_boundary(src, dst))
+        got = _chain_summary(verts, src, dst, str(tmp_path), int(rng.integers(1, 50)))
+        # i perimetri sono sommati in un altro ordine
+        for a, b in zip(expected["boundary_loops"], got["boundary_loops"]):
+            assert np.isclose(a.pop("perimeter"), b.pop("perimeter"))
+        assert got == expected
+
+
+def test_soup_memory(tmp_path):
+    # 30000 triangoli staccati: ogni edge e' di bordo e ogni faccia una componente
+    n = 30000
+    corners = np.array([[0, 0, 0], [0.5, 0, 0], [0, 0.5, 0]], dtype=np.float64)
+    cells = np.stack(np.divmod(np.arange(n), 200), axis=1).astype(np.float64)
+    verts = (np.c_[cells, np.zeros(n)][:, None, :] + corners).reshape(-1, 3)
+    path = tmp_path / "soup.obj"
+    write_obj(path, verts, np.arange(0, 3 * n + 1, 3), np.arange(3 * n))
+    memory_limit = 4 << 20
+    tracemalloc.start()
+    try:
+        summary = analyze_streaming(str(path), memory_limit=memory_limit, tmp_dir=str(tmp_path))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert summary["n_components"] == summary["n_boundary_loops"] == n
+    assert summary["component_sizes"] == [1] * COMPONENT_SIZES_LIMIT
+    # i memmap non contano: solo gli array in RAM
+    assert peak < 3 * memory_limit
@@ -0,0 +1,38 @@
+# Test di regressione dei bordi (python -m pytest python-drafts).
+
+import numpy as np
+
+from mesh_topology import EdgeTable, boundary_loops
+
+
+def _loops(faces):
+    face_offsets = np.arange(0, 4 * len(faces) + 1, 4, dtype=np.int64)
+    face_indices = np.array(faces, dtype=np.int64).ravel()
+    edges = EdgeTable(face_offsets, face_indices)
+    src, dst, offsets, closed = boundary_loops(face_offsets, face_indices, edges)
+    # ogni catena e' percorsa con continuita'
+    for a, b in zip(offsets[:-1], offsets[1:]):
+        np.testing.assert_array_equal(dst[a:b - 1], src[a + 1:b])
+    return np.diff(offsets).tolist(), closed.tolist()
+
+
+def _grid(n, flip=()):
+    faces = []
+    for j in range(n):
+        for i in range(n):
+            a = j * (n + 1) + i
+            quad = [a, a + 1, a + n + 2, a + n + 1]
+            faces.append(quad[::-1] if (i, j) in flip else quad)
+    return faces
+
+
+def test_flipped_border_face():
+    assert _loops(_grid(4)) == ([16], [True])
+    assert _loops(_grid(4, flip={(0, 2)})) == ([16], [True])
+
+
+def test_moebius_strip():
+    n = 10
+    # due file di vertici; l'ultimo quad chiude il nastro con mezzo giro
+    faces = [[i, i + 1, n + i + 1, n + i] for i in range(n - 1)] + [[n - 1, n, 0, 2 * n - 1]]
+    assert _loops(faces) == ([2 * n], [True])
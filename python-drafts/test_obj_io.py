@@ -0,0 +1,83 @@
+# Test di regressione del loader OBJ (python -m pytest python-drafts).
+
+import numpy as np
+import pytest
+
+from obj_io import parse_obj_bytes, count_lines, count_block_lines, vertex_lines, load_obj, write_obj
+
+
+def test_trailing_comments():
+    data = (b"v 0 0 0 # a\n"
+            b"v 1 0 0#b\n"
+            b"v 0 1 0 1.0 # w\n"
+            b"# solo commento\n"
+            b"f 1 2 3 # x\n"
+            b"f 1/1 2/2 3/3#y\n"
+            b"f -3 -2 -1 # relativi\n")
+    verts, offsets, indices = parse_obj_bytes(data)
+    np.testing.assert_array_equal(verts, [[0, 0, 0], [1, 0, 0], [0, 1, 0]])
+    np.testing.assert_array_equal(offsets, [0, 3, 6, 9])
+    np.testing.assert_array_equal(indices, [0, 1, 2] * 3)
+
+
+def test_same_result_without_comments():
+    plain = b"v 0 0 0\nv 1 0 0\nv 0 1 0\nv 1 1 0\nf 1 2 4 3\n"
+    commented = b"v 0 0 0 # p0\nv 1 0 0\nv 0 1 0 # p2\nv 1 1 0\nf 1 2 4 3 # quad\n"
+    for a, b in zip(parse_obj_bytes(plain), parse_obj_bytes(commented)):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_vertex_lines():
+    for data in (b"v 0 0 0\nvn 0 0 1\nf 1 2 3\nv 1 2 3 # c\nv 4 5 6",
+                 b"  v 0 0 0\nv\t1 2 3\n# v 9 9 9\n"):
+        starts, ends = vertex_lines(data)
+        assert len(starts) == count_lines(data)[0]
+        lines = b"\n".join(data[a:e] for a, e in zip(starts.tolist(), ends.tolist()))
+        np.testing.assert_array_equal(parse_obj_bytes(lines)[0], parse_obj_bytes(data)[0])
+
+
+def test_count_block_lines():
+    for data in (b"v 0 0 0\nvn 0 0 1\nf 1 2 3\nv 1 2 3\nf 1 2 4\nv 4 5 6\n",
+                 b"v 0 0 0\n  v 1 2 3\nf\nf 1 2 3 # c\nv 4 5 6\nf 3 2 1"):
+        ends = [i + 1 for i, c in enumerate(data) if c == 10]
+        bounds = [0, ends[1], ends[1], ends[3], len(data)]
+        nv, nf = count_block_lines(data, bounds)
+        expected = [count_lines(data[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+        assert list(zip(nv.tolist(), nf.tolist())) == expected
+        assert (nv.sum(), nf.sum()) == count_lines(data)
+
+
+def test_face_lines_without_indices():
+    data = b"v 0 0 0\nv 1 0 0\nv 0 1 0\ng a\nf\nf \nf # vuota\nf 1 2 3\ng b\nf 3 2 1\n"
+    verts, offsets, indices, (group_faces, group_lines) = parse_obj_bytes(data, with_groups=True)
+    np.testing.assert_array_equal(offsets, [0, 3, 6])
+    np.testing.assert_array_equal(group_faces, [0, 1])
+    assert group_lines == ["g a", "g b"]
+    assert count_lines(data) == (3, 2)
+
+
+def test_float32_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    verts = np.concatenate([
+        np.array([[0.1, 0.2, 0.3], [1 / 3, -0.0, 1e-40]], dtype=np.float32),
+        (rng.standard_normal((1000, 3)) * 10.0 ** rng.integers(-8, 8, (1000, 3))).astype(np.float32),
+    ])
+    path = tmp_path / "f32.obj"
+    write_obj(path, verts, np.array([0, 3]), np.array([0, 1, 2]))
+    assert path.read_text().startswith("v 0.1 0.2 0.3\nv 0.33333334 -0.0 1e-40\n")
+    np.testing.assert_array_equal(load_obj(path)[0].astype(np.float32), verts)
+
+
+def test_malformed_tokens(tmp_path):
+    good = b"v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3\n"
+    cases = [(good + b"f 1 2 x\nf 1 2 3\n", "line 5"),
+             (good + b"v 1 a 0\nv 2 2 2\n", "line 5"),
+             (b"v 0 0 0 1\nv 1 0\nv 0 1 0\nf 1 2 3\n", "line 2")]
+    for data, where in cases:
+        with pytest.raises(ValueError, match=where):
+            parse_obj_bytes(data)
+    # nel parse parallelo il numero di riga e' quello nel file
+    path = tmp_path / "bad.obj"
+    path.write_bytes(good * 2000 + b"f 1 2 x\n")
+    with pytest.raises(ValueError, match=f"line {4 * 2000 + 1}:"):
+        load_obj(path, workers=2)
@@ -1,65 +1,209 @@
+import base64
+import json
+import os
+
 import numpy as np
-from collections import defaultdict
+from obj_io import write_obj
+from mesh_data import Mesh
+from mesh_topology import MeshTopology, fan_triangles, boundary_loops
+from mesh_geometry import chain_summary
+from mesh_lod import decimate
+from mesh_profile import profiler_from_env
+
+# edge di confine elencati nella pagina; l'elenco completo si scarica come CSV
+MAX_LISTED_EDGES = 100
+# byte per blocco base64: multiplo di 3, cosi' i blocchi si concatenano senza padding
+B64_BLOCK = 3 << 20
+
+
+def _write_payload(f, filename, arrays, sidecar):
+    """Scrive l'oggetto JS con la geometria: base64 a blocchi o layout del file .bin."""
+    if sidecar:
+        bin_path = filename + ".bin"
+        layout, offset = {}, 0
+        with open(bin_path, "wb") as out:
+            for name, arr in arrays.items():
+                out.write(memoryview(arr))
+                layout[name] = [offset, len(arr)]
+                offset += arr.nbytes
+        f.write(json.dumps({"url": os.path.basename(bin_path), "layout": layout}))
+        return
+    f.write('{"inline": {')
+    for k, (name, arr) in enumerate(arrays.items()):
+        raw = arr.view(np.uint8)
+        f.write(f'{", " if k else ""}"{name}": "')
+        for s in range(0, len(raw), B64_BLOCK):
+            f.write(base64.b64encode(raw[s:s + B64_BLOCK]).decode("ascii"))
+        f.write('"')
+    f.write("}}")
+
 
 class BoundaryVisualizer:
-    def __init__(self):
-        self.vertices = []
-        self.faces = []
+    def __init__(self, dtype=np.float64):
+        # Vertici e facce in array (mesh_data.Mesh); dtype=np.float32 dimezza le coordinate
+        self.dtype = dtype
+        self.mesh = Mesh.empty(dtype)
+        # Indice topologico condiviso dalle query (mesh_topology.MeshTopology);
+        # va rimesso a None se self.mesh viene sostituita o modificata
+        self.topology = None
         
     def load_obj(self, obj_content):
         """Carica una mesh da contenuto OBJ"""
-        lines = obj_content.strip().split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('v '):
-                coords = list(map(float, line.split()[1:4]))
-                self.vertices.append(coords)
-            elif line.startswith('f '):
-                face_data = line.split()[1:]
-                face = []
-                for vertex_data in face_data:
-                    vertex_idx = int(vertex_data.split('/')[0]) - 1
-                    face.append(vertex_idx)
-                self.faces.append(face)
+        # Parse in blocco (gestisce v/vt/vn e indici negativi)
+        self.mesh = Mesh.from_obj(obj_content, self.dtype, with_groups=False)
+        self.topology = MeshTopology(self.mesh.face_offsets, self.mesh.face_indices, self.mesh.nverts)
+    
+    def get_topology(self):
+        """Indice topologico della mesh, costruito alla prima richiesta e poi riusato"""
+        if self.topology is None:
+            self.topology = MeshTopology(self.mesh.face_offsets, self.mesh.face_indices, self.mesh.nverts)
+        return self.topology
     
     def get_edges(self):
-        """Estrae tutti gli edge dalle facce"""
-        edges = defaultdict(list)
-        
-        for face_idx, face in enumerate(self.faces):
-            n = len(face)
-            for i in range(n):
-                v1 = face[i]
-                v2 = face[(i + 1) % n]
-                edge = tuple(sorted([v1, v2]))
-                edges[edge].append(face_idx)
-        
-        return edges
+        """Estrae tutti gli edge dalle facce (tabella su array, vedi mesh_topology.EdgeTable)"""
+        return self.get_topology().edges
     
     def find_boundary_edges(self):
         """Trova gli edge di confine"""
         edges = self.get_edges()
-        boundary_edges = []
+        # Edge di confine: usati da una sola faccia
+        return list(map(tuple, edges.edges[edges.boundary_mask].tolist()))
+    
+    def find_boundary_loops(self):
+        """Edge di confine concatenati in loop (buchi) e catene aperte.
         
-        for edge, face_list in edges.items():
-            if len(face_list) == 1:  # Edge di confine
-                boundary_edges.append(edge)
-                
-        return boundary_edges
+        Restituisce una lista di (vertici in ordine, chiuso); una catena
+        aperta include anche il vertice finale.
+        """
+        topology = self.get_topology()
+        src, dst, offsets, closed = boundary_loops(topology.face_offsets, topology.face_indices, topology.edges)
+        bounds = offsets.tolist()
+        src, dst = src.tolist(), dst.tolist()
+        return [
+            (src[a:b] if c else src[a:b] + [dst[b - 1]], c)
+            for a, b, c in zip(bounds[:-1], bounds[1:], closed.tolist())
+        ]
     
-    def create_html_visualization(self, filename="mesh_analysis.html"):
-        """Crea una visualizzazione HTML interattiva con Three.js"""
-        boundary_edges = self.find_boundary_edges()
+    def lod_mesh(self, max_triangles):
+        """Mesh ridotta a ~max_triangles triangoli (vedi mesh_lod.decimate).
         
-        # Converti dati per JavaScript
-        vertices_js = str(self.vertices).replace('[', '').replace(']', '').replace('(', '').replace(')', '')
-        faces_js = str(self.faces).replace('[', '').replace(']', '')
-        boundary_edges_js = str(boundary_edges).replace('[', '').replace(']', '')
+        Gli estremi degli edge di confine e non-manifold non vengono spostati,
+        quindi quegli edge restano a piena risoluzione.
+        Restituisce (verts, tris, vertex_map).
+        """
+        topology = self.get_topology()
+        edges = topology.edges
+        protected = np.zeros(self.mesh.nverts, dtype=bool)
+        protected[edges.edges[edges.boundary_mask | edges.nonmanifold_mask].ravel()] = True
+        return decimate(self.mesh.verts, topology.face_offsets, topology.face_indices, max_triangles, protected)
+    
+    def save_lod_obj(self, filename, max_triangles, precision=6):
+        """Salva la mesh ridotta per la visualizzazione in formato OBJ"""
+        verts, tris, _ = self.lod_mesh(max_triangles)
+        write_obj(filename, verts, np.arange(0, 3 * len(tris) + 1, 3, dtype=np.int64), tris.ravel(),
+                  precision=precision)
+    
+    def geometry_arrays(self, max_triangles=None):
+        """Array per il visualizzatore: posizioni Float32 (N*3), triangoli Uint32
+        (T*3, facce triangolate a ventaglio) e segmenti di confine Uint32 (B*2).
+        Con max_triangles la geometria e' quella di lod_mesh() e si aggiunge
+        boundary_ids, gli stessi segmenti con gli indici originali."""
+        topology = self.get_topology()
+        edges = topology.edges
+        boundary = edges.edges[edges.boundary_mask]
+        if max_triangles is None:
+            verts = self.mesh.verts
+            tris = fan_triangles(topology.face_offsets, topology.face_indices)
+        else:
+            verts, tris, vertex_map = self.lod_mesh(max_triangles)
+            boundary = vertex_map[boundary]
+        arrays = {
+            "positions": np.asarray(verts, dtype="<f4").reshape(-1),
+            "indices": tris.astype("<u4").reshape(-1),
+            "boundary": boundary.astype("<u4").reshape(-1),
+        }
+        if max_triangles is not None:
+            # per il CSV scaricabile servono gli indici della mesh originale
+            arrays["boundary_ids"] = edges.edges[edges.boundary_mask].astype("<u4").reshape(-1)
+        return arrays
+    
+    def create_html_visualization(self, filename="mesh_analysis.html", profiler=None, sidecar=False,
+                                  max_listed_edges=MAX_LISTED_EDGES, max_triangles=None):
+        """Crea una visualizzazione HTML interattiva con Three.js
+        
+        La pagina e' scritta sul file a pezzi, senza costruirla in memoria.
+        La geometria e' inclusa come typed array binari in base64 oppure, con
+        sidecar=True, scritta in un file <filename>.bin accanto all'HTML
+        (letto con fetch: la pagina va servita via HTTP, non aperta da file://).
+        Nell'HTML sono elencati solo i max_listed_edges edge di confine piu'
+        lunghi, con una tabella riassuntiva; l'elenco completo si scarica
+        dalla pagina come CSV generato dall'array degli edge.
+        Con max_triangles la superficie mostrata e' una versione ridotta
+        (vedi lod_mesh) con edge di confine e non-manifold intatti.
+        """
+        prof = profiler if profiler is not None else profiler_from_env(label=f"visualize:{filename}")
+        with prof.stage("edge_build", items=self.mesh.nfaces):
+            edges = self.get_edges()
+            boundary = edges.edges[edges.boundary_mask]
+        with prof.stage("geometry", items=self.mesh.nfaces):
+            arrays = self.geometry_arrays(max_triangles)
+        
+        with prof.stage("write", items=self.mesh.nfaces):
+            with open(filename, "w", encoding="utf-8", buffering=1 << 22) as f:
+                self._write_html(f, filename, arrays, boundary, sidecar, max_listed_edges)
+        if profiler is None:
+            prof.emit()
+        
+        print(f"Visualizzazione creata: {filename}")
+        print("Apri il file nel browser per vedere gli edge di confine evidenziati in rosso!")
+    
+    def _write_edge_report(self, f, boundary, max_listed_edges):
+        """Tabella riassuntiva e lista dei max_listed_edges edge di confine piu' lunghi."""
+        verts = self.mesh.verts
+        lengths = np.linalg.norm(verts[boundary[:, 1]] - verts[boundary[:, 0]], axis=1)
+        n = len(boundary)
+        listed = min(n, max_listed_edges)
+        top = np.argpartition(-lengths, listed - 1)[:listed] if 0 < listed < n else np.arange(listed)
+        top = top[np.argsort(-lengths[top], kind="stable")]
         
-        html_content = f"""<!DOCTYPE html>
+        topology = self.get_topology()
+        loops = chain_summary(verts, *boundary_loops(topology.face_offsets, topology.face_indices, topology.edges),
+                              limit=1)
+        stats = [
+            ("Edge di confine", f"{n}"),
+            ("Loop chiusi (buchi)", f"{loops['n_boundary_loops']}"),
+            ("Catene aperte", f"{loops['n_open_boundary_chains']}"),
+            ("Elencati sotto", f"{listed} (i piu' lunghi)"),
+        ]
+        if loops["boundary_loops"]:
+            top_loop = loops["boundary_loops"][0]
+            stats.append(("Catena piu' lunga", f"{top_loop['n_edges']} edge, perimetro {top_loop['perimeter']:.4g}"
+                                               f"{'' if top_loop['closed'] else ' (aperta)'}"))
+        if n:
+            stats += [
+                ("Lunghezza totale", f"{lengths.sum():.4g}"),
+                ("Lunghezza min / mediana / max",
+                 f"{lengths.min():.4g} / {np.median(lengths):.4g} / {lengths.max():.4g}"),
+            ]
+        f.write('        <table class="summary">\n')
+        f.writelines(f"            <tr><th>{k}</th><td>{v}</td></tr>\n" for k, v in stats)
+        f.write("        </table>\n")
+        f.write(f"        <h4>Edge di confine identificati (primi {listed} di {n} per lunghezza):</h4>\n")
+        f.write("        <ul>\n")
+        for i, e in enumerate(top.tolist()):
+            v1, v2 = boundary[e].tolist()
+            pos1, pos2 = verts[v1], verts[v2]
+            f.write(f'<li class="boundary-edge">Edge {i+1}: Vertice {v1} ({pos1[0]:.3f}, {pos1[1]:.3f}, {pos1[2]:.3f}) '
+                    f'→ Vertice {v2} ({pos2[0]:.3f}, {pos2[1]:.3f}, {pos2[2]:.3f}), lunghezza {lengths[e]:.4g}</li>\n')
+        f.write("        </ul>\n")
+        if n > listed:
+            f.write(f"        <p>Altri {n - listed} edge non elencati: usa \"Scarica edge di confine\".</p>\n")
+    
+    def _write_html(self, f, filename, arrays, boundary, sidecar, max_listed_edges):
+        f.write(f"""<!DOCTYPE html>
 <html>
 <head>
+    <meta charset="utf-8">
     <title>Analisi Edge di Confine</title>
     <style>
         body {{ margin: 0; padding: 20px; font-family: Arial, sans-serif; background: #f0f0f0; }}
@@ -67,6 +211,7 @@ class BoundaryVisualizer:
         #info {{ margin-top: 20px; padding: 15px; background: white; border-radius: 5px; }}
         .boundary-edge {{ color: red; font-weight: bold; }}
         .controls {{ margin-bottom: 20px; }}
+        .summary th {{ text-align: left; padding-right: 20px; }}
         button {{ padding: 10px 20px; margin: 5px; background: #4CAF50; color: white; border: none; border-radius: 3px; cursor: pointer; }}
         button:hover {{ background: #45a049; }}
     </style>
@@ -78,29 +223,21 @@ class BoundaryVisualizer:
         <button onclick="toggleWireframe()">Toggle Wireframe</button>
         <button onclick="toggleBoundaryEdges()">Toggle Edge Confine</button>
         <button onclick="resetView()">Reset Vista</button>
+        <button onclick="downloadBoundaryEdges()">Scarica edge di confine</button>
     </div>
     
     <div id="container"></div>
     
     <div id="info">
         <h3>Informazioni Mesh:</h3>
-        <p>Vertici: {len(self.vertices)}</p>
-        <p>Facce: {len(self.faces)}</p>
-        <p><span class="boundary-edge">Edge di confine: {len(boundary_edges)}</span></p>
-        
-        <h4>Edge di confine identificati:</h4>
-        <ul>
-"""
-        
-        for i, edge in enumerate(boundary_edges):
-            v1, v2 = edge
-            pos1 = self.vertices[v1]
-            pos2 = self.vertices[v2]
-            html_content += f'<li class="boundary-edge">Edge {i+1}: Vertice {v1} ({pos1[0]:.3f}, {pos1[1]:.3f}, {pos1[2]:.3f}) → Vertice {v2} ({pos2[0]:.3f}, {pos2[1]:.3f}, {pos2[2]:.3f})</li>'
-        
-        html_content += f"""
-        </ul>
+        <p>Vertici: {self.mesh.nverts}</p>
+        <p>Facce: {self.mesh.nfaces}</p>
+        <p><span class="boundary-edge">Edge di confine: {len(boundary)}</span></p>
+        <p>Triangoli visualizzati: {len(arrays["indices"]) // 3}</p>
         
+""")
+        self._write_edge_report(f, boundary, max_listed_edges)
+        f.write("""
         <p><strong>Cosa significano gli edge di confine:</strong></p>
         <ul>
             <li>🔴 <strong>Linee rosse spesse</strong>: Edge di confine (usati da una sola faccia)</li>
@@ -115,12 +252,43 @@ class BoundaryVisualizer:
         let showWireframe = true;
         let showBoundaryEdges = true;
         
-        // Dati mesh
-        const vertices = [{vertices_js}];
-        const faces = [{faces_js}];
-        const boundaryEdges = [{boundary_edges_js}];
+        // Dati mesh: Float32Array (x,y,z), Uint32Array di triangoli e di coppie di vertici
+        const payload = """)
+        _write_payload(f, filename, arrays, sidecar)
+        f.write(f""";
+        let positions, indices, boundaryEdges, boundaryIds;
+        
+        function decodeBase64(b64, Type) {{
+            const bin = atob(b64);
+            const bytes = new Uint8Array(bin.length);
+            for (let i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+            return new Type(bytes.buffer);
+        }}
+        
+        function loadPayload() {{
+            const types = {{ positions: Float32Array, indices: Uint32Array, boundary: Uint32Array, boundary_ids: Uint32Array }};
+            if (payload.inline) {{
+                const out = {{}};
+                for (const name in payload.inline) out[name] = decodeBase64(payload.inline[name], types[name]);
+                return Promise.resolve(out);
+            }}
+            return fetch(payload.url).then(r => r.arrayBuffer()).then(buffer => {{
+                const out = {{}};
+                for (const name in payload.layout) {{
+                    const [offset, length] = payload.layout[name];
+                    out[name] = new types[name](buffer, offset, length);
+                }}
+                return out;
+            }});
+        }}
         
-        function init() {{
+        function init(data) {{
+            positions = data.positions;
+            indices = data.indices;
+            boundaryEdges = data.boundary;
+            // indici originali degli edge (diversi da boundary solo con la mesh ridotta)
+            boundaryIds = data.boundary_ids || data.boundary;
+            
             // Setup scena
             scene = new THREE.Scene();
             scene.background = new THREE.Color(0xf0f0f0);
@@ -134,29 +302,10 @@ class BoundaryVisualizer:
                            document.getElementById('container').clientHeight);
             document.getElementById('container').appendChild(renderer.domElement);
             
-            // Crea geometria
+            // Crea geometria direttamente dai typed array (facce gia' triangolate)
             const geometry = new THREE.BufferGeometry();
-            
-            // Converti vertici
-            const vertexArray = [];
-            for (let i = 0; i < vertices.length; i += 3) {{
-                vertexArray.push(vertices[i], vertices[i+1], vertices[i+2]);
-            }}
-            
-            // Converti facce in triangoli
-            const indexArray = [];
-            for (let i = 0; i < faces.length; i += faces[i] + 1) {{
-                const faceSize = faces[i];
-                const faceStart = i + 1;
-                
-                // Triangola facce con più di 3 vertici
-                for (let j = 1; j < faceSize - 1; j++) {{
-                    indexArray.push(faces[faceStart], faces[faceStart + j], faces[faceStart + j + 1]);
-                }}
-            }}
-            
-            geometry.setAttribute('position', new THREE.Float32BufferAttribute(vertexArray, 3));
-            geometry.setIndex(indexArray);
+            geometry.setAttribute('position', new THREE.BufferAttribute(positions, 3));
+            geometry.setIndex(new THREE.BufferAttribute(indices, 1));
             geometry.computeVertexNormals();
             
             // Mesh principale
@@ -196,20 +345,17 @@ class BoundaryVisualizer:
         
         function createBoundaryLines() {{
             const boundaryGeometry = new THREE.BufferGeometry();
-            const boundaryVertices = [];
+            const boundaryVertices = new Float32Array(boundaryEdges.length * 3);
             
-            for (let i = 0; i < boundaryEdges.length; i += 2) {{
-                const v1Idx = boundaryEdges[i];
-                const v2Idx = boundaryEdges[i + 1];
-                
-                // Aggiungi i due vertici dell'edge
-                boundaryVertices.push(
-                    vertices[v1Idx * 3], vertices[v1Idx * 3 + 1], vertices[v1Idx * 3 + 2],
-                    vertices[v2Idx * 3], vertices[v2Idx * 3 + 1], vertices[v2Idx * 3 + 2]
-                );
+            // Aggiungi i due vertici di ogni edge
+            for (let i = 0; i < boundaryEdges.length; i++) {{
+                const v = boundaryEdges[i];
+                boundaryVertices[i * 3] = positions[v * 3];
+                boundaryVertices[i * 3 + 1] = positions[v * 3 + 1];
+                boundaryVertices[i * 3 + 2] = positions[v * 3 + 2];
             }}
             
-            boundaryGeometry.setAttribute('position', new THREE.Float32BufferAttribute(boundaryVertices, 3));
+            boundaryGeometry.setAttribute('position', new THREE.BufferAttribute(boundaryVertices, 3));
             
             const boundaryMaterial = new THREE.LineBasicMaterial({{ 
                 color: 0xff0000, 
@@ -254,6 +400,20 @@ class BoundaryVisualizer:
             }});
         }}
         
+        function downloadBoundaryEdges() {{
+            // CSV generato al momento dall'array: nessun nodo DOM per edge
+            const lines = new Array(boundaryIds.length / 2);
+            for (let i = 0; i < lines.length; i++) {{
+                lines[i] = boundaryIds[2 * i] + ',' + boundaryIds[2 * i + 1];
+            }}
+            const blob = new Blob(['v1,v2\\n' + lines.join('\\n') + '\\n'], {{ type: 'text/csv' }});
+            const link = document.createElement('a');
+            link.href = URL.createObjectURL(blob);
+            link.download = 'boundary_edges.csv';
+            link.click();
+            URL.revokeObjectURL(link.href);
+        }}
+        
         function toggleWireframe() {{
             wireframe.visible = !wireframe.visible;
             showWireframe = wireframe.visible;
@@ -278,16 +438,10 @@ class BoundaryVisualizer:
         }}
         
         // Avvia la visualizzazione
-        init();
+        loadPayload().then(init);
     </script>
 </body>
-</html>"""
-        
-        with open(filename, 'w') as f:
-            f.write(html_content)
-        
-        print(f"Visualizzazione creata: {filename}")
-        print("Apri il file nel browser per vedere gli edge di confine evidenziati in rosso!")
+</html>""")
 
 # Analizza la mesh originale
 def analyze_original_mesh():
@@ -361,8 +515,8 @@ f 22 21 19 34 20 21"""
     print(f"Trovati {len(boundary_edges)} edge di confine:")
     for i, edge in enumerate(boundary_edges):
         v1, v2 = edge
-        pos1 = visualizer.vertices[v1]
-        pos2 = visualizer.vertices[v2]
+        pos1 = visualizer.mesh.verts[v1]
+        pos2 = visualizer.mesh.verts[v2]
         print(f"  {i+1}. Edge ({v1}, {v2})")
         print(f"     Vertice {v1}: ({pos1[0]:.6f}, {pos1[1]:.6f}, {pos1[2]:.6f})")
         print(f"     Vertice {v2}: ({pos2[0]:.6f}, {pos2[1]:.6f}, {pos2[2]:.6f})")